@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 import csv
 import io
 from datetime import datetime, timedelta
@@ -6,7 +6,19 @@ import json
 import os
 import requests
 from dotenv import load_dotenv
-from main import process_article, load_topics
+from main import process_article_topics, load_topics
+from jobs import JobManager
+from news_scraper import get_cache_stats
+from llm_cache import get_stats as get_llm_cache_stats
+from llm import get_stats as get_llm_stats
+import metrics
+from http_client import get_session
+from database import db
+from content_index import (
+    DEFAULT_PAGE_SIZE, ensure_synced, get_content_page, index_output_file, remove_output_file
+)
+from publish_queue import PublishQueue
+from external_api import TickertalkAPI
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,9 +26,11 @@ print("Environment variables loaded from .env file")
 
 app = Flask(__name__)
 
-# Ensure output directory exists
-if not os.path.exists('outputs'):
-    os.makedirs('outputs')
+# Background jobs for /process and /process_selected
+job_manager = JobManager(process_article_topics)
+
+# Background dispatcher for /api/publish; started on first use
+publish_queue = PublishQueue(TickertalkAPI)
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -43,16 +57,18 @@ def index():
                     'published_after': three_days_ago.strftime('%Y-%m-%dT%H:%M:%S')
                 }
                 try:
-                    response = requests.get(api_url, params=params)
+                    response = get_session().get(api_url, params=params, timeout=15)
                     response.raise_for_status()
                     news_data = response.json()
                     news_results = news_data.get('data', [])
 
                     # Store the news data
                     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    os.makedirs('outputs', exist_ok=True)
                     output_filename = f'outputs/search_{timestamp}.json'
                     with open(output_filename, 'w', encoding='utf-8') as f:
                         json.dump(news_data, f, indent=2, ensure_ascii=False)
+                    index_output_file(output_filename)
 
                 except requests.exceptions.RequestException as e:
                     errors.append(f"Error fetching news from MarketAux: {e}")
@@ -61,58 +77,43 @@ def index():
         else:
             errors.append("Please enter a search query.")
 
-    topics = list(load_topics())[:5]
-    return render_template('index.html', sample_topics=topics, news_results=news_results, query=query, errors=errors, all_topics=list(load_topics()))
+    all_topics = list(load_topics())
+    return render_template('index.html', sample_topics=all_topics[:5], news_results=news_results, query=query, errors=errors, all_topics=all_topics)
+
+def _wants_regenerate():
+    """?regenerate=true (or a regenerate form field) re-rolls instead of reusing cached LLM output"""
+    value = request.args.get('regenerate') or request.form.get('regenerate') or ''
+    return value.lower() in ('1', 'true', 'yes', 'on')
 
 @app.route('/process_selected', methods=['POST'])
 def process_selected():
+    """Queue the selected articles as a background job and return its id"""
     selected_articles = request.get_json()
     if not selected_articles:
         return jsonify({'error': 'No articles selected'}), 400
 
-    all_posts = {"posts": []}
-    errors = []
-    success_count = 0
-
-    for article in selected_articles:
+    available_topics = load_topics()
+    rows = []
+    for index, article in enumerate(selected_articles, start=1):
+        row = {'label': f"Article {index}", 'url': article.get('url'), 'topic': article.get('topic')}
         try:
             if not article['url'].strip() or not article['topic'].strip():
-                errors.append(f"Invalid data for URL: {article['url']}")
-                continue
-
-            available_topics = load_topics()
-            if article['topic'] not in available_topics:
-                errors.append(f"Invalid topic '{article['topic']}' for URL: {article['url']}")
-                continue
-
-            post = process_article(article['url'].strip(), article['topic'].strip())
-            if post and post.get("posts"):
-                all_posts["posts"].extend(post["posts"])
-                success_count += 1
+                row['error'] = f"Invalid data for URL: {article['url']}"
+            elif article['topic'] not in available_topics:
+                row['error'] = f"Invalid topic '{article['topic']}' for URL: {article['url']}"
             else:
-                errors.append(f"Failed to process article from {article['url']}")
+                row['url'] = article['url'].strip()
+                row['topic'] = article['topic'].strip()
         except Exception as e:
-            errors.append(f"Error processing article from {article['url']}: {str(e)}")
-            continue
-
-    if success_count == 0:
-        return jsonify({
-            'error': 'No articles were successfully processed',
-            'details': errors
-        }), 400
-
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_filename = f'outputs/output_{timestamp}.json'
-
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        json.dump(all_posts, f, indent=2, ensure_ascii=False)
+            row['error'] = f"Error processing article from {article.get('url')}: {str(e)}"
+        rows.append(row)
 
+    job_id = job_manager.submit('selection', rows, bypass_cache=_wants_regenerate())
     return jsonify({
-        'message': f'Successfully processed {success_count} articles',
-        'filename': output_filename,
-        'data': all_posts,
-        'errors': errors if errors else None
-    })
+        'message': f'Queued {len(rows)} articles for processing',
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
 
 @app.route('/download_sample')
 def download_sample():
@@ -133,6 +134,7 @@ def download_sample():
 
 @app.route('/process', methods=['POST'])
 def process_csv():
+    """Queue the rows of an uploaded CSV as a background job and return its id"""
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
     
@@ -152,57 +154,36 @@ def process_csv():
         if not {'topic', 'url'}.issubset(csv_reader.fieldnames):
             return jsonify({'error': 'CSV must contain "topic" and "url" columns'}), 400
 
-        all_posts = {"posts": []}
-        errors = []
-        success_count = 0
-        
-        # Process each row
+        # Validate each row; rows that fail are reported as failed in the job
+        available_topics = load_topics()
+        rows = []
         for row_num, row in enumerate(csv_reader, start=1):
+            job_row = {'label': f"Row {row_num}", 'url': row.get('url'), 'topic': row.get('topic')}
             try:
                 if not row['url'].strip() or not row['topic'].strip():
-                    errors.append(f"Row {row_num}: Empty URL or topic")
-                    continue
+                    job_row['error'] = f"Row {row_num}: Empty URL or topic"
                 
                 # Validate topic exists
-                available_topics = load_topics()
-                if row['topic'] not in available_topics:
-                    errors.append(f"Row {row_num}: Invalid topic '{row['topic']}'")
-                    continue
+                elif row['topic'] not in available_topics:
+                    job_row['error'] = f"Row {row_num}: Invalid topic '{row['topic']}'"
                 
-                post = process_article(row['url'].strip(), row['topic'].strip())
-                if post and post.get("posts"):
-                    all_posts["posts"].extend(post["posts"])
-                    success_count += 1
                 else:
-                    errors.append(f"Row {row_num}: Failed to process article from {row['url']}")
+                    job_row['url'] = row['url'].strip()
+                    job_row['topic'] = row['topic'].strip()
             
             except Exception as e:
-                errors.append(f"Row {row_num}: Error - {str(e)}")
-                continue  # Continue with next row even if this one fails
+                job_row['error'] = f"Row {row_num}: Error - {str(e)}"
+            rows.append(job_row)
         
-        # Return successful results even if some rows failed
-        if success_count > 0:
-            status_code = 200  # Success with some posts
-        else:
-            return jsonify({
-                'error': 'No articles were successfully processed',
-                'details': errors
-            }), 400
-        
-        # Generate timestamp for filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_filename = f'outputs/output_{timestamp}.json'
-        
-        # Save to file
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            json.dump(all_posts, f, indent=2, ensure_ascii=False)
+        if not rows:
+            return jsonify({'error': 'CSV file contains no rows'}), 400
         
+        job_id = job_manager.submit('csv', rows, bypass_cache=_wants_regenerate())
         return jsonify({
-            'message': f'Successfully processed {success_count} articles',
-            'filename': output_filename,
-            'data': all_posts,
-            'errors': errors if errors else None
-        })
+            'message': f'Queued {len(rows)} rows for processing',
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
         
     except Exception as e:
         return jsonify({
@@ -210,20 +191,60 @@ def process_csv():
             'details': str(e)
         }), 500
 
+@app.route('/api/jobs')
+def list_jobs():
+    """List recent processing jobs without their row details"""
+    return jsonify(job_manager.list())
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Report per-row progress, partial results and ETA for a processing job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @app.route('/outputs')
 def list_outputs():
     """List all generated output files"""
-    files = []
-    for file in os.listdir('outputs'):
-        if file.endswith('.json'):
-            filepath = os.path.join('outputs', file)
-            files.append({
-                'name': file,
-                'size': os.path.getsize(filepath),
-                'created': datetime.fromtimestamp(os.path.getctime(filepath)).isoformat()
-            })
+    ensure_synced()
+    files = [
+        {'name': row['name'], 'size': row['size'], 'created': row['created']}
+        for row in db.get_output_files()
+    ]
     return jsonify(files)
 
+@app.route('/api/stats/extraction-cache')
+def extraction_cache_stats():
+    """Hit/miss/revalidate counters for the extracted_articles cache"""
+    return jsonify(get_cache_stats())
+
+@app.route('/api/stats/llm-cache')
+def llm_cache_stats():
+    """Hit rate, LLM seconds saved and stored entries for the LLM response cache"""
+    return jsonify(get_llm_cache_stats())
+
+@app.route('/api/stats/llm')
+def llm_stats():
+    """Calls, retries, failures and circuit state per LLM provider"""
+    return jsonify(get_llm_stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage latency histograms and per-domain/per-provider counters for Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/stats/condense')
+def condense_stats():
+    """Tokens trimmed from articles before prompting, in total or for one ?url="""
+    url = request.args.get('url')
+    if url:
+        stats = db.get_condensation(url)
+        if not stats:
+            return jsonify({'error': 'Article has not been condensed'}), 404
+        return jsonify(stats)
+    return jsonify(db.condensation_totals())
+
 @app.route('/content')
 def content_page():
     """Display generated content in cards"""
@@ -231,44 +252,37 @@ def content_page():
 
 @app.route('/api/content')
 def get_content():
-    """API endpoint to get all generated content"""
-    content_list = []
-    
-    if not os.path.exists('outputs'):
-        return jsonify(content_list)
-    
-    for filename in os.listdir('outputs'):
-        if filename.endswith('.json') and filename.startswith('output_'):
-            filepath = os.path.join('outputs', filename)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                if 'posts' in data and data['posts']:
-                    for post_index, post in enumerate(data['posts']):
-                        content_item = {
-                            'id': post.get('temp_post_id', f"{filename}_{post_index}"),
-                            'title': post.get('title', 'No Title'),
-                            'content': post.get('content', ''),
-                            'topic': post.get('topic', 'GENERAL'),
-                            'username': post.get('username', 'Anonymous'),
-                            'created_at': post.get('created_at', ''),
-                            'comments': post.get('comments', []),
-                            'filename': filename,
-                            'post_index': post_index,
-                            'preview': post.get('content', '')[:200] + '...' if len(post.get('content', '')) > 200 else post.get('content', ''),
-                            'published': post.get('published', False),
-                            'published_at': post.get('published_at', ''),
-                            'external_id': post.get('external_id', '')
-                        }
-                        content_list.append(content_item)
-            except Exception as e:
-                print(f"Error reading {filename}: {e}")
-                continue
-    
-    # Sort by created_at descending (newest first)
-    content_list.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    return jsonify(content_list)
+    """
+    One page of generated posts, newest first, served from the content index.
+
+    Query parameters: limit, cursor (next_cursor from the previous page),
+    topic, username, published (true/false), date_from and date_to
+    (YYYY-MM-DD or ISO timestamps, both inclusive).
+    """
+    args = request.args
+    published = args.get('published')
+    if published is not None and published.lower() not in ('true', 'false'):
+        return jsonify({'error': 'published must be true or false'}), 400
+
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+
+    ensure_synced()
+    try:
+        page = get_content_page(
+            limit=limit,
+            cursor=args.get('cursor'),
+            topic=args.get('topic') or None,
+            username=args.get('username') or None,
+            published=None if published is None else published.lower() == 'true',
+            date_from=args.get('date_from') or None,
+            date_to=args.get('date_to') or None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
 
 def create_backup(filepath):
     """Create a backup of the file before editing"""
@@ -365,6 +379,7 @@ def edit_content():
         # Save updated data
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(file_data, f, indent=2, ensure_ascii=False)
+        index_output_file(filepath, file_data)
             
         return jsonify({'message': f'{content_type.title()} updated successfully'})
         
@@ -402,6 +417,7 @@ def delete_content():
                 # If no posts left, delete the file
                 if not file_data['posts']:
                     os.remove(filepath)
+                    remove_output_file(filepath)
                     return jsonify({'message': 'Post deleted and file removed'})
             else:
                 return jsonify({'error': 'Post not found'}), 404
@@ -422,6 +438,7 @@ def delete_content():
         if os.path.exists(filepath):
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(file_data, f, indent=2, ensure_ascii=False)
+            index_output_file(filepath, file_data)
             
         return jsonify({'message': f'{content_type.title()} deleted successfully'})
         
@@ -496,127 +513,116 @@ def test_api_connection(test_type=None):
         print(f"Error testing API connection: {e}")
         return jsonify({'error': f'Failed to test API connection: {str(e)}'}), 500
 
+def _api_key_missing():
+    """Error response when publishing can't work at all, else None"""
+    use_mock = os.getenv("USE_MOCK_API", "true").lower() == "true"
+    if not use_mock and not os.getenv("EXTERNAL_API_KEY"):
+        print("ERROR: EXTERNAL_API_KEY not found in environment variables")
+        return jsonify({
+            'success': False,
+            'error': 'API key not configured',
+            'message': 'EXTERNAL_API_KEY not found in environment variables'
+        }), 400
+    return None
+
+def _queue_entry(entry):
+    """A publish queue row as returned by the API"""
+    if 'error' in entry and 'id' not in entry:
+        return entry
+    return {
+        'id': entry['id'],
+        'status': entry['status'],
+        'filename': entry['filename'],
+        'post_index': entry['post_index'],
+        'temp_post_id': entry['temp_post_id'],
+        'attempts': entry['attempts'],
+        'last_error': entry['last_error'],
+        'external_id': entry['external_id'],
+        'created_at': entry['created_at'],
+        'updated_at': entry['updated_at'],
+        'status_url': f"/api/publish/queue/{entry['id']}"
+    }
+
+@app.route('/api/publish/batch', methods=['POST'])
+def publish_batch():
+    """
+    Queue posts for publishing; they go out in bulk uploads of up to 100.
+
+    Body: {"posts": [{"filename", "post_index"}, ...]} to publish a
+    selection, or no posts to publish everything not yet published.
+    """
+    error = _api_key_missing()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    selection = data.get('posts')
+    if selection is not None:
+        if not isinstance(selection, list) or not all(
+                isinstance(item, dict) and item.get('filename') and isinstance(item.get('post_index'), int)
+                for item in selection):
+            return jsonify({'error': 'posts must be a list of {filename, post_index}'}), 400
+        refs = [(item['filename'], item['post_index']) for item in selection]
+    else:
+        ensure_synced()
+        refs = db.get_unpublished_posts()
+
+    entries = [_queue_entry(entry) for entry in publish_queue.enqueue(refs)] if refs else []
+    queued = sum(1 for entry in entries if 'id' in entry)
+    return jsonify({
+        'message': f"Queued {queued} post(s) for publishing" if refs else 'Nothing to publish',
+        'queued': queued,
+        'items': entries
+    }), 202
+
 @app.route('/api/publish/<post_id>', methods=['POST'])
 def publish_post(post_id):
-    """Publish a post to the external API"""
+    """Queue one post for publishing and return its queue entry"""
+    error = _api_key_missing()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename')
+    post_index = data.get('post_index')
+    if not filename or not isinstance(post_index, int):
+        print(f"Missing parameters: filename={filename}, post_index={post_index}")
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    entry = _queue_entry(publish_queue.enqueue([(filename, post_index)])[0])
+    if 'error' in entry and 'id' not in entry:
+        return jsonify({'error': entry['error']}), 404
+    entry['message'] = 'Post already published' if entry['status'] == 'published' else 'Post queued for publishing'
+    return jsonify(entry), 202
+
+@app.route('/api/publish/queue')
+def list_publish_queue():
+    """Recent publish queue entries (optionally ?status=...) and counts per status"""
+    publish_queue.start()
     try:
-        print(f"Publishing post with ID: {post_id}")
-        data = request.get_json()
-        print(f"Request data: {data}")
-        
-        # Check if API key is available
-        api_key = os.getenv("EXTERNAL_API_KEY")
-        if not api_key:
-            print("ERROR: EXTERNAL_API_KEY not found in environment variables")
-            print(f"Available environment variables: {[k for k in os.environ.keys() if not k.startswith('_')]}")
-            return jsonify({
-                'success': False,
-                'error': 'API key not configured',
-                'message': 'EXTERNAL_API_KEY not found in environment variables'
-            }), 400
-        else:
-            print(f"API key found: {api_key[:5]}...{api_key[-5:]}")
-            print(f"API key length: {len(api_key)}")
-            print(f"API key type: {type(api_key)}")
-            print(f"API key contains whitespace: {any(c.isspace() for c in api_key)}")
-            
-            # Direct test from app.py
-            try:
-                import requests
-                import json
-                
-                # Create a session
-                test_session = requests.Session()
-                
-                # Set headers
-                test_headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {api_key}"
-                }
-                test_session.headers.update(test_headers)
-                
-                # Make a test request
-                test_url = f"{os.getenv('EXTERNAL_API_URL', 'https://www.tickertalk.in')}/api/external/bulk-upload-posts-comments"
-                test_payload = {
-                    "posts": [
-                        {
-                            "temp_post_id": "test_001",
-                            "title": "Test Post",
-                            "content": "This is a test post",
-                            "topic": "GENERAL",
-                            "username": "standardizedquantum",
-                            "created_at": "2025-07-22T12:00:00Z",
-                            "comments": []
-                        }
-                    ]
-                }
-                
-                print(f"App.py direct test - URL: {test_url}")
-                print(f"App.py direct test - Headers: {test_headers}")
-                
-                test_response = test_session.post(
-                    test_url,
-                    data=json.dumps(test_payload),
-                    timeout=10
-                )
-                
-                print(f"App.py direct test - Response status: {test_response.status_code}")
-                print(f"App.py direct test - Response body: {test_response.text}")
-                
-            except Exception as e:
-                print(f"App.py direct test failed: {e}")
-        
-        filename = data.get('filename')
-        post_index = data.get('post_index')
-        
-        if not filename or post_index is None:
-            print(f"Missing parameters: filename={filename}, post_index={post_index}")
-            return jsonify({'error': 'Missing required parameters'}), 400
-            
-        filepath = os.path.join('outputs', filename)
-        if not os.path.exists(filepath):
-            return jsonify({'error': 'File not found'}), 404
-            
-        # Read the post data
-        with open(filepath, 'r', encoding='utf-8') as f:
-            file_data = json.load(f)
-            
-        if post_index >= len(file_data.get('posts', [])):
-            return jsonify({'error': 'Post index out of range'}), 400
-            
-        post_data = file_data['posts'][post_index]
-        
-        # Import the TickertalkAPI class
-        from external_api import TickertalkAPI
-        
-        # Publish the post
-        api = TickertalkAPI()
-        result = api.publish_post(post_data)
-        
-        # Update the post with published status if successful
-        if result.get('success'):
-            post_data['published'] = True
-            post_data['published_at'] = datetime.now().isoformat()
-            post_data['external_id'] = result.get('results', [{}])[0].get('post_id')
-            
-            # Save the updated data
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(file_data, f, indent=2, ensure_ascii=False)
-            
-            # Check if we're using mock mode
-            use_mock = os.getenv("USE_MOCK_API", "true").lower() == "true"
-            print(f"Mock API mode in app.py: {use_mock}")
-            if use_mock:
-                result['message'] = "Post published successfully (using mock API)"
-                print("Using mock API mode - post marked as published")
-            else:
-                result['message'] = "Post published successfully"
-            
-        return jsonify(result)
-        
-    except Exception as e:
-        print(f"Error publishing post: {e}")
-        return jsonify({'error': f'Failed to publish post: {str(e)}'}), 500
+        limit = min(int(request.args.get('limit', 100)), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    rows = db.list_publish_queue(status=request.args.get('status') or None, limit=limit)
+    return jsonify({
+        'counts': db.publish_queue_counts(),
+        'items': [_queue_entry(row) for row in rows]
+    })
+
+@app.route('/api/publish/queue/<int:item_id>')
+def get_publish_item(item_id):
+    """Status of one queued post"""
+    row = db.get_publish_item(item_id)
+    if not row:
+        return jsonify({'error': 'Queue entry not found'}), 404
+    return jsonify(_queue_entry(row))
+
+@app.route('/api/publish/queue/<int:item_id>/retry', methods=['POST'])
+def retry_publish_item(item_id):
+    """Send a failed or needs_review entry again, e.g. after checking the forum"""
+    if not publish_queue.retry(item_id):
+        return jsonify({'error': 'Only failed or needs_review entries can be retried'}), 409
+    return jsonify(_queue_entry(db.get_publish_item(item_id))), 202
 
 def direct_test_connection():
     """Test the API connection using urllib directly"""
@@ -723,9 +729,8 @@ def direct_test_connection():
             'error': f'Failed to perform direct test: {str(e)}',
             'details': error_details
         }), 500
-if __name__ == '__main__':
-    app.run(debug=True)@app.r
-oute('/api/ping-test', methods=['GET'])
+
+@app.route('/api/ping-test', methods=['GET'])
 def ping_test():
     """Simple test to check if we can connect to the API server"""
     try:
@@ -781,8 +786,9 @@ def ping_test():
         return jsonify({
             'error': f'Failed to perform ping test: {str(e)}',
             'details': error_details
-        }), 500@app.ro
-ute('/api/requests-test', methods=['GET'])
+        }), 500
+
+@app.route('/api/requests-test', methods=['GET'])
 def requests_test():
     """Test the API connection using the requests library with proper redirect handling"""
     try:
@@ -937,4 +943,10 @@ def direct_publish_test():
         return jsonify({
             'error': f'Failed to perform direct publish test: {str(e)}',
             'details': error_details
-        }), 500
\ No newline at end of file
+        }), 500
+
+if __name__ == '__main__':
+    # Resume queued publishes right away; with the reloader, only in the serving process
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        publish_queue.start()
+    app.run(debug=True)
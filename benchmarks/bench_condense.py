@@ -0,0 +1,93 @@
+"""
+Benchmark of condense() on generated articles of increasing length: short
+reports, long reports and live blogs, each with the sites' boilerplate
+lines, related-story headlines and a repeated paragraph mixed in.
+
+Reports estimated prompt tokens before and after, time per article, and
+checks that the lead paragraph always survives. First checks the path the
+pipeline takes, extract_content and the source's clean() before condense(),
+on real markup with inline links: boilerplate paragraphs must be dropped
+there too, not only in text that already has blank lines between them.
+
+    python benchmarks/bench_condense.py --budget 1200
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from synthetic_pages import BOILERPLATE, COMPANIES, SENTENCES, _fill, make_page
+from condense import condense
+from html_extract import extract_content
+from source_rules import get_rules
+
+LIVEMINT_PAGE = """<html><body><div class="storyPage_storyContent story-content">
+<p>Shares of <a href="/market/reliance">Reliance Industries</a> rose 4% on Monday after the company
+reported a 12% jump in quarterly profit.</p>
+<p>Also read: <a href="/news/1">Sensex, Nifty end higher for a third session</a></p>
+<p>Net profit came in at <b>Rs 19,878 crore</b>, ahead of analyst estimates, while revenue grew 8%.</p>
+<p>Disclaimer: The views and recommendations made above are those of individual analysts.</p>
+<p>Follow us on <a href="https://x.com/livemint">X</a> and <a href="#">Instagram</a></p>
+<p>Net profit came in at <b>Rs 19,878 crore</b>, ahead of analyst estimates, while revenue grew 8%.</p>
+</div></body></html>"""
+
+def pipeline_condense(url, html, budget=0):
+    """What main.condense_article gets: extracted, then cleaned by the source's rules"""
+    return condense(get_rules(url).clean(extract_content(html)['text']), budget)
+
+def check_pipeline_path():
+    condensed, stats = pipeline_condense('https://www.livemint.com/market/reliance-q2.html', LIVEMINT_PAGE)
+    lines = condensed.split('\n\n')
+    assert lines[0].startswith('Shares of Reliance Industries rose 4%'), lines[0]
+    assert 'Also read' not in condensed and 'Disclaimer' not in condensed and 'Follow us' not in condensed, condensed
+    assert len(lines) == 2 and stats['paragraphs_dropped'] == 3, stats
+    assert stats['tokens_saved'] > 0, stats
+
+    for index in range(len(BOILERPLATE)):
+        domain, path, _, html = make_page(index, target_bytes=20_000)
+        condensed, stats = pipeline_condense(f'https://www.{domain}{path}', html)
+        for line in BOILERPLATE[domain]:
+            prefix = line.split('{')[0][:20]
+            assert prefix not in condensed, f'{domain}: {prefix!r} survived'
+    print("clean -> condense on extracted pages: boilerplate dropped, lead kept")
+
+def make_article(rng, paragraphs):
+    name, _ = rng.choice(COMPANIES)
+    body = [' '.join(_fill(rng.choice(SENTENCES), rng, name) for _ in range(rng.randint(2, 5)))
+            for _ in range(paragraphs)]
+    domain = rng.choice(list(BOILERPLATE))
+    for line in BOILERPLATE[domain]:
+        body.insert(rng.randint(1, len(body)), _fill(line, rng, name))
+    for _ in range(max(1, paragraphs // 8)):
+        body.insert(rng.randint(1, len(body)), f"{rng.choice(COMPANIES)[0]} shares in focus after Q{rng.randint(1, 4)} results")
+    body.insert(rng.randint(1, len(body)), body[rng.randint(1, len(body) - 1)])
+    return '\n\n'.join(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=int, default=1200)
+    parser.add_argument('--articles', type=int, default=50)
+    args = parser.parse_args()
+
+    check_pipeline_path()
+    rng = random.Random(17)
+    for label, paragraphs in (('short report', 6), ('long report', 25), ('live blog', 120)):
+        articles = [make_article(rng, paragraphs) for _ in range(args.articles)]
+        before = after = 0
+        start = time.perf_counter()
+        for article in articles:
+            condensed, stats = condense(article, args.budget)
+            before += stats['original_tokens']
+            after += stats['condensed_tokens']
+            lead = article.split('\n\n', 1)[0]
+            assert condensed.startswith(lead.split('. ')[0]), 'lead dropped'
+        elapsed = time.perf_counter() - start
+        print(f"{label:12s} {before / len(articles):7.0f} -> {after / len(articles):6.0f} tokens "
+              f"({1 - after / before:5.1%} saved), {elapsed / len(articles) * 1000:5.2f} ms per article")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark of the near-duplicate guard on generated output.
+
+Fills a scratch database with --history post and reply bodies spread over
+--topics topics, then times what a 100-post output file costs at save time
+(fingerprint_posts, 100 posts with 5 replies each) and at publish time
+(check_publish). A quarter of the new posts repeat a historical or earlier
+post with a sentence added, and should all be caught.
+
+First checks that write_output names sort in write order, even with a dozen
+written in the same second, and that only files written earlier are
+candidates: re-indexing an old file must not flag it as a copy of a newer one.
+
+    python benchmarks/bench_content_dedup.py --history 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench_near_dup import make_article, scratch_db
+import content_dedup
+import content_index
+import jobs
+import near_dup
+
+REPLIES = [
+    "Strong numbers this quarter, margins held up better than the street expected.",
+    "I would wait for the management commentary before adding more at these levels.",
+    "Valuations look stretched after the run up, a correction would be healthy here.",
+    "Order book visibility is good and the balance sheet is clean, holding for the long term.",
+    "FII selling has been relentless, retail is absorbing it for now but for how long.",
+]
+
+NEW_FILE = 'output_20241018_120000.json'
+
+def check_write_order(output_dir):
+    written = [os.path.basename(jobs.write_output({'posts': []}, output_dir)) for _ in range(12)]
+    assert sorted(written) == written, f'names out of write order: {written}'
+    print(f"names: {len(written)} output files sort in the order they were written")
+
+def check_only_earlier_files(rng):
+    text = make_article(rng, 5)
+    older = content_dedup.fingerprint_posts('output_20241017_080000.json', [{'topic': 'ORDER', 'content': text}])
+    newer = content_dedup.fingerprint_posts('output_20241017_080000_002.json', [{'topic': 'ORDER', 'content': text}])
+    content_dedup.db.index_output_file('output_20241017_080000.json', 0, '', 0, fingerprints=older)
+    content_dedup.db.index_output_file('output_20241017_080000_002.json', 0, '', 0, fingerprints=newer)
+    again = content_dedup.fingerprint_posts('output_20241017_080000.json', [{'topic': 'ORDER', 'content': text}])
+    newer = content_dedup.fingerprint_posts('output_20241017_080000_002.json', [{'topic': 'ORDER', 'content': text}])
+    assert again[0]['duplicate_of'] is None, 'older file flagged against a newer one'
+    assert newer[0]['duplicate_of'] is not None, 'newer file not flagged against the older one'
+    print("order: older files are never flagged against newer ones")
+
+def random_signature(rng):
+    return array('I', (rng.getrandbits(32) for _ in range(near_dup.NUM_HASHES)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=50000)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    topics = [f'TOPIC{i}' for i in range(args.topics)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_db = scratch_db(os.path.join(tmp, 'bench.db'))
+        content_dedup.db = bench_db
+        content_index.db = bench_db
+        check_write_order(os.path.join(tmp, 'outputs'))
+        check_only_earlier_files(rng)
+
+        # History: random signatures stand in for old bodies, plus a few real
+        # published posts for the new batch to repeat
+        published = [(rng.choice(topics), make_article(rng, 5)) for _ in range(20)]
+        rows = []
+        for i in range(args.history):
+            sig = random_signature(rng)
+            rows.append({'filename': f'output_20240101_{i // 100:06d}.json', 'post_index': i % 100, 'comment_index': -1,
+                         'topic': rng.choice(topics), 'signature': sig.tobytes(),
+                         'band_keys': near_dup.band_keys(sig), 'published': 1})
+        for i, (topic, text) in enumerate(published):
+            sig = near_dup.signature(text, min_words=content_dedup.MIN_WORDS)
+            rows.append({'filename': 'output_20240601_090000.json', 'post_index': i, 'comment_index': -1,
+                         'topic': topic, 'signature': sig.tobytes(),
+                         'band_keys': near_dup.band_keys(sig), 'published': 1})
+        conn = bench_db._get_conn()
+        with conn:
+            conn.executemany('''
+                INSERT INTO content_fingerprints (filename, post_index, comment_index, topic, signature, published)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(r['filename'], r['post_index'], r['comment_index'], r['topic'], r['signature'], r['published'])
+                  for r in rows])
+            conn.executemany('''
+                INSERT INTO content_bands (filename, post_index, comment_index, band, topic, band_key)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(r['filename'], r['post_index'], r['comment_index'], band, r['topic'], key)
+                  for r in rows for band, key in enumerate(r['band_keys'])])
+
+        posts = []
+        expected = 0
+        for i in range(args.batch):
+            if i % 4 == 0:
+                topic, text = rng.choice(published)
+                text += ' Traders will watch the next session closely.'
+                expected += 1
+            else:
+                topic, text = rng.choice(topics), make_article(rng, 5)
+            posts.append({'topic': topic, 'content': text,
+                          'comments': [{'body': rng.choice(REPLIES)} for _ in range(5)]})
+
+        content_dedup._signature.cache_clear()
+        start = time.perf_counter()
+        fingerprints = content_dedup.fingerprint_posts(NEW_FILE, posts)
+        elapsed = time.perf_counter() - start
+        flagged = sum(1 for row in fingerprints if row['duplicate_of'] and row['comment_index'] == -1)
+        print(f"save:    {elapsed * 1000:7.1f} ms for {len(fingerprints)} bodies against {args.history} "
+              f"historical ones, {flagged} posts flagged ({expected} planted)")
+
+        content_dedup._signature.cache_clear()
+        start = time.perf_counter()
+        matches = content_dedup.check_publish([(NEW_FILE, i, post) for i, post in enumerate(posts)])
+        elapsed = time.perf_counter() - start
+        print(f"publish: {elapsed * 1000:7.1f} ms for {len(posts)} posts, "
+              f"{sum(1 for match in matches if match)} blocked under 'block'")
+
+if __name__ == '__main__':
+    main()
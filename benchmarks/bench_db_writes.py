@@ -0,0 +1,129 @@
+"""
+Benchmark of extracted_articles writes from concurrent workers, in rows/sec
+at 1, 8 and 32 writer threads, each writing --rows / writers article rows
+of about 3 KB into a scratch database:
+
+    before  save_article per row with synchronous=FULL, the old connection default
+    row     save_article per row with the tuned pragmas
+    bulk    save_articles, --chunk rows per transaction
+    writer  save_article per row through the batch writer thread, timed until flushed
+
+First checks that two Database instances on one thread write to their own
+files, and that a batch the writer fails to commit is queued again, behind
+newer rows for the same keys, and written on the next flush.
+
+    python benchmarks/bench_db_writes.py --rows 4000 --writers 1 8 32
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench_near_dup import make_article
+import database
+from database import Database
+
+MODES = ('before', 'row', 'bulk', 'writer')
+
+def make_rows(count, rng):
+    texts = [make_article(rng, 20) for _ in range(50)]
+    return [(f'https://example.com/news/{i}.html', f'Headline {i}', texts[i % len(texts)],
+             None, None, len(texts[i % len(texts)])) for i in range(count)]
+
+def check_instances_isolated(tmp):
+    first = Database(os.path.join(tmp, 'first.db'), write_batching=False)
+    second = Database(os.path.join(tmp, 'second.db'), write_batching=False)
+    first.save_article('https://example.com/first.html', 'first', 'text')
+    second.save_article('https://example.com/second.html', 'second', 'text')
+    for bench_db, url in ((first, 'https://example.com/first.html'), (second, 'https://example.com/second.html')):
+        urls = [row[0] for row in bench_db._get_conn().execute('SELECT url FROM extracted_articles')]
+        assert urls == [url], f'{bench_db.db_path}: {urls}'
+    print("instances: each Database writes to its own file on a shared thread")
+
+def check_failed_batch_requeued(path):
+    bench_db = Database(path, write_batching=True)
+    bench_db.writer.interval = 3600  # Flush by hand only
+    write_batch = bench_db.write_batch
+    bench_db.save_article('https://example.com/a.html', 'old title', 'old text')
+    bench_db.save_article('https://example.com/b.html', 'b', 'b text')
+
+    def failing_write(articles, posts):
+        # Another worker rewrites a.html while the batch is being written
+        bench_db.save_article('https://example.com/a.html', 'new title', 'new text')
+        raise sqlite3.OperationalError('database is locked')
+
+    bench_db.write_batch = failing_write
+    try:
+        bench_db.writer.flush()
+        raise AssertionError('flush() should raise when the write fails')
+    except sqlite3.OperationalError:
+        pass
+    assert bench_db.writer.failures == 1
+    assert bench_db.get_article('https://example.com/b.html')['title'] == 'b', 'failed row no longer served'
+    assert bench_db.get_article('https://example.com/a.html')['title'] == 'new title', 'newer row overwritten'
+
+    bench_db.write_batch = write_batch
+    assert bench_db.writer.flush() == 2 and bench_db.writer.failures == 0
+    titles = dict(bench_db._get_conn().execute('SELECT url, title FROM extracted_articles').fetchall())
+    assert titles == {'https://example.com/a.html': 'new title', 'https://example.com/b.html': 'b'}, titles
+    print("failed batch: queued again behind newer rows and written on the next flush")
+
+def run(mode, rows, writers, chunk, path):
+    database.SQLITE_SYNCHRONOUS = 'FULL' if mode == 'before' else 'NORMAL'
+    bench_db = Database(path, write_batching=(mode == 'writer'))
+    bench_db._get_conn()  # Create the schema outside the timing
+    shares = [rows[i::writers] for i in range(writers)]
+    barrier = threading.Barrier(writers + 1)
+
+    def write(share):
+        barrier.wait()
+        if mode == 'bulk':
+            for i in range(0, len(share), chunk):
+                bench_db.save_articles(share[i:i + chunk])
+        else:
+            for row in share:
+                bench_db.save_article(*row)
+
+    threads = [threading.Thread(target=write, args=(share,)) for share in shares]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    if bench_db.writer:
+        bench_db.writer.flush()
+    elapsed = time.perf_counter() - start
+
+    written = bench_db._get_conn().execute('SELECT COUNT(*) FROM extracted_articles').fetchone()[0]
+    assert written == len(rows), f'{mode}: {written} of {len(rows)} rows written'
+    return len(rows) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=4000)
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--chunk', type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, random.Random(23))
+    with tempfile.TemporaryDirectory() as tmp:
+        check_instances_isolated(tmp)
+        check_failed_batch_requeued(os.path.join(tmp, 'requeue.db'))
+    print(f"{'writers':>8s}" + ''.join(f"{mode:>12s}" for mode in MODES) + "   rows/sec")
+    with tempfile.TemporaryDirectory() as tmp:
+        for writers in args.writers:
+            results = [run(mode, rows, writers, args.chunk, os.path.join(tmp, f'{mode}_{writers}.db'))
+                       for mode in MODES]
+            print(f"{writers:8d}" + ''.join(f"{rate:12.0f}" for rate in results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Docs/sec benchmark of the lxml extraction engine against the previous
+BeautifulSoup(html.parser) implementation of extract_article.
+
+Runs over a directory of saved pages (*.html) when --corpus is given,
+otherwise over deterministic synthetic pages from synthetic_pages.py.
+Both engines' cleaned output is compared, ignoring line breaks (lxml keeps
+one per paragraph, the old engine collapsed them), so regressions show up
+as mismatches.
+
+    python benchmarks/bench_html_extract.py --pages 40
+    python benchmarks/bench_html_extract.py --corpus path/to/saved/pages
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup
+
+from html_extract import extract_content
+from news_scraper import clean_article_text, get_source_config
+from synthetic_pages import make_page
+
+def legacy_extract(html):
+    """The BeautifulSoup extraction extract_article used before html_extract"""
+    soup = BeautifulSoup(html, 'html.parser')
+    article_text = ""
+    content_selectors = [
+        'article', '.article-content', '.story-content',
+        '[itemprop="articleBody"]', '.entry-content',
+        '#article-content', '.content-body'
+    ]
+    for selector in content_selectors:
+        content = soup.select_one(selector)
+        if content:
+            article_text = content.get_text(separator='\n').strip()
+            break
+    if not article_text:
+        return None
+
+    title = ""
+    title_selectors = ['h1', '[itemprop="headline"]', '.article-title', '.entry-title']
+    for selector in title_selectors:
+        title_elem = soup.select_one(selector)
+        if title_elem:
+            title = title_elem.get_text().strip()
+            break
+    return {"title": title, "text": article_text}
+
+def load_corpus(args):
+    """Return a list of (url, html) pairs"""
+    if args.corpus:
+        pages = []
+        for path in sorted(Path(args.corpus).glob('**/*.html')):
+            # Saved pages are named after their host, e.g. www.livemint.com/...
+            url = f"https://{path.relative_to(args.corpus).as_posix()}"
+            pages.append((url, path.read_text(encoding='utf-8', errors='replace')))
+        return pages
+    pages = []
+    for index in range(args.pages):
+        domain, path, _, html = make_page(index)
+        pages.append((f"https://www.{domain}{path}", html))
+    return pages
+
+def run(engine, pages):
+    results = []
+    start = time.perf_counter()
+    for url, html in pages:
+        extracted = engine(html)
+        if extracted:
+            patterns = get_source_config(url)['remove_patterns']
+            extracted = {"title": extracted['title'], "text": clean_article_text(extracted['text'], patterns)}
+        results.append(extracted)
+    return time.perf_counter() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='directory of saved .html pages')
+    parser.add_argument('--pages', type=int, default=40, help='number of synthetic pages without --corpus')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args)
+    total_mb = sum(len(html.encode('utf-8')) for _, html in pages) / 1e6
+    print(f"corpus: {len(pages)} pages, {total_mb:.1f} MB")
+
+    timings = {}
+    outputs = {}
+    for name, engine in (('beautifulsoup', legacy_extract), ('lxml', extract_content)):
+        best = None
+        for _ in range(args.repeat):
+            elapsed, results = run(engine, pages)
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+        outputs[name] = results
+        print(f"{name:<15}{best:>8.3f}s{len(pages) / best:>10.1f} docs/s{total_mb / best:>10.1f} MB/s")
+
+    print(f"speedup: {timings['beautifulsoup'] / timings['lxml']:.1f}x")
+    def words(result):
+        return result and {"title": result['title'], "text": ' '.join(result['text'].split())}
+
+    mismatches = [url for (url, _), old, new in zip(pages, outputs['beautifulsoup'], outputs['lxml'])
+                  if words(old) != words(new)]
+    print(f"output mismatches: {len(mismatches)}")
+    for url in mismatches[:10]:
+        print(f"  {url}")
+
+if __name__ == '__main__':
+    main()
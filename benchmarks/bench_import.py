@@ -0,0 +1,84 @@
+"""
+Import-time benchmark: how long a fresh worker takes to import each entry
+module, and which imports that time goes to.
+
+Each module is imported --runs times in a fresh interpreter with
+`python -X importtime`, from an empty working directory and with
+DATABASE_PATH pointing into it. Reports the median total, the heaviest
+imports by cumulative time (from the median run), and any files the import
+created; importing must not touch the database or outputs/.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --modules app main --top 25 --output benchmarks/results/importtime.txt
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# import time: self [us] | cumulative | imported package
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+def import_profile(module):
+    """One cold import in a fresh interpreter: (total us, [(cumulative us, self us, depth, name)], files created)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=str(ROOT), DATABASE_PATH=os.path.join(tmp, 'bench.db'),
+                   PYTHONDONTWRITEBYTECODE='1')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=tmp, env=env, capture_output=True, text=True
+        )
+        if result.returncode:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        created = sorted(os.listdir(tmp))
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((int(cumulative), int(own), (len(indent) - 1) // 2, name))
+    total = next(cumulative for cumulative, _, _, name in reversed(rows) if name == module)
+    return total, rows, created
+
+def report(module, runs, top):
+    profiles = sorted((import_profile(module) for _ in range(runs)), key=lambda profile: profile[0])
+    total, rows, created = profiles[len(profiles) // 2]
+    lines = [
+        f"import {module}: median {total / 1000:.1f} ms over {runs} runs "
+        f"(min {profiles[0][0] / 1000:.1f} ms, max {profiles[-1][0] / 1000:.1f} ms)",
+        f"  files created: {', '.join(created) if created else 'none'}",
+        f"  {'cumulative':>10s} {'self':>9s}  module",
+    ]
+    for cumulative, own, depth, name in sorted(rows, reverse=True)[1:top + 1]:
+        lines.append(f"  {cumulative / 1000:8.1f}ms {own / 1000:7.1f}ms  {'  ' * max(depth - 1, 0)}{name}")
+    return lines, created
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=['app', 'main', 'database', 'news_scraper'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', help='also write the report to this file')
+    args = parser.parse_args()
+
+    lines = [f"Python {sys.version.split()[0]}, {args.runs} cold imports per module", ""]
+    side_effects = False
+    for module in args.modules:
+        module_lines, created = report(module, args.runs, args.top)
+        lines += module_lines + [""]
+        side_effects = side_effects or bool(created)
+    text = '\n'.join(lines)
+    print(text)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text)
+    if side_effects:
+        sys.exit("Importing created files; imports should have no side effects")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark of reading every article and generated post: the old SELECT * and
+fetchall() into a list against streaming with iter_articles/iter_posts, with
+and without the large text/output columns.
+
+Fills a scratch database with --articles articles of about 3 KB and as many
+generated posts, then reports time and peak Python memory (tracemalloc)
+for a pass over each table.
+
+First checks that paging returns every row exactly once at the page
+boundaries: page sizes around the row count, and rows sharing a timestamp
+(and, for posts, a URL) across a page break.
+
+    python benchmarks/bench_iter.py --articles 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench_near_dup import make_article
+from database import Database
+
+def check_keyset_boundaries(path):
+    check_db = Database(path)
+    rows = 12
+    check_db.save_articles([(f'https://example.com/{i}.html', f'Headline {i}', 'text', None, None, None)
+                            for i in range(rows)])
+    check_db.save_generated_posts([(f'https://example.com/{i // 3}.html', f'TOPIC{i % 3}', '{}') for i in range(rows)])
+    conn = check_db._get_conn()
+    with conn:
+        # Two timestamps only, so most page breaks fall between equal ones
+        conn.execute("UPDATE extracted_articles SET extracted_at = "
+                     "CASE WHEN rowid % 2 THEN '2024-01-01 09:00:00' ELSE '2024-01-01 10:00:00' END")
+        conn.execute("UPDATE generated_posts SET created_at = '2024-01-01 09:00:00'")
+    articles = sorted(f'https://example.com/{i}.html' for i in range(rows))
+    posts = sorted((f'https://example.com/{i // 3}.html', f'TOPIC{i % 3}') for i in range(rows))
+    for page_size in (1, 2, 5, rows - 1, rows, rows + 1):
+        seen = [row['url'] for row in check_db.iter_articles(('url',) if page_size % 2 else None, page_size=page_size)]
+        assert sorted(seen) == articles, f'articles, page_size {page_size}: {len(seen)} rows'
+        seen = [(row['url'], row['topic']) for row in check_db.iter_posts(('url', 'topic'), page_size=page_size)]
+        assert sorted(seen) == posts, f'posts, page_size {page_size}: {len(seen)} rows'
+    on_the_hour = list(check_db.iter_articles(('url',), extracted_from='2024-01-01 10:00:00', page_size=rows // 2))
+    assert len(on_the_hour) == rows // 2, f'{len(on_the_hour)} articles at 10:00'
+    print(f"keyset paging: {rows} rows each returned once at every page size from 1 to {rows + 1}")
+
+def measure(label, func):
+    # Timed without tracemalloc, which slows every allocation down
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:38s} {count:7d} rows {elapsed * 1000:8.1f} ms  peak {peak / 1024 / 1024:7.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=20000)
+    parser.add_argument('--page-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_keyset_boundaries(os.path.join(tmp, 'check.db'))
+
+    rng = random.Random(5)
+    texts = [make_article(rng, 20) for _ in range(100)]
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_db = Database(os.path.join(tmp, 'bench.db'))
+        bench_db.save_articles([(f'https://example.com/{i}.html', f'Headline {i}', texts[i % 100], None, None, None)
+                                for i in range(args.articles)])
+        bench_db.save_generated_posts([
+            (f'https://example.com/{i}.html', rng.choice(['NIFTY', 'RELIANCE', 'TCS', 'INFY']),
+             json.dumps({'posts': [{'content': texts[i % 100][:1500], 'comments': [{'body': texts[(i + 1) % 100][:300]}] * 5}]}))
+            for i in range(args.articles)
+        ])
+        conn = bench_db._get_conn()
+
+        measure('articles: SELECT * fetchall (before)',
+                lambda: len([dict(row) for row in conn.execute('SELECT * FROM extracted_articles').fetchall()]))
+        measure('articles: iter_articles()',
+                lambda: sum(1 for _ in bench_db.iter_articles(page_size=args.page_size)))
+        measure('articles: iter_articles(url, title)',
+                lambda: sum(1 for _ in bench_db.iter_articles(('url', 'title'), page_size=args.page_size)))
+        measure('posts: SELECT * fetchall (before)',
+                lambda: len([dict(row) for row in conn.execute('SELECT * FROM generated_posts').fetchall()]))
+        measure('posts: iter_posts()',
+                lambda: sum(1 for _ in bench_db.iter_posts(page_size=args.page_size)))
+        measure('posts: iter_posts(url, topic)',
+                lambda: sum(1 for _ in bench_db.iter_posts(('url', 'topic'), page_size=args.page_size)))
+        measure('posts: iter_posts(url, topic=NIFTY)',
+                lambda: sum(1 for _ in bench_db.iter_posts(('url',), topic='NIFTY', page_size=args.page_size)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark of near-duplicate detection against a large signature archive.
+
+First checks find_duplicate on known pairs: a copy with a new byline and
+disclaimer and one with its last sentences dropped are caught, while a
+different article on the same company, a text too short to sign, the
+article itself and a copy outside the window are not. Then reports how
+syndicated copies and different articles score against
+NEAR_DUP_THRESHOLD over 100 random articles, fills a scratch database with
+--articles signatures processed over the last week and times
+find_duplicate's lookup for copies and for unrelated articles.
+
+    python benchmarks/bench_near_dup.py --articles 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from synthetic_pages import COMPANIES, SENTENCES, _fill
+from database import Database
+import near_dup
+
+def make_article(rng, sentences=25):
+    name, _ = rng.choice(COMPANIES)
+    return ' '.join(_fill(rng.choice(SENTENCES), rng, name) for _ in range(sentences))
+
+def scratch_db(path):
+    return Database(path)
+
+def syndicated_copy(article, rng):
+    if rng.random() < 0.5:
+        return 'By Staff Writer. ' + article + ' (With inputs from PTI). Disclaimer: views are personal.'
+    return '. '.join(article.split('. ')[:-3])
+
+def mutate(sig, changes, rng):
+    """A stored signature with a few hashes changed, like a lightly edited copy"""
+    sig = array('I', sig)
+    for index in rng.sample(range(near_dup.NUM_HASHES), changes):
+        sig[index] = rng.getrandbits(32)
+    return sig
+
+def check_known_pairs(path):
+    rng = random.Random(15)
+    near_dup.db = check_db = scratch_db(path)
+    now = time.time()
+    article = make_article(rng)
+    near_dup.remember('https://example.com/original', near_dup.signature(article), now)
+    near_dup.remember('https://example.com/old', near_dup.signature(article + ' Old.'),
+                      now - (near_dup.NEAR_DUP_WINDOW_HOURS + 1) * 3600)
+
+    def match(text, url='https://example.com/new'):
+        found = near_dup.find_duplicate(url, near_dup.signature(text), now)
+        return found and found['url']
+
+    byline = 'By Staff Writer. ' + article + ' (With inputs from PTI). Disclaimer: views are personal.'
+    assert match(byline) == 'https://example.com/original', 'byline copy missed'
+    assert match('. '.join(article.split('. ')[:-3])) == 'https://example.com/original', 'trimmed copy missed'
+    assert near_dup.similarity(near_dup.signature(article), near_dup.signature(article)) == 1.0
+
+    name = next(name for name, _ in COMPANIES if name in article)
+    different = ' '.join(_fill(rng.choice(SENTENCES), rng, name) for _ in range(25))
+    assert match(different) is None, 'different article on the same company flagged'
+    short = ' '.join(article.split()[:20])
+    assert near_dup.signature(short) is None and match(short) is None, 'text under MIN_WORDS matched'
+    assert match(article, url='https://example.com/original') is None, 'article matched itself'
+    assert match(article + ' Old.', url='https://example.com/original') is None, 'copy outside the window matched'
+    print("known pairs: copies caught; different, short, self and expired ones not")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_known_pairs(os.path.join(tmp, 'check.db'))
+
+    rng = random.Random(5)
+
+    copies = []
+    others = []
+    for _ in range(100):
+        article = make_article(rng)
+        sig = near_dup.signature(article)
+        copies.append(near_dup.similarity(sig, near_dup.signature(syndicated_copy(article, rng))))
+        others.append(near_dup.similarity(sig, near_dup.signature(make_article(rng))))
+    threshold = near_dup.NEAR_DUP_THRESHOLD
+    print(f"Syndicated copies: min {min(copies):.2f}, {sum(s >= threshold for s in copies)}/100 caught; "
+          f"different articles: max {max(others):.2f}, {sum(s >= threshold for s in others)}/100 flagged "
+          f"(threshold {threshold})")
+
+    start = time.perf_counter()
+    for _ in range(200):
+        near_dup.signature(article)
+    print(f"signature: {(time.perf_counter() - start) / 200 * 1000:.2f} ms per {len(article.split())}-word article")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_db = scratch_db(os.path.join(tmp, 'bench.db'))
+        now = time.time()
+        signatures = [array('I', (rng.getrandbits(32) for _ in range(near_dup.NUM_HASHES)))
+                      for _ in range(args.articles)]
+        ages = [rng.uniform(0, 7 * 86400) for _ in signatures]
+        conn = bench_db._get_conn()
+        with conn:
+            conn.executemany(
+                'INSERT INTO article_fingerprints (url, signature, processed_at) VALUES (?, ?, ?)',
+                [(f'https://example.com/{i}', sig.tobytes(), now - age) for i, (sig, age) in enumerate(zip(signatures, ages))]
+            )
+            conn.executemany(
+                'INSERT INTO article_bands (url, band, band_key, processed_at) VALUES (?, ?, ?, ?)',
+                [(f'https://example.com/{i}', band, key, now - age)
+                 for i, (sig, age) in enumerate(zip(signatures, ages))
+                 for band, key in enumerate(near_dup.band_keys(sig))]
+            )
+
+        window = near_dup.NEAR_DUP_WINDOW_HOURS * 3600
+        recent = [sig for sig, age in zip(signatures, ages) if age < window]
+        near_dup.db = bench_db
+        for label, queries in (
+            ('syndicated copy', [mutate(rng.choice(recent), rng.randint(0, 12), rng) for _ in range(args.lookups)]),
+            ('unrelated', [array('I', (rng.getrandbits(32) for _ in range(near_dup.NUM_HASHES)))
+                           for _ in range(args.lookups)]),
+        ):
+            start = time.perf_counter()
+            found = sum(1 for sig in queries if near_dup.find_duplicate(None, sig, now))
+            elapsed = time.perf_counter() - start
+            print(f"{label:16s} {elapsed / len(queries) * 1e6:7.1f} us per lookup over {args.articles} articles, "
+                  f"{found}/{len(queries)} matched")
+
+if __name__ == '__main__':
+    main()
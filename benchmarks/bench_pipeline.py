@@ -0,0 +1,323 @@
+"""
+Offline end-to-end benchmark of process_article.
+
+Article pages are replayed by a local fixture server that acts as an HTTP
+proxy: articles are requested over http:// with HTTP_PROXY pointing at it,
+so the original host reaches the per-site rules unchanged. Pages recorded
+into benchmarks/fixtures (see --record) are served for their URLs; every
+other URL gets a synthetic page. LLM calls go to the fake provider with
+--post-latency and --reply-latency. Everything is written to a scratch
+database, and each concurrency level uses fresh URLs with the LLM cache off,
+so nothing is served from a cache.
+
+Per-stage time is exclusive (a stage's time excludes the stages it calls):
+fetch, parse, clean, dedup, condense, topic, post, replies, format,
+db_read and db_save. Results, including end-to-end throughput per
+concurrency level, go to --output as JSON for diffing between releases.
+
+    python benchmarks/bench_pipeline.py --articles 30 --concurrency 1 4 8
+    python benchmarks/bench_pipeline.py --record    # refresh fixtures from test_articles.csv (needs network)
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+MANIFEST = FIXTURES / 'manifest.json'
+sys.path.insert(0, str(ROOT))
+
+from synthetic_pages import make_page
+
+STAGES = ('fetch', 'parse', 'clean', 'dedup', 'condense', 'topic', 'post', 'replies', 'format', 'db_read', 'db_save')
+
+def read_csv_rows(path=ROOT / 'test_articles.csv'):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [(row['url'].strip(), row['topic'].strip() or None) for row in csv.DictReader(f) if row.get('url')]
+
+def record_fixtures():
+    """Fetch the URLs in test_articles.csv and save them under fixtures/ with a manifest"""
+    import requests
+    from source_rules import DEFAULT_USER_AGENT
+    manifest = json.loads(MANIFEST.read_text()) if MANIFEST.exists() else {}
+    for url, _ in read_csv_rows():
+        parts = urlsplit(url)
+        name = f"{parts.hostname}/{parts.path.strip('/').replace('/', '_') or 'index'}.html"
+        try:
+            response = requests.get(url, headers={'User-Agent': DEFAULT_USER_AGENT}, timeout=20)
+        except requests.RequestException as e:
+            print(f"skip {url}: {e}")
+            continue
+        if response.status_code != 200:
+            print(f"skip {url}: HTTP {response.status_code}")
+            continue
+        path = FIXTURES / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(response.content)
+        manifest[url] = name
+        print(f"recorded {url} ({len(response.content)} bytes)")
+    FIXTURES.mkdir(exist_ok=True)
+    MANIFEST.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+def build_corpus(count):
+    """[(url, topic)] and {(host, path): html bytes}: CSV rows first, then synthetic pages"""
+    manifest = json.loads(MANIFEST.read_text()) if MANIFEST.exists() else {}
+    rows = []
+    pages = {}
+    recorded = 0
+    for index, (url, topic) in enumerate(read_csv_rows()[:count]):
+        parts = urlsplit(url)
+        if url in manifest and (FIXTURES / manifest[url]).exists():
+            html = (FIXTURES / manifest[url]).read_bytes()
+            recorded += 1
+        else:
+            html = make_page(index)[3].encode('utf-8')
+        pages[(parts.hostname, parts.path)] = html
+        rows.append((f"http://{parts.hostname}{parts.path}", topic))
+    index = len(rows)
+    while len(rows) < count:
+        domain, path, _, html = make_page(index)
+        pages[(domain, path)] = html.encode('utf-8')
+        rows.append((f"http://{domain}{path}", None))
+        index += 1
+    return rows, pages, recorded
+
+class FixtureProxy(BaseHTTPRequestHandler):
+    """Answers proxied GETs (absolute URLs) from the fixture pages"""
+    protocol_version = 'HTTP/1.1'
+    pages = {}
+    latency = 0.0
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        body = self.pages.get((parts.hostname, parts.path))
+        time.sleep(self.latency)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(pages, latency):
+    handler = type('Handler', (FixtureProxy,), {'pages': pages, 'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class StageTimer:
+    """
+    Exclusive wall time per stage: nested stages are subtracted from their
+    caller. Inclusive time is kept in wall for end-to-end latency.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.wall = defaultdict(list)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.samples[stage].append(elapsed - children)
+                    self.wall[stage].append(elapsed)
+        return timed
+
+    def reset(self):
+        with self._lock:
+            self.samples = defaultdict(list)
+            self.wall = defaultdict(list)
+
+class TimedSession:
+    def __init__(self, session, timer):
+        self._session = session
+        self.get = timer.wrap('fetch', session.get)
+
+def instrument(timer):
+    """Wrap the pipeline's stage functions where process_article looks them up"""
+    import main
+    import near_dup
+    import news_scraper
+    from database import Database
+    from source_rules import SourceRules
+
+    get_session = news_scraper.get_session
+    news_scraper.get_session = lambda *args, **kwargs: TimedSession(get_session(*args, **kwargs), timer)
+    news_scraper.extract_content = timer.wrap('parse', news_scraper.extract_content)
+    SourceRules.clean = timer.wrap('clean', SourceRules.clean)
+    near_dup.signature = timer.wrap('dedup', near_dup.signature)
+    near_dup.find_duplicate = timer.wrap('dedup', near_dup.find_duplicate)
+    main.condense = timer.wrap('condense', main.condense)
+    main.extract_topic_from_content = timer.wrap('topic', main.extract_topic_from_content)
+    main.generate_post = timer.wrap('post', main.generate_post)
+    main.generate_comments = timer.wrap('replies', main.generate_comments)
+    main.create_formatted_output = timer.wrap('format', main.create_formatted_output)
+    for name in ('get_article', 'get_generated_post', 'get_latest_generated_post', 'find_fingerprints'):
+        setattr(Database, name, timer.wrap('db_read', getattr(Database, name)))
+    for name in ('save_article', 'touch_article', 'save_generated_post', 'save_fingerprint', 'save_condensation'):
+        setattr(Database, name, timer.wrap('db_save', getattr(Database, name)))
+    return timer.wrap('total', main.process_article)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def summarise(timer, articles):
+    stages = {}
+    for stage in STAGES:
+        samples = timer.samples.get(stage, [])
+        stages[stage] = {
+            'calls': len(samples),
+            'total_seconds': round(sum(samples), 4),
+            'per_article_ms': round(sum(samples) / articles * 1000, 3) if articles else 0.0,
+            'p50_ms': round(percentile(samples, 50) * 1000, 3),
+            'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        }
+    return stages
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--per-domain', type=int, default=4, help='concurrent fetches per site')
+    parser.add_argument('--fetch-latency', type=float, default=0.05, help='seconds the fixture server waits per page')
+    parser.add_argument('--post-latency', type=float, default=0.5, help='seconds per fake post generation')
+    parser.add_argument('--reply-latency', type=float, default=0.3, help='seconds per fake reply call')
+    parser.add_argument('--output', default=str(Path(__file__).resolve().parent / 'results' / 'pipeline.json'))
+    parser.add_argument('--record', action='store_true', help='record test_articles.csv pages into fixtures/ and exit')
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures()
+        return
+
+    rows, pages, recorded = build_corpus(args.articles)
+    server = start_fixture_server(pages, args.fetch_latency)
+    proxy = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Configuration is read at import time, so set it before importing the pipeline
+        os.environ.update({
+            'DATABASE_PATH': os.path.join(tmp, 'bench.db'),
+            'HTTP_PROXY': proxy, 'http_proxy': proxy, 'NO_PROXY': '', 'no_proxy': '',
+            'LLM_CACHE_ENABLED': 'false',
+            'NEAR_DUP_ACTION': 'flag',
+        })
+        import llm
+        from workers import get_domain, run_ordered
+
+        llm.PROVIDERS['fake-post'] = lambda: llm.FakeProvider(latency=args.post_latency, max_concurrency=64)
+        llm.PROVIDERS['fake-reply'] = lambda: llm.FakeProvider(latency=args.reply_latency, max_concurrency=64)
+        llm.LLM_PROVIDER = None
+        llm.LLM_POST_PROVIDER = 'fake-post'
+        llm.LLM_REPLY_PROVIDER = 'fake-reply'
+
+        timer = StageTimer()
+        process_article = instrument(timer)
+
+        # Warm up imports, connection pools and the topic index outside the measurements
+        for url, topic in rows[:2]:
+            process_article(f"{url}?run=warmup", topic)
+
+        levels = []
+        for concurrency in args.concurrency:
+            timer.reset()
+            batch = [(f"{url}?run={concurrency}", topic) for url, topic in rows]
+            start = time.perf_counter()
+            outcomes = run_ordered(
+                batch,
+                lambda row: process_article(row[0], row[1]),
+                key=lambda row: get_domain(row[0]),
+                max_workers=concurrency,
+                max_per_key=min(args.per_domain, concurrency)
+            )
+            wall = time.perf_counter() - start
+            succeeded = sum(1 for post, _ in outcomes if post and post.get('posts'))
+            latencies = timer.wall.get('total', [])
+            level = {
+                'concurrency': concurrency,
+                'articles': len(batch),
+                'succeeded': succeeded,
+                'wall_seconds': round(wall, 3),
+                'articles_per_second': round(len(batch) / wall, 3),
+                'latency_ms': {
+                    'p50': round(percentile(latencies, 50) * 1000, 1),
+                    'p95': round(percentile(latencies, 95) * 1000, 1),
+                    'max': round(max(latencies, default=0) * 1000, 1),
+                },
+                'stages': summarise(timer, len(batch)),
+            }
+            levels.append(level)
+            print(f"concurrency {concurrency:3d}: {level['articles_per_second']:6.2f} articles/s, "
+                  f"p50 {level['latency_ms']['p50']:.0f} ms, p95 {level['latency_ms']['p95']:.0f} ms, "
+                  f"{succeeded}/{len(batch)} succeeded")
+            for stage, numbers in level['stages'].items():
+                print(f"    {stage:9s} {numbers['per_article_ms']:9.2f} ms/article  "
+                      f"p50 {numbers['p50_ms']:8.2f} ms  p95 {numbers['p95_ms']:8.2f} ms  ({numbers['calls']} calls)")
+
+        from database import db
+        db.close()
+    server.shutdown()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'articles': args.articles,
+            'recorded_fixtures': recorded,
+            'fetch_latency': args.fetch_latency,
+            'post_latency': args.post_latency,
+            'reply_latency': args.reply_latency,
+            'per_domain': args.per_domain,
+        },
+        'levels': levels,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, sort_keys=True))
+    print(f"Results written to {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark of extract_topic_from_content: the topic index against the previous
+per-topic substring and re.sub loops, over generated post texts.
+
+The previous version returned whichever match set iteration reached first, so
+its answers aren't compared; the run checks the index is deterministic and
+reports how often the two agree. First checks ranking on overlapping topic
+names (ACE inside PLACE, M&M inside M&MFIN, BAJAJ and BAJAJ-AUTO, base
+forms) and on ties broken by count, position, length and name.
+
+    python benchmarks/bench_topic_index.py --posts 200
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from synthetic_pages import COMPANIES, SENTENCES, _fill
+from topic_index import TopicIndex, get_topic_index
+
+def check_ranking():
+    index = TopicIndex(['ACE', 'M&M', 'M&MFIN', 'BAJAJ', 'BAJAJ-AUTO', 'BOSCHLTD', 'INFY', 'TCS',
+                        'ABCLTD', 'ABC&CO'])
+    cases = [
+        # Overlapping names: the whole-word match beats the one embedded in it
+        ("M&MFIN raised rates.", ['M&MFIN', 'M&M']),
+        ("M&M and M&MFIN both fell.", ['M&M', 'M&MFIN']),
+        ("A good PLACE to start.", ['ACE']),
+        ("TCS has a PLACE in every portfolio.", ['TCS', 'ACE']),
+        ("BOSCH results beat estimates.", ['BOSCHLTD']),
+        # Ties in tier: more mentions, then earlier, then longer, then name
+        ("TCS rose while INFY and INFY ADRs fell.", ['INFY', 'TCS']),
+        ("TCS and INFY reported.", ['TCS', 'INFY']),
+        ("INFY and TCS reported.", ['INFY', 'TCS']),
+        ("BAJAJ-AUTO sales grew.", ['BAJAJ-AUTO', 'BAJAJ']),
+        ("ABC shares rose.", ['ABC&CO', 'ABCLTD']),
+    ]
+    for content, expected in cases:
+        assert index.rank(content) == expected, f"{content!r}: {index.rank(content)}, expected {expected}"
+    assert index.best("Markets were closed for the holiday.") == "NIFTY"
+    print(f"ranking: {len(cases)} overlap and tie cases as expected")
+
+def legacy_extract_topic(content, available_topics):
+    content_upper = content.upper()
+    for topic in available_topics:
+        if topic in content_upper:
+            return topic
+    content_words = set(re.findall(r'\b[A-Z0-9]+\b', content_upper))
+    for topic in available_topics:
+        base_topic = re.sub(r'(LTD|LIMITED|INDIA|&CO)$', '', topic)
+        if base_topic.strip() in content_words:
+            return topic
+    return "NIFTY"
+
+def make_posts(count, seed=11):
+    rng = random.Random(seed)
+    posts = []
+    for _ in range(count):
+        name, symbol = rng.choice(COMPANIES)
+        sentences = [_fill(rng.choice(SENTENCES), rng, name) for _ in range(rng.randint(4, 10))]
+        if rng.random() < 0.5:
+            sentences.insert(rng.randint(0, len(sentences)), f"{symbol} is on watch.")
+        posts.append(' '.join(sentences))
+    return posts
+
+def time_it(func, posts, topics, repeat):
+    best = None
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(post, topics) for post in posts]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(ROOT / 'topics.json', 'r', encoding='utf-8') as f:
+        topics = frozenset(json.load(f))  # What load_topics returns
+    posts = make_posts(args.posts)
+    check_ranking()
+
+    start = time.perf_counter()
+    TopicIndex(topics)
+    print(f"{len(topics)} topics, index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    legacy_time, legacy = time_it(legacy_extract_topic, posts, set(topics), args.repeat)
+    index_time, indexed = time_it(lambda post, topics: get_topic_index(topics).best(post), posts, topics, args.repeat)
+    print(f"{'legacy loops':<16}{legacy_time * 1000:>9.1f} ms{len(posts) / legacy_time:>10.0f} posts/s")
+    print(f"{'topic index':<16}{index_time * 1000:>9.1f} ms{len(posts) / index_time:>10.0f} posts/s")
+    print(f"speedup: {legacy_time / index_time:.1f}x")
+
+    # Worst case for the old loops: no topic mentioned, so every re.sub runs
+    plain = ["Markets were closed for the holiday." for _ in posts]
+    legacy_miss, _ = time_it(legacy_extract_topic, plain, set(topics), args.repeat)
+    index_miss, _ = time_it(lambda post, topics: get_topic_index(topics).best(post), plain, topics, args.repeat)
+    print(f"no mention: legacy {legacy_miss * 1000:.1f} ms, index {index_miss * 1000:.1f} ms ({legacy_miss / index_miss:.0f}x)")
+
+    # Set iteration order changes with the hash seed; the index must not
+    shuffled = list(topics)
+    random.Random(3).shuffle(shuffled)
+    assert [TopicIndex(shuffled).best(post) for post in posts] == indexed, "topic index isn't deterministic"
+    agree = sum(old == new for old, new in zip(legacy, indexed))
+    print(f"same topic as legacy: {agree}/{len(posts)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark for the concurrent row processing used by /process and /process_selected.
+
+Network and LLM calls are replaced with sleeps so the numbers only reflect
+scheduling. Latencies are given in seconds and can be scaled down with --scale
+to keep the run short.
+
+    python benchmarks/bench_workers.py --rows 50 --workers 1 4 8 16
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from workers import run_ordered, get_domain
+
+DOMAINS = [
+    'www.moneycontrol.com',
+    'economictimes.indiatimes.com',
+    'www.livemint.com',
+    'www.business-standard.com',
+    'www.financialexpress.com',
+    'www.cnbctv18.com',
+]
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    return [
+        (row_num, f"https://{rng.choice(DOMAINS)}/news/markets/story-{row_num}.html", 'NIFTY')
+        for row_num in range(1, count + 1)
+    ]
+
+def make_stub(args):
+    """Return a stand-in for main.process_article with the given latencies"""
+    def process_article(url, topic):
+        time.sleep(args.fetch * args.scale)
+        time.sleep(args.cohere * args.scale)
+        for _ in range(args.replies):
+            time.sleep(args.gemini * args.scale)
+        return {"posts": [{"title": url, "topic": topic}]}
+    return process_article
+
+def run_sequential(rows, process_article):
+    return [process_article(url, topic) for _, url, topic in rows]
+
+def run_pool(rows, process_article, workers, per_domain):
+    outcomes = run_ordered(
+        rows,
+        lambda row: process_article(row[1], row[2]),
+        key=lambda row: get_domain(row[1]),
+        max_workers=workers,
+        max_per_key=per_domain
+    )
+    return [post for post, _ in outcomes]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--per-domain', type=int, default=4)
+    parser.add_argument('--fetch', type=float, default=1.5, help='seconds per article fetch')
+    parser.add_argument('--cohere', type=float, default=4.0, help='seconds per Cohere post')
+    parser.add_argument('--gemini', type=float, default=1.2, help='seconds per Gemini reply')
+    parser.add_argument('--replies', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=0.01, help='multiplier applied to every latency')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.seed)
+    process_article = make_stub(args)
+
+    start = time.perf_counter()
+    expected = run_sequential(rows, process_article)
+    baseline = time.perf_counter() - start
+    print(f"{'mode':<24}{'seconds':>10}{'rows/s':>10}{'speedup':>10}")
+    print(f"{'sequential':<24}{baseline:>10.3f}{len(rows) / baseline:>10.1f}{1.0:>10.1f}")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = run_pool(rows, process_article, workers, args.per_domain)
+        elapsed = time.perf_counter() - start
+        assert results == expected, "results must stay in input order"
+        label = f"pool workers={workers}"
+        print(f"{label:<24}{elapsed:>10.3f}{len(rows) / elapsed:>10.1f}{baseline / elapsed:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Deterministic stand-ins for saved finance news pages.
+
+The pages mimic the markup weight of the real sites (large inline scripts,
+navigation menus, related-story rails, footers) around a short article body,
+so parsing cost is dominated by boilerplate the same way it is in production.
+"""
+import random
+
+COMPANIES = [
+    ('Reliance Industries', 'RELIANCE'), ('HDFC Bank', 'HDFCBANK'), ('Infosys', 'INFY'),
+    ('Tata Consultancy Services', 'TCS'), ('ICICI Bank', 'ICICIBANK'), ('Bajaj Finance', 'BAJFINANCE'),
+    ('State Bank of India', 'SBIN'), ('Larsen & Toubro', 'LT'), ('ITC', 'ITC'), ('Adani Ports', 'ADANIPORTS'),
+]
+
+SENTENCES = [
+    "Shares of {name} rose {pct}% to Rs {price} on the NSE in early trade on {day}.",
+    "The stock has gained {pct2}% over the past month, outperforming the Nifty 50, which rose {pct3}% in the same period.",
+    "Brokerage {broker} maintained a buy rating with a target price of Rs {target}, citing strong order inflows.",
+    "{name} reported a consolidated net profit of Rs {profit} crore for the quarter, up {pct}% year-on-year.",
+    "Revenue from operations stood at Rs {revenue} crore, against Rs {revenue_prev} crore a year ago.",
+    "Analysts expect margins to remain under pressure in the near term due to higher input costs.",
+    "Foreign institutional investors were net buyers of Rs {fii} crore worth of shares on {day}, provisional data showed.",
+    "The company's board also approved an interim dividend of Rs {dividend} per share.",
+    "Management said it expects double-digit growth in the coming financial year, driven by demand in rural markets.",
+    "Trading volumes on the counter were {vol} times the two-week average.",
+]
+
+BOILERPLATE = {
+    'moneycontrol.com': ["Also Read: {headline}", "Disclaimer: The views and investment tips expressed by experts on Moneycontrol are their own.", "Follow us on Twitter and Instagram"],
+    'economictimes.indiatimes.com': ["Download The Economic Times News App to get Daily Market Updates & Live Business News.", "Also Read: {headline}"],
+    'livemint.com': ["Catch all the Business News, Market News, Breaking News Events and Latest News Updates on Live Mint.", "Subscribe to Mint Newsletters"],
+    'business-standard.com': ["Dear Reader, Business Standard has always strived hard to provide up-to-date information.", "Subscribe to Business Standard Premium"],
+    'cnbctv18.com': ["ALSO READ: {headline}", "First Published: {day}"],
+}
+
+# How each site wraps its article body, so every content selector gets exercised
+WRAPPERS = {
+    'moneycontrol.com': ('<div class="content_wrapper arti-flow article-content" id="contentdata">', '</div>'),
+    'economictimes.indiatimes.com': ('<div class="artText" itemprop="articleBody">', '</div>'),
+    'livemint.com': ('<div class="storyPage_storyContent story-content">', '</div>'),
+    'business-standard.com': ('<article class="story">', '</article>'),
+    'cnbctv18.com': ('<div class="entry-content">', '</div>'),
+}
+
+DOMAINS = list(WRAPPERS)
+
+def _fill(template, rng, name):
+    price = rng.randint(100, 4000)
+    revenue = rng.randint(1000, 90000)
+    return template.format(
+        name=name, pct=round(rng.uniform(0.5, 9), 2), pct2=round(rng.uniform(1, 20), 1),
+        pct3=round(rng.uniform(0.1, 5), 1), price=f"{price:,}", target=f"{int(price * 1.2):,}",
+        broker=rng.choice(['Motilal Oswal', 'Jefferies', 'CLSA', 'Nomura', 'Kotak Institutional Equities']),
+        profit=f"{rng.randint(100, 20000):,}", revenue=f"{revenue:,}", revenue_prev=f"{int(revenue * 0.9):,}",
+        fii=f"{rng.randint(100, 5000):,}", dividend=rng.randint(1, 30), vol=rng.randint(2, 9),
+        day=rng.choice(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']),
+        headline=f"{rng.choice(COMPANIES)[0]} shares in focus after Q{rng.randint(1, 4)} results",
+    )
+
+def _script(rng, size):
+    chunk = "window.__analytics=window.__analytics||[];__analytics.push({event:'view',ts:%d,id:'%x'});\n"
+    lines = []
+    total = 0
+    while total < size:
+        line = chunk % (rng.randint(0, 10 ** 9), rng.getrandbits(64))
+        lines.append(line)
+        total += len(line)
+    return "<script>" + "".join(lines) + "</script>"
+
+def _widgets(rng, size):
+    """Market ticker and ad widgets: lots of small nested elements"""
+    parts = []
+    total = 0
+    while total < size:
+        name, symbol = rng.choice(COMPANIES)
+        part = (
+            f'<div class="mkt-widget" data-id="{rng.getrandbits(32)}"><span class="sym">{symbol}</span>'
+            f'<span class="px">{rng.randint(100, 4000)}.{rng.randint(0, 99):02d}</span>'
+            f'<span class="chg {rng.choice(["up", "dn"])}">{round(rng.uniform(-5, 5), 2)}%</span>'
+            f'<a href="/stocks/{symbol.lower()}" title="{name}"><img src="/img/{symbol.lower()}.png" alt=""></a></div>'
+        )
+        parts.append(part)
+        total += len(part)
+    return '<div class="widgets">' + "".join(parts) + '</div>'
+
+def _link_list(rng, css_class, count):
+    items = "".join(
+        f'<li><a href="/news/business/markets/story-{rng.randint(1, 10 ** 7)}.html">{_fill("{headline}", rng, "")}</a></li>'
+        for _ in range(count)
+    )
+    return f'<ul class="{css_class}">{items}</ul>'
+
+def make_page(index, target_bytes=None, seed=7):
+    """Return (domain, path, title, html) for the index-th synthetic page"""
+    rng = random.Random(seed * 100003 + index)
+    domain = DOMAINS[index % len(DOMAINS)]
+    name, symbol = rng.choice(COMPANIES)
+    target_bytes = target_bytes or rng.randint(300_000, 1_000_000)
+
+    title = f"{name} shares jump {round(rng.uniform(1, 9), 1)}% after {rng.choice(['strong Q2', 'robust Q3', 'record Q4'])} earnings"
+    paragraphs = [
+        f"<p>{' '.join(_fill(rng.choice(SENTENCES), rng, name) for _ in range(rng.randint(2, 4)))}</p>"
+        for _ in range(rng.randint(6, 14))
+    ]
+    paragraphs += [f"<p>{_fill(line, rng, name)}</p>" for line in BOILERPLATE.get(domain, [])]
+    paragraphs.insert(3, _script(rng, 2_000))  # Inline embed inside the body
+    opening, closing = WRAPPERS[domain]
+
+    body = (
+        f'<header><nav>{_link_list(rng, "menu", 120)}</nav></header>'
+        f'<div class="breadcrumb"><a href="/">Home</a> &raquo; <a href="/markets">Markets</a></div>'
+        f'<h1 class="article_title artTitle">{title}</h1>'
+        f'<div class="article_schedule"><span>{rng.randint(1, 28)} Oct 2025</span> / <span>{symbol}</span></div>'
+        f'{opening}{"".join(paragraphs)}{closing}'
+        f'<aside><h2>Related stories</h2>{_link_list(rng, "related", 60)}</aside>'
+        f'<!-- ad slot {rng.getrandbits(32)} -->'
+        f'<footer>{_link_list(rng, "footer-links", 80)}<p>Copyright &copy; {domain}</p></footer>'
+    )
+    head = (
+        f'<head><meta charset="utf-8"><title>{title} | {domain}</title>'
+        f'<style>{"".join(f".c{i}{{margin:{i % 7}px;padding:{i % 5}px}}" for i in range(800))}</style>'
+    )
+    filler = max(0, target_bytes - len(head) - len(body) - 200)
+    html = (
+        f'<!DOCTYPE html><html lang="en">{head}{_script(rng, int(filler * 0.4))}</head>'
+        f'<body>{body}{_widgets(rng, int(filler * 0.6))}{_script(rng, 5_000)}</body></html>'
+    )
+    path = f"/news/business/markets/{symbol.lower()}-shares-{index}.html"
+    return domain, path, title, html
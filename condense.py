@@ -0,0 +1,147 @@
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rough token budget for the article text in the Cohere prompt. With 0 only
+# boilerplate and repeated paragraphs are dropped.
+CONDENSE_TOKEN_BUDGET = int(os.getenv("CONDENSE_TOKEN_BUDGET", "1200"))
+
+# Paragraphs that are never the story, whatever source they came from
+BOILERPLATE_PATTERNS = [
+    r'^(also read|read more|read also|must read|related|recommended|trending|more from|recommended stories)\b',
+    r'^(disclaimer|disclosure)\b',
+    r'\b(views and recommendations|views expressed|are those of the (expert|author)s?)\b',
+    r'\b(follow us on|subscribe to|download the .{0,40}app|sign up for|join our|click here|tap here)\b',
+    r'^catch all the\b',
+    r'^\(?(with inputs from|edited by|written by|reported by|by [a-z]+ [a-z]+$)',
+    r'^(published|updated|first published)( on| at)?\b',
+    r'^(copyright|©)',
+]
+_BOILERPLATE = [re.compile(pattern, re.IGNORECASE) for pattern in BOILERPLATE_PATTERNS]
+
+# Sentences carrying figures or financial terms are what a trader's post is built on
+_NUMERIC = re.compile(
+    r'\d|%|₹|\$|\brs\b|\binr\b|\bcrore|\blakh|\bbps\b|\bbasis points?\b|\bq[1-4]\b|\bfy\d*\b|'
+    r'\b(revenue|profit|loss|ebitda|margin|earnings|eps|dividend|target price|guidance|'
+    r'valuation|market cap|shares?|stake|rating|upgrade|downgrade|sensex|nifty)\b',
+    re.IGNORECASE
+)
+
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+_WORD = re.compile(r'\w+')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["\'(₹$]?[A-Z0-9])')
+# Abbreviations that end in a full stop without ending the sentence
+_ABBREVIATIONS = {'rs', 'mr', 'mrs', 'ms', 'dr', 'ltd', 'inc', 'co', 'no', 'vs', 'st', 'approx', 'govt', 'corp'}
+# Sentence-less lines this short read as headlines from a related-stories list
+MAX_HEADLINE_WORDS = 15
+MIN_PARAGRAPH_WORDS = 6
+
+def estimate_tokens(text):
+    """
+    Approximate LLM tokens: one per word or punctuation mark. Close enough to
+    Cohere's tokenizer for English news to budget with, and needs no call.
+    """
+    return len(_TOKEN.findall(text or ''))
+
+def split_paragraphs(text):
+    return [paragraph.strip() for paragraph in re.split(r'\n\s*\n|\n', text or '') if paragraph.strip()]
+
+def split_sentences(paragraph):
+    sentences = []
+    for piece in _SENTENCE_END.split(paragraph):
+        last_word = sentences[-1].rstrip('.').rsplit(None, 1)[-1].lower() if sentences else ''
+        if sentences and last_word in _ABBREVIATIONS:
+            sentences[-1] += ' ' + piece
+        else:
+            sentences.append(piece)
+    return sentences
+
+def _normalise(paragraph):
+    return ' '.join(_WORD.findall(paragraph.lower()))
+
+def _is_low_information(paragraph):
+    if any(pattern.search(paragraph) for pattern in _BOILERPLATE):
+        return True
+    words = len(_WORD.findall(paragraph))
+    if words < MIN_PARAGRAPH_WORDS and not _NUMERIC.search(paragraph):
+        return True
+    # A line that isn't a sentence: a headline from a related-stories list
+    return words <= MAX_HEADLINE_WORDS and not paragraph.rstrip('"\'”)').endswith(('.', '!', '?', ':'))
+
+def _repeats(paragraph, kept_shingles):
+    """Whether most of the paragraph's 3-word shingles already appeared"""
+    words = _normalise(paragraph).split()
+    shingles = {' '.join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+    if not shingles:
+        return True
+    seen = len(shingles & kept_shingles) / len(shingles)
+    kept_shingles |= shingles
+    return seen >= 0.8
+
+def condense(text, budget=None):
+    """
+    Condense article text for the prompt and return (text, stats).
+
+    Boilerplate, related-story headlines and repeated paragraphs are dropped.
+    If the rest is still over budget (estimated tokens), the lead paragraph
+    is kept and the remaining room goes to sentences with figures or
+    financial terms first, then to the earliest other sentences; what's
+    kept stays in article order. stats has original_tokens,
+    condensed_tokens, tokens_saved, paragraphs_dropped and
+    sentences_dropped.
+    """
+    budget = CONDENSE_TOKEN_BUDGET if budget is None else budget
+    original_tokens = estimate_tokens(text)
+    paragraphs = split_paragraphs(text)
+
+    kept = []
+    kept_shingles = set()
+    for index, paragraph in enumerate(paragraphs):
+        # The lead is kept even if it looks like a headline
+        if index and _is_low_information(paragraph):
+            continue
+        repeated = _repeats(paragraph, kept_shingles)
+        if index and repeated:
+            continue
+        kept.append(paragraph)
+    paragraphs_dropped = len(paragraphs) - len(kept)
+
+    sentences_dropped = 0
+    if budget and sum(estimate_tokens(paragraph) for paragraph in kept) > budget:
+        # (paragraph, position, sentence, tokens); the lead paragraph ranks first
+        sentences = [
+            (p, s, sentence, estimate_tokens(sentence))
+            for p, paragraph in enumerate(kept)
+            for s, sentence in enumerate(split_sentences(paragraph))
+        ]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (sentences[i][0] != 0, not _NUMERIC.search(sentences[i][2]), i)
+        )
+        # The opening sentence goes in even if it alone is over budget
+        chosen = {0}
+        used = sentences[0][3]
+        for i in ranked:
+            tokens = sentences[i][3]
+            if i not in chosen and used + tokens <= budget:
+                chosen.add(i)
+                used += tokens
+        grouped = {}
+        for i in sorted(chosen):
+            grouped.setdefault(sentences[i][0], []).append(sentences[i][2])
+        sentences_dropped = len(sentences) - len(chosen)
+        paragraphs_dropped += len(kept) - len(grouped)
+        kept = [' '.join(group) for _, group in sorted(grouped.items())]
+
+    condensed = '\n\n'.join(kept)
+    condensed_tokens = estimate_tokens(condensed)
+    return condensed, {
+        'original_tokens': original_tokens,
+        'condensed_tokens': condensed_tokens,
+        'tokens_saved': original_tokens - condensed_tokens,
+        'paragraphs_dropped': paragraphs_dropped,
+        'sentences_dropped': sentences_dropped,
+        'budget': budget
+    }
@@ -0,0 +1,125 @@
+import os
+from array import array
+from functools import lru_cache
+from dotenv import load_dotenv
+
+import near_dup
+from database import db
+
+load_dotenv()
+
+# What to do about generated posts and replies that repeat earlier ones in
+# the same topic:
+#   flag  - mark them in the content index (shown on /content) and publish anyway
+#   block - mark them, and refuse to publish a post whose body repeats a
+#           published post or another post in the same upload
+#   off   - don't check
+OUTPUT_DUP_ACTION = os.getenv("OUTPUT_DUP_ACTION", "flag").lower()
+# Estimated share of 3-word shingles two bodies must share
+OUTPUT_DUP_THRESHOLD = float(os.getenv("OUTPUT_DUP_THRESHOLD", "0.7"))
+
+if OUTPUT_DUP_ACTION not in ('flag', 'block', 'off'):
+    print(f"Unknown OUTPUT_DUP_ACTION {OUTPUT_DUP_ACTION!r}, using 'flag'")
+    OUTPUT_DUP_ACTION = 'flag'
+
+# Replies are short; below this many words there's too little to compare
+MIN_WORDS = 12
+# comment_index used for a post's own body
+POST_BODY = -1
+
+@lru_cache(maxsize=8192)
+def _signature(text):
+    # Files are reindexed on every edit or publish, mostly with unchanged bodies
+    sig = near_dup.signature(text, min_words=MIN_WORDS)
+    return sig.tobytes() if sig is not None else None
+
+def _bodies(posts):
+    """(post_index, comment_index, topic, text, published) for every post and reply body"""
+    for post_index, post in enumerate(posts):
+        topic = post.get('topic', 'GENERAL')
+        published = 1 if post.get('published', False) else 0
+        yield post_index, POST_BODY, topic, post.get('content', ''), published
+        for comment_index, comment in enumerate(post.get('comments', [])):
+            yield post_index, comment_index, topic, comment.get('body', ''), published
+
+def _closest(sig, candidates):
+    best = None
+    for candidate in candidates:
+        score = near_dup.similarity(sig, array('I', candidate['signature']))
+        if score >= OUTPUT_DUP_THRESHOLD and (best is None or score > best['similarity']):
+            best = {
+                'filename': candidate['filename'],
+                'post_index': candidate['post_index'],
+                'comment_index': candidate['comment_index'] if candidate['comment_index'] != POST_BODY else None,
+                'similarity': round(score, 2)
+            }
+    return best
+
+def fingerprint_posts(filename, posts):
+    """
+    Signatures for every post and reply body in an output file, each with the
+    closest earlier body in the same topic - from indexed files written
+    before this one, or earlier in this file - as duplicate_of (None if
+    there isn't one). Later files are never candidates, so re-indexing an
+    old file doesn't flag it as a copy of its own later duplicates.
+    """
+    if OUTPUT_DUP_ACTION == 'off':
+        return []
+    rows = []
+    seen = {}  # (topic, band_key) -> bodies earlier in this file
+    for post_index, comment_index, topic, text, published in _bodies(posts):
+        raw = _signature(text)
+        if raw is None:
+            continue
+        sig = array('I', raw)
+        keys = near_dup.band_keys(sig)
+        candidates = db.find_content_fingerprints(topic, keys, before_filename=filename)
+        earlier = {id(row): row for key in keys for row in seen.get((topic, key), [])}
+        row = {
+            'filename': filename,
+            'post_index': post_index,
+            'comment_index': comment_index,
+            'topic': topic,
+            'signature': raw,
+            'band_keys': keys,
+            'published': published,
+            # Once published there's nothing left to decide about it
+            'duplicate_of': None if published else _closest(sig, candidates + list(earlier.values()))
+        }
+        rows.append(row)
+        for key in keys:
+            seen.setdefault((topic, key), []).append(row)
+    return rows
+
+def check_publish(items):
+    """
+    For each (filename, post_index, post) about to be published, the closest
+    published post body in its topic or an earlier post in items; None when
+    it's clear or checking is off.
+    """
+    if OUTPUT_DUP_ACTION == 'off':
+        return [None] * len(items)
+    matches = []
+    batch = {}
+    for filename, post_index, post in items:
+        topic = post.get('topic', 'GENERAL')
+        raw = _signature(post.get('content', ''))
+        if raw is None:
+            matches.append(None)
+            continue
+        sig = array('I', raw)
+        keys = near_dup.band_keys(sig)
+        candidates = db.find_content_fingerprints(topic, keys, published_only=True, posts_only=True)
+        earlier = {id(row): row for key in keys for row in batch.get((topic, key), [])}
+        matches.append(_closest(sig, candidates + list(earlier.values())))
+        row = {'filename': filename, 'post_index': post_index, 'comment_index': POST_BODY, 'signature': raw}
+        for key in keys:
+            batch.setdefault((topic, key), []).append(row)
+    return matches
+
+def describe(match):
+    """Human-readable reference to a matched body"""
+    where = f"{match['filename']} post {match['post_index']}"
+    if match.get('comment_index') is not None:
+        where += f" reply {match['comment_index']}"
+    return f"{where} ({match['similarity']:.0%} similar)"
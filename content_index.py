@@ -0,0 +1,140 @@
+import base64
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from content_dedup import fingerprint_posts
+from database import db
+
+OUTPUT_DIR = 'outputs'
+
+# Page size for /api/content when none (or a silly one) is given
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_synced = False
+_sync_lock = threading.Lock()
+
+def _has_posts(filename):
+    return filename.startswith('output_') and filename.endswith('.json')
+
+def index_output_file(filepath, data=None):
+    """
+    (Re)index one file under outputs/ after it was written. Pass the data
+    just written to skip reading it back. Indexing is best-effort: a failure
+    is logged and the next backfill picks the file up again.
+    """
+    filename = os.path.basename(filepath)
+    try:
+        stat = os.stat(filepath)
+        posts = None
+        if _has_posts(filename):
+            if data is None:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            posts = data.get('posts') or []
+        fingerprints = fingerprint_posts(filename, posts) if posts else None
+        created = datetime.fromtimestamp(stat.st_ctime).isoformat()
+        db.index_output_file(filename, stat.st_size, created, stat.st_mtime_ns, posts, fingerprints)
+    except Exception as e:
+        print(f"Error indexing {filename}: {e}")
+
+def remove_output_file(filepath):
+    """Drop a deleted file from the index"""
+    filename = os.path.basename(filepath)
+    try:
+        db.remove_output_file(filename)
+    except Exception as e:
+        print(f"Error removing {filename} from the index: {e}")
+
+def sync_output_dir(output_dir=OUTPUT_DIR):
+    """
+    Bring the index in line with outputs/: index new or changed files and
+    drop ones that are gone. Covers files written before the index existed
+    or by hand.
+    """
+    if not os.path.exists(output_dir):
+        return
+    indexed = {row['name']: row['mtime_ns'] for row in db.get_output_files()}
+    seen = set()
+    # Oldest first (names carry a timestamp), so later copies get flagged as the duplicates
+    for filename in sorted(os.listdir(output_dir)):
+        if not filename.endswith('.json'):
+            continue
+        seen.add(filename)
+        filepath = os.path.join(output_dir, filename)
+        if indexed.get(filename) != os.stat(filepath).st_mtime_ns:
+            index_output_file(filepath)
+    for filename in indexed.keys() - seen:
+        remove_output_file(filename)
+
+def ensure_synced():
+    """Backfill once per process; after that every write keeps the index current"""
+    global _synced
+    if _synced:
+        return
+    with _sync_lock:
+        if not _synced:
+            sync_output_dir()
+            _synced = True
+
+def encode_cursor(post):
+    key = [post['created_at'], post['filename'], post['post_index']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Return the (created_at, filename, post_index) a cursor points after; ValueError if invalid"""
+    try:
+        created_at, filename, post_index = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(created_at, str) or not isinstance(filename, str) or not isinstance(post_index, int):
+        raise ValueError('Invalid cursor')
+    return created_at, filename, post_index
+
+def day_after(value):
+    """Exclusive upper bound for an inclusive date_to: whole days include the entire day"""
+    if len(value) == 10:
+        return (datetime.strptime(value, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    # A full timestamp: include that exact instant
+    return value + '\uffff'
+
+def content_item(post):
+    """Shape an indexed post the way /api/content has always returned it"""
+    return {
+        'id': post['temp_post_id'],
+        'title': post['title'],
+        'content': post['content'],
+        'topic': post['topic'],
+        'username': post['username'],
+        'created_at': post['created_at'],
+        'comments': post['comments'],
+        'filename': post['filename'],
+        'post_index': post['post_index'],
+        'preview': post['preview'],
+        'published': bool(post['published']),
+        'published_at': post['published_at'],
+        'external_id': post['external_id'],
+        'duplicate_of': post['duplicate_of']
+    }
+
+def get_content_page(limit=DEFAULT_PAGE_SIZE, cursor=None, topic=None, username=None,
+                     published=None, date_from=None, date_to=None):
+    """
+    One newest-first page of indexed posts: {"items", "next_cursor"}.
+    next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+    # Fetch one extra row to know whether another page exists
+    posts = db.query_content(
+        limit=limit + 1, after=after, topic=topic, username=username, published=published,
+        created_from=date_from, created_before=day_after(date_to) if date_to else None
+    )
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    return {
+        'items': [content_item(post) for post in posts],
+        'next_cursor': encode_cursor(posts[-1]) if has_more else None
+    }
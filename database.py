@@ -1,24 +1,156 @@
+import atexit
+import os
+import time
 import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from threading import local
+from threading import Condition, Lock, Thread, local
+from dotenv import load_dotenv
+from metrics import db_batch_failures, timed
 
-thread_local = local()
+load_dotenv()
+
+# Connection pragmas. NORMAL is durable in WAL mode except for the last
+# commits before a power loss, and skips an fsync per commit.
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "32768"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Queue article and generated post writes for one writer thread that
+# commits them in batches, instead of a transaction per row per worker
+DB_WRITE_BATCHING = os.getenv("DB_WRITE_BATCHING", "false").lower() == "true"
+DB_WRITE_INTERVAL = float(os.getenv("DB_WRITE_INTERVAL", "0.05"))
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "500"))
+# Longest wait between retries of a batch that failed to write
+DB_WRITE_MAX_BACKOFF = float(os.getenv("DB_WRITE_MAX_BACKOFF", "30"))
+
+def _sqlite_now():
+    """The current time as SQLite's CURRENT_TIMESTAMP writes it"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class BatchWriter:
+    """
+    Collects extracted_articles and generated_posts rows from any thread and
+    writes them from one thread, every DB_WRITE_INTERVAL seconds or once
+    DB_WRITE_BATCH_SIZE rows are waiting, in one transaction per batch.
+    Rows are keyed by primary key, so a row rewritten before the flush is
+    written once. Until it is committed, a row is served from pending().
+    A batch that fails to write is queued again (behind any newer rows for
+    the same keys) and retried with exponential backoff.
+    """
+
+    def __init__(self, db, interval=None, batch_size=None):
+        self.db = db
+        self.interval = interval or DB_WRITE_INTERVAL
+        self.batch_size = batch_size or DB_WRITE_BATCH_SIZE
+        self._cond = Condition()
+        self._write_lock = Lock()
+        self._pending = {'articles': {}, 'posts': {}}
+        self._in_flight = {'articles': {}, 'posts': {}}
+        self._thread = None
+        self.failures = 0
+        self.last_error = None
+
+    def add(self, table, key, row):
+        with self._cond:
+            queued = sum(len(rows) for rows in self._pending.values())
+            self._pending[table][key] = row
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            # Wake the writer for the first row, and again once the batch is full
+            if queued == 0 or queued + 1 >= self.batch_size:
+                self._cond.notify()
+
+    def pending(self, table, key):
+        """The queued row for key, or None once it's committed (or was never queued)"""
+        with self._cond:
+            return self._pending[table].get(key) or self._in_flight[table].get(key)
+
+    def pending_rows(self, table):
+        with self._cond:
+            return list({**self._in_flight[table], **self._pending[table]}.values())
+
+    def flush(self):
+        """
+        Write everything queued so far and return the number of rows written.
+        If the write fails the rows are queued again and the error is raised.
+        """
+        with self._write_lock:
+            with self._cond:
+                batch = self._pending
+                if not any(batch.values()):
+                    return 0
+                self._pending = {'articles': {}, 'posts': {}}
+                self._in_flight = batch
+            try:
+                self.db.write_batch(list(batch['articles'].values()), list(batch['posts'].values()))
+            except Exception as e:
+                with self._cond:
+                    # Rows added since the batch was taken are newer; keep those
+                    for table, rows in batch.items():
+                        for key, row in rows.items():
+                            self._pending[table].setdefault(key, row)
+                    self._in_flight = {'articles': {}, 'posts': {}}
+                    self.failures += 1
+                    self.last_error = e
+                db_batch_failures.inc()
+                print(f"Error writing batch of {sum(len(rows) for rows in batch.values())} rows, queued again: {e}")
+                raise
+            with self._cond:
+                self._in_flight = {'articles': {}, 'posts': {}}
+                self.failures = 0
+            return sum(len(rows) for rows in batch.values())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not any(self._pending.values()):
+                    self._cond.wait()
+                # Give other workers the interval to add to the batch
+                if sum(len(rows) for rows in self._pending.values()) < self.batch_size:
+                    self._cond.wait(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(min(DB_WRITE_MAX_BACKOFF, self.interval * 2 ** self.failures))
 
 class Database:
-    def __init__(self):
-        self.db_path = str(Path(__file__).parent / 'forum_bot.db')
-        self._init_db()
+    """
+    SQLite storage. Nothing touches the file until the first query, so
+    importing this module (and creating the db singleton) is free.
+    """
+
+    def __init__(self, db_path=None, write_batching=None):
+        # DATABASE_PATH points benchmarks and tests at a scratch database
+        self.db_path = db_path or os.getenv("DATABASE_PATH") or str(Path(__file__).parent / 'forum_bot.db')
+        self._initialized = False
+        self._init_lock = Lock()
+        # One connection per thread per instance, so scratch databases never share the app's
+        self._local = local()
+        batching = DB_WRITE_BATCHING if write_batching is None else write_batching
+        self.writer = BatchWriter(self) if batching else None
 
     def _get_conn(self):
-        if not hasattr(thread_local, "conn"):
-            thread_local.conn = sqlite3.connect(self.db_path, timeout=20)
-            thread_local.conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._init_db()
+                    self._initialized = True
+        if not hasattr(self._local, "conn"):
+            conn = sqlite3.connect(self.db_path, timeout=20)
+            conn.row_factory = sqlite3.Row
             # Enable foreign keys and WAL mode for each connection
-            thread_local.conn.execute("PRAGMA foreign_keys = ON")
-            thread_local.conn.execute("PRAGMA journal_mode=WAL")
-        return thread_local.conn
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+            conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+        return self._local.conn
 
     def _init_db(self):
         """Initialize the database tables"""
@@ -39,6 +171,13 @@ class Database:
                 )
             ''')
 
+            # Validators for conditional GET when revalidating cached articles
+            self._add_missing_columns(conn, 'extracted_articles', {
+                'etag': 'TEXT',
+                'last_modified': 'TEXT',
+                'page_bytes': 'INTEGER'
+            })
+
             # Table for storing generated posts
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS generated_posts (
@@ -49,13 +188,202 @@ class Database:
                     PRIMARY KEY (url, topic)
                 )
             ''')
-            conn.commit()
-            
-            # Test write access
-            conn.execute("INSERT OR REPLACE INTO extracted_articles (url, title, text) VALUES (?, ?, ?)",
-                       ('test_url', 'test_title', 'test_text'))
-            conn.commit()
-            conn.execute("DELETE FROM extracted_articles WHERE url = ?", ('test_url',))
+
+            # Index of the JSON files under outputs/, so listings don't stat every file
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS output_files (
+                    filename TEXT PRIMARY KEY,
+                    size INTEGER,
+                    created TEXT,
+                    mtime_ns INTEGER,
+                    indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Posts and comments from outputs/output_*.json, rebuilt per file on every write
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS content_posts (
+                    filename TEXT,
+                    post_index INTEGER,
+                    temp_post_id TEXT,
+                    title TEXT,
+                    content TEXT,
+                    preview TEXT,
+                    topic TEXT,
+                    username TEXT,
+                    created_at TEXT,
+                    published INTEGER DEFAULT 0,
+                    published_at TEXT,
+                    external_id TEXT,
+                    comment_count INTEGER DEFAULT 0,
+                    PRIMARY KEY (filename, post_index)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS content_comments (
+                    filename TEXT,
+                    post_index INTEGER,
+                    comment_index INTEGER,
+                    temp_comment_id TEXT,
+                    body TEXT,
+                    username TEXT,
+                    created_at TEXT,
+                    PRIMARY KEY (filename, post_index, comment_index)
+                )
+            ''')
+            # Closest earlier post or reply body in the same topic (see content_dedup.py)
+            for table in ('content_posts', 'content_comments'):
+                self._add_missing_columns(conn, table, {'duplicate_of': 'JSON'})
+            # MinHash signatures of post and reply bodies (comment_index -1 for
+            # the post itself) and their LSH band keys, looked up per topic
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'content_fingerprints'").fetchone():
+                # Files indexed before fingerprints existed get reindexed on the next sync
+                conn.execute('UPDATE output_files SET mtime_ns = NULL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS content_fingerprints (
+                    filename TEXT,
+                    post_index INTEGER,
+                    comment_index INTEGER,
+                    topic TEXT,
+                    signature BLOB,
+                    published INTEGER DEFAULT 0,
+                    PRIMARY KEY (filename, post_index, comment_index)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS content_bands (
+                    filename TEXT,
+                    post_index INTEGER,
+                    comment_index INTEGER,
+                    band INTEGER,
+                    topic TEXT,
+                    band_key INTEGER,
+                    PRIMARY KEY (filename, post_index, comment_index, band)
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_content_bands_key
+                ON content_bands (topic, band_key)
+            ''')
+            # Newest-first keyset pagination, optionally within one topic/user/state
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_content_posts_created
+                ON content_posts (created_at DESC, filename DESC, post_index DESC)
+            ''')
+            for column in ('topic', 'username', 'published'):
+                conn.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_content_posts_{column}
+                    ON content_posts ({column}, created_at DESC, filename DESC, post_index DESC)
+                ''')
+            # LLM responses keyed by a hash of everything that shapes the output
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT,
+                    model TEXT,
+                    response JSON,
+                    latency REAL,
+                    created_at REAL,
+                    last_used_at REAL,
+                    hits INTEGER DEFAULT 0
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used
+                ON llm_cache (last_used_at)
+            ''')
+
+            # How much condense.py trimmed from each article before prompting
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS article_condensation (
+                    url TEXT PRIMARY KEY,
+                    original_tokens INTEGER,
+                    condensed_tokens INTEGER,
+                    tokens_saved INTEGER,
+                    paragraphs_dropped INTEGER,
+                    sentences_dropped INTEGER,
+                    budget INTEGER,
+                    condensed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # The post and replies generated for an article, keyed by canonical URL;
+            # every topic the article is listed under is formatted from it.
+            # generated_at is epoch seconds, like llm_cache; rows from before it
+            # was added have none and count as expired
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS article_generations (
+                    url TEXT PRIMARY KEY,
+                    generation JSON,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            self._add_missing_columns(conn, 'article_generations', {'generated_at': 'REAL'})
+
+            # Durable queue of posts waiting to be published, one row per post
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS publish_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    dedupe_key TEXT UNIQUE,
+                    filename TEXT,
+                    post_index INTEGER,
+                    temp_post_id TEXT,
+                    post_created_at TEXT,
+                    username TEXT,
+                    status TEXT DEFAULT 'queued',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL DEFAULT 0,
+                    last_error TEXT,
+                    external_id TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_publish_queue_due
+                ON publish_queue (status, next_attempt_at, id)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_content_comments_username
+                ON content_comments (username)
+            ''')
+
+            # MinHash signature of every processed article, plus one row per
+            # LSH band so candidates are found by exact lookups on band keys
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS article_fingerprints (
+                    url TEXT PRIMARY KEY,
+                    signature BLOB,
+                    processed_at REAL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS article_bands (
+                    url TEXT,
+                    band INTEGER,
+                    band_key INTEGER,
+                    processed_at REAL,
+                    PRIMARY KEY (url, band)
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_article_bands_key
+                ON article_bands (band_key, processed_at)
+            ''')
+
+            # Keyset order for iter_articles and iter_posts
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_extracted_articles_extracted
+                ON extracted_articles (extracted_at, url)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_generated_posts_created
+                ON generated_posts (created_at, url, topic)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_generated_posts_topic
+                ON generated_posts (topic, created_at, url)
+            ''')
             conn.commit()
             
             print("Database initialized successfully!")
@@ -65,22 +393,63 @@ class Database:
         finally:
             conn.close()
 
-    def save_article(self, url: str, title: str, text: str):
-        """Save or update extracted article"""
+    def _add_missing_columns(self, conn, table: str, columns: dict):
+        """Add columns introduced after the table was first created"""
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, column_type in columns.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+    def save_article(self, url: str, title: str, text: str, etag: str = None,
+                     last_modified: str = None, page_bytes: int = None):
+        """Save or update extracted article, through the batch writer if enabled"""
+        row = (url, title, text, etag, last_modified, page_bytes)
+        if self.writer:
+            self.writer.add('articles', url, row)
+        else:
+            self.save_articles([row])
+
+    @timed('db_write')
+    def save_articles(self, rows: list):
+        """Save (url, title, text, etag, last_modified, page_bytes) rows in one transaction"""
+        conn = self._get_conn()
+        with conn:
+            self._insert_articles(conn, rows)
+
+    def _insert_articles(self, conn, rows):
+        conn.executemany('''
+            INSERT OR REPLACE INTO extracted_articles (url, title, text, etag, last_modified, page_bytes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+    @timed('db_write')
+    def write_batch(self, articles: list, posts: list):
+        """Article rows and (url, topic, output) post rows, in one transaction"""
+        conn = self._get_conn()
+        with conn:
+            self._insert_articles(conn, articles)
+            self._insert_generated_posts(conn, posts)
+
+    @timed('db_write')
+    def touch_article(self, url: str):
+        """Mark a cached article as fresh again after a 304 Not Modified"""
         conn = self._get_conn()
         with conn:
             conn.execute('''
-                INSERT OR REPLACE INTO extracted_articles (url, title, text)
-                VALUES (?, ?, ?)
-            ''', (url, title, text))
-            conn.commit()  # Explicitly commit
-            print(f"DEBUG: Saved article with URL: {url}")
+                UPDATE extracted_articles SET extracted_at = CURRENT_TIMESTAMP
+                WHERE url = ?
+            ''', (url,))
 
     def get_article(self, url: str) -> dict:
         """Get extracted article if it exists"""
+        pending = self.writer.pending('articles', url) if self.writer else None
+        if pending:
+            _, title, text, etag, last_modified, page_bytes = pending
+            return {'title': title, 'text': text, 'extracted_at': _sqlite_now(),
+                    'etag': etag, 'last_modified': last_modified, 'page_bytes': page_bytes}
         conn = self._get_conn()
         cur = conn.execute('''
-            SELECT title, text, extracted_at
+            SELECT title, text, extracted_at, etag, last_modified, page_bytes
             FROM extracted_articles
             WHERE url = ?
         ''', (url,))
@@ -90,18 +459,31 @@ class Database:
         return None
 
     def save_generated_post(self, url: str, topic: str, output: dict):
-        """Save generated post output"""
+        """Save generated post output, through the batch writer if enabled"""
+        row = (url, topic, json.dumps(output))
+        if self.writer:
+            self.writer.add('posts', (url, topic), row)
+        else:
+            self.save_generated_posts([row])
+
+    @timed('db_write')
+    def save_generated_posts(self, rows: list):
+        """Save (url, topic, output JSON) rows in one transaction"""
         conn = self._get_conn()
         with conn:
-            conn.execute('''
-                INSERT OR REPLACE INTO generated_posts (url, topic, output)
-                VALUES (?, ?, ?)
-            ''', (url, topic, json.dumps(output)))
-            conn.commit()  # Explicitly commit
-            print(f"DEBUG: Saved generated post - URL: {url}, Topic: {topic}")
+            self._insert_generated_posts(conn, rows)
+
+    def _insert_generated_posts(self, conn, rows):
+        conn.executemany('''
+            INSERT OR REPLACE INTO generated_posts (url, topic, output)
+            VALUES (?, ?, ?)
+        ''', rows)
 
     def get_generated_post(self, url: str, topic: str) -> dict:
         """Get generated post if it exists"""
+        pending = self.writer.pending('posts', (url, topic)) if self.writer else None
+        if pending:
+            return {'output': json.loads(pending[2]), 'created_at': _sqlite_now()}
         conn = self._get_conn()
         cur = conn.execute('''
             SELECT output, created_at
@@ -116,18 +498,534 @@ class Database:
             }
         return None
 
-    def get_all_articles(self):
-        """Get all articles in the database"""
+    def index_output_file(self, filename: str, size: int, created: str, mtime_ns: int, posts: list = None,
+                          fingerprints: list = None):
+        """
+        Replace the index entries for one output file. posts is the file's
+        "posts" list, or None for files that don't hold posts (search results).
+        fingerprints are content_dedup.fingerprint_posts rows for its bodies.
+        """
+        fingerprints = fingerprints or []
+        duplicates = {
+            (row['post_index'], row['comment_index']): json.dumps(row['duplicate_of'])
+            for row in fingerprints if row['duplicate_of']
+        }
+        post_rows = []
+        comment_rows = []
+        for post_index, post in enumerate(posts or []):
+            content = post.get('content', '')
+            comments = post.get('comments', [])
+            post_rows.append((
+                filename, post_index,
+                post.get('temp_post_id', f"{filename}_{post_index}"),
+                post.get('title', 'No Title'),
+                content,
+                content[:200] + '...' if len(content) > 200 else content,
+                post.get('topic', 'GENERAL'),
+                post.get('username', 'Anonymous'),
+                post.get('created_at', ''),
+                1 if post.get('published', False) else 0,
+                post.get('published_at', ''),
+                post.get('external_id', '') or '',
+                len(comments),
+                duplicates.get((post_index, -1))
+            ))
+            for comment_index, comment in enumerate(comments):
+                comment_rows.append((
+                    filename, post_index, comment_index,
+                    comment.get('temp_comment_id'),
+                    comment.get('body', ''),
+                    comment.get('username'),
+                    comment.get('created_at', ''),
+                    duplicates.get((post_index, comment_index))
+                ))
+
         conn = self._get_conn()
-        cur = conn.execute('SELECT * FROM extracted_articles')
+        with conn:
+            self._delete_file_rows(conn, filename)
+            conn.executemany('''
+                INSERT INTO content_posts (filename, post_index, temp_post_id, title, content, preview,
+                                           topic, username, created_at, published, published_at,
+                                           external_id, comment_count, duplicate_of)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', post_rows)
+            conn.executemany('''
+                INSERT INTO content_comments (filename, post_index, comment_index, temp_comment_id,
+                                              body, username, created_at, duplicate_of)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', comment_rows)
+            conn.executemany('''
+                INSERT INTO content_fingerprints (filename, post_index, comment_index, topic, signature, published)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(filename, row['post_index'], row['comment_index'], row['topic'], row['signature'], row['published'])
+                  for row in fingerprints])
+            conn.executemany('''
+                INSERT INTO content_bands (filename, post_index, comment_index, band, topic, band_key)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(filename, row['post_index'], row['comment_index'], band, row['topic'], key)
+                  for row in fingerprints for band, key in enumerate(row['band_keys'])])
+            conn.execute('''
+                INSERT OR REPLACE INTO output_files (filename, size, created, mtime_ns)
+                VALUES (?, ?, ?, ?)
+            ''', (filename, size, created, mtime_ns))
+
+    def remove_output_file(self, filename: str):
+        """Drop a deleted output file from the index"""
+        conn = self._get_conn()
+        with conn:
+            self._delete_file_rows(conn, filename)
+            conn.execute('DELETE FROM output_files WHERE filename = ?', (filename,))
+
+    def _delete_file_rows(self, conn, filename: str):
+        for table in ('content_comments', 'content_posts', 'content_fingerprints', 'content_bands'):
+            conn.execute(f'DELETE FROM {table} WHERE filename = ?', (filename,))
+
+    def find_content_fingerprints(self, topic: str, band_keys: list, before_filename: str = None,
+                                  published_only: bool = False, posts_only: bool = False) -> list:
+        """
+        Indexed post/reply bodies in topic sharing at least one band key.
+        before_filename keeps only files that sort before it, i.e. were
+        written earlier (output file names carry their write time and a
+        zero-padded suffix for files written in the same second).
+        """
+        conditions = ['(f.filename, f.post_index, f.comment_index) IN (' + f'''
+            SELECT filename, post_index, comment_index FROM content_bands
+            WHERE topic = ? AND band_key IN ({', '.join('?' for _ in band_keys)})
+        )''']
+        params = [topic, *band_keys]
+        if before_filename is not None:
+            conditions.append('f.filename < ?')
+            params.append(before_filename)
+        if published_only:
+            conditions.append('f.published = 1')
+        if posts_only:
+            conditions.append('f.comment_index = -1')
+        conn = self._get_conn()
+        cur = conn.execute(f'''
+            SELECT f.filename, f.post_index, f.comment_index, f.signature
+            FROM content_fingerprints f
+            WHERE {' AND '.join(conditions)}
+        ''', params)
         return [dict(row) for row in cur.fetchall()]
 
-    def get_all_posts(self):
-        """Get all generated posts in the database"""
+    def get_output_files(self) -> list:
+        """Indexed output files as {name, size, created, mtime_ns}"""
+        conn = self._get_conn()
+        cur = conn.execute('SELECT filename AS name, size, created, mtime_ns FROM output_files ORDER BY filename')
+        return [dict(row) for row in cur.fetchall()]
+
+    def query_content(self, limit: int = 20, after: tuple = None, topic: str = None, username: str = None,
+                      published: bool = None, created_from: str = None, created_before: str = None) -> list:
+        """
+        One page of indexed posts, newest first, each with its comments.
+
+        after is the (created_at, filename, post_index) of the last post on the
+        previous page; created_from is inclusive and created_before exclusive.
+        """
+        conditions = []
+        params = []
+        if topic:
+            conditions.append('topic = ?')
+            params.append(topic)
+        if username:
+            conditions.append('username = ?')
+            params.append(username)
+        if published is not None:
+            conditions.append('published = ?')
+            params.append(1 if published else 0)
+        if created_from:
+            conditions.append('created_at >= ?')
+            params.append(created_from)
+        if created_before:
+            conditions.append('created_at < ?')
+            params.append(created_before)
+        if after:
+            conditions.append('(created_at, filename, post_index) < (?, ?, ?)')
+            params.extend(after)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        conn = self._get_conn()
+        posts = [dict(row) for row in conn.execute(f'''
+            SELECT filename, post_index, temp_post_id, title, content, preview, topic, username,
+                   created_at, published, published_at, external_id, comment_count, duplicate_of
+            FROM content_posts
+            {where}
+            ORDER BY created_at DESC, filename DESC, post_index DESC
+            LIMIT ?
+        ''', (*params, limit))]
+
+        # Comments for the whole page in one query
+        comments = {}
+        keys = [(post['filename'], post['post_index']) for post in posts if post['comment_count']]
+        if keys:
+            placeholders = ', '.join('(?, ?)' for _ in keys)
+            for row in conn.execute(f'''
+                SELECT filename, post_index, temp_comment_id, body, username, created_at, duplicate_of
+                FROM content_comments
+                WHERE (filename, post_index) IN (VALUES {placeholders})
+                ORDER BY filename, post_index, comment_index
+            ''', [value for key in keys for value in key]):
+                comments.setdefault((row['filename'], row['post_index']), []).append({
+                    'temp_comment_id': row['temp_comment_id'],
+                    'body': row['body'],
+                    'username': row['username'],
+                    'created_at': row['created_at'],
+                    'duplicate_of': json.loads(row['duplicate_of']) if row['duplicate_of'] else None
+                })
+        for post in posts:
+            post['comments'] = comments.get((post['filename'], post['post_index']), [])
+            post['duplicate_of'] = json.loads(post['duplicate_of']) if post['duplicate_of'] else None
+        return posts
+
+    def get_unpublished_posts(self) -> list:
+        """(filename, post_index) of every indexed post not yet published, oldest first"""
+        conn = self._get_conn()
+        cur = conn.execute('''
+            SELECT filename, post_index FROM content_posts
+            WHERE published = 0
+            ORDER BY created_at, filename, post_index
+        ''')
+        return [(row['filename'], row['post_index']) for row in cur.fetchall()]
+
+    def enqueue_publish(self, items: list) -> list:
+        """
+        Queue posts for publishing. Each item has dedupe_key, filename,
+        post_index, temp_post_id, post_created_at and username. A post already
+        queued, sending or published keeps its row; a failed one is queued
+        again. Returns the queue rows for the items, in order.
+        """
+        conn = self._get_conn()
+        with conn:
+            for item in items:
+                conn.execute('''
+                    INSERT INTO publish_queue (dedupe_key, filename, post_index, temp_post_id,
+                                               post_created_at, username)
+                    VALUES (:dedupe_key, :filename, :post_index, :temp_post_id, :post_created_at, :username)
+                    ON CONFLICT (dedupe_key) DO UPDATE SET
+                        status = 'queued', attempts = 0, next_attempt_at = 0, last_error = NULL,
+                        filename = excluded.filename, post_index = excluded.post_index,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE publish_queue.status = 'failed'
+                ''', item)
+        return [self.get_publish_item(dedupe_key=item['dedupe_key']) for item in items]
+
+    def claim_publish_batch(self, limit: int, now: float) -> list:
+        """Move up to limit due rows from queued to sending and return them, oldest first"""
+        conn = self._get_conn()
+        with conn:
+            # Take the write lock before reading so two dispatchers can't claim the same rows
+            conn.execute('BEGIN IMMEDIATE')
+            rows = [dict(row) for row in conn.execute('''
+                SELECT * FROM publish_queue
+                WHERE status = 'queued' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id
+                LIMIT ?
+            ''', (now, limit))]
+            conn.executemany('''
+                UPDATE publish_queue SET status = 'sending', attempts = attempts + 1,
+                                         updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', [(row['id'],) for row in rows])
+        for row in rows:
+            row['status'] = 'sending'
+            row['attempts'] += 1
+        return rows
+
+    def finish_publish(self, item_id: int, status: str, error: str = None,
+                       external_id: str = None, next_attempt_at: float = 0):
+        """Record the outcome of a send attempt"""
         conn = self._get_conn()
-        cur = conn.execute('SELECT * FROM generated_posts')
+        with conn:
+            conn.execute('''
+                UPDATE publish_queue
+                SET status = ?, last_error = ?, external_id = COALESCE(?, external_id),
+                    next_attempt_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, error, external_id, next_attempt_at, item_id))
+
+    def count_publish_due(self, now: float) -> int:
+        """Queued rows whose next attempt is due"""
+        conn = self._get_conn()
+        return conn.execute(
+            "SELECT COUNT(*) FROM publish_queue WHERE status = 'queued' AND next_attempt_at <= ?", (now,)
+        ).fetchone()[0]
+
+    def next_publish_due(self):
+        """Earliest next_attempt_at among queued rows, or None"""
+        conn = self._get_conn()
+        return conn.execute(
+            "SELECT MIN(next_attempt_at) FROM publish_queue WHERE status = 'queued'"
+        ).fetchone()[0]
+
+    def recover_publish_queue(self) -> int:
+        """
+        Rows left in sending were interrupted mid-upload, so whether the
+        forum received them is unknown; park them for review instead of
+        risking a duplicate post.
+        """
+        conn = self._get_conn()
+        with conn:
+            cur = conn.execute('''
+                UPDATE publish_queue
+                SET status = 'needs_review', last_error = 'Interrupted while sending',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'sending'
+            ''')
+        return cur.rowcount
+
+    def requeue_publish(self, item_id: int) -> bool:
+        """Send a failed or needs_review row again; False if it isn't in either state"""
+        conn = self._get_conn()
+        with conn:
+            cur = conn.execute('''
+                UPDATE publish_queue
+                SET status = 'queued', attempts = 0, next_attempt_at = 0, last_error = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status IN ('failed', 'needs_review')
+            ''', (item_id,))
+        return cur.rowcount > 0
+
+    def get_publish_item(self, item_id: int = None, dedupe_key: str = None) -> dict:
+        """One queue row by id or dedupe key"""
+        conn = self._get_conn()
+        if item_id is not None:
+            row = conn.execute('SELECT * FROM publish_queue WHERE id = ?', (item_id,)).fetchone()
+        else:
+            row = conn.execute('SELECT * FROM publish_queue WHERE dedupe_key = ?', (dedupe_key,)).fetchone()
+        return dict(row) if row else None
+
+    def list_publish_queue(self, status: str = None, limit: int = 100) -> list:
+        """Newest queue rows first, optionally in one status"""
+        conn = self._get_conn()
+        if status:
+            cur = conn.execute('SELECT * FROM publish_queue WHERE status = ? ORDER BY id DESC LIMIT ?', (status, limit))
+        else:
+            cur = conn.execute('SELECT * FROM publish_queue ORDER BY id DESC LIMIT ?', (limit,))
         return [dict(row) for row in cur.fetchall()]
 
+    def publish_queue_counts(self) -> dict:
+        conn = self._get_conn()
+        cur = conn.execute('SELECT status, COUNT(*) AS count FROM publish_queue GROUP BY status')
+        return {row['status']: row['count'] for row in cur.fetchall()}
+
+    def get_llm_response(self, key: str, created_after: float, now: float) -> dict:
+        """A cached LLM response newer than created_after, marked as used; None on a miss"""
+        conn = self._get_conn()
+        row = conn.execute('''
+            SELECT response, latency FROM llm_cache
+            WHERE key = ? AND created_at >= ?
+        ''', (key, created_after)).fetchone()
+        if not row:
+            return None
+        with conn:
+            conn.execute('''
+                UPDATE llm_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?
+            ''', (now, key))
+        return {'response': json.loads(row['response']), 'latency': row['latency']}
+
+    def save_llm_response(self, key: str, kind: str, model: str, response, latency: float, now: float):
+        """Store (or replace, after a bypass) an LLM response"""
+        conn = self._get_conn()
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (key, kind, model, response, latency, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key, kind, model, json.dumps(response, ensure_ascii=False), latency, now, now))
+
+    def evict_llm_cache(self, created_before: float, max_entries: int) -> int:
+        """Drop expired responses, then the least recently used beyond max_entries"""
+        conn = self._get_conn()
+        with conn:
+            expired = conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (created_before,)).rowcount
+            overflow = conn.execute('''
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (max_entries,)).rowcount
+        return expired + overflow
+
+    def llm_cache_counts(self) -> dict:
+        """Entries and bytes stored per kind"""
+        conn = self._get_conn()
+        cur = conn.execute('''
+            SELECT kind, COUNT(*) AS entries, SUM(LENGTH(response)) AS bytes
+            FROM llm_cache GROUP BY kind
+        ''')
+        return {row['kind']: {'entries': row['entries'], 'bytes': row['bytes'] or 0} for row in cur.fetchall()}
+
+    @timed('db_write')
+    def save_fingerprint(self, url: str, signature: bytes, band_keys: list, processed_at: float):
+        """Store (or refresh) an article's signature and band keys"""
+        conn = self._get_conn()
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO article_fingerprints (url, signature, processed_at)
+                VALUES (?, ?, ?)
+            ''', (url, signature, processed_at))
+            conn.executemany('''
+                INSERT OR REPLACE INTO article_bands (url, band, band_key, processed_at)
+                VALUES (?, ?, ?, ?)
+            ''', [(url, band, key, processed_at) for band, key in enumerate(band_keys)])
+
+    def find_fingerprints(self, band_keys: list, processed_after: float, exclude_url: str = None) -> list:
+        """Articles processed after processed_after sharing at least one band key"""
+        conn = self._get_conn()
+        placeholders = ', '.join('?' for _ in band_keys)
+        cur = conn.execute(f'''
+            SELECT url, signature, processed_at FROM article_fingerprints
+            WHERE url IN (
+                SELECT url FROM article_bands
+                WHERE band_key IN ({placeholders}) AND processed_at >= ?
+            )
+        ''', (*band_keys, processed_after))
+        return [dict(row) for row in cur.fetchall() if row['url'] != exclude_url]
+
+    def get_latest_generated_post(self, url: str) -> dict:
+        """The most recently generated post for url, whatever its topic"""
+        pending = [row for row in self.writer.pending_rows('posts') if row[0] == url] if self.writer else []
+        if pending:
+            return {
+                'output': json.loads(pending[-1][2]),
+                'topic': pending[-1][1],
+                'created_at': _sqlite_now()
+            }
+        conn = self._get_conn()
+        row = conn.execute('''
+            SELECT output, topic, created_at FROM generated_posts
+            WHERE url = ? ORDER BY created_at DESC LIMIT 1
+        ''', (url,)).fetchone()
+        if row:
+            return {
+                'output': json.loads(row['output']),
+                'topic': row['topic'],
+                'created_at': row['created_at']
+            }
+        return None
+
+    @timed('db_write')
+    def save_condensation(self, url: str, stats: dict):
+        """Record the latest condensation of an article"""
+        conn = self._get_conn()
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO article_condensation (url, original_tokens, condensed_tokens, tokens_saved,
+                                                             paragraphs_dropped, sentences_dropped, budget)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (url, stats['original_tokens'], stats['condensed_tokens'], stats['tokens_saved'],
+                  stats['paragraphs_dropped'], stats['sentences_dropped'], stats['budget']))
+
+    @timed('db_write')
+    def save_article_generation(self, url: str, generation: dict, now: float = None):
+        """Store the topic-independent post and replies for a canonical URL"""
+        conn = self._get_conn()
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO article_generations (url, generation, generated_at)
+                VALUES (?, ?, ?)
+            ''', (url, json.dumps(generation), time.time() if now is None else now))
+
+    def get_article_generation(self, url: str, generated_after: float = None) -> dict:
+        """The generation for a canonical URL, only if made after generated_after when given"""
+        conn = self._get_conn()
+        if generated_after is None:
+            row = conn.execute('SELECT generation FROM article_generations WHERE url = ?', (url,)).fetchone()
+        else:
+            row = conn.execute('''
+                SELECT generation FROM article_generations WHERE url = ? AND generated_at >= ?
+            ''', (url, generated_after)).fetchone()
+        return json.loads(row['generation']) if row else None
+
+    def get_condensation(self, url: str) -> dict:
+        conn = self._get_conn()
+        row = conn.execute('SELECT * FROM article_condensation WHERE url = ?', (url,)).fetchone()
+        return dict(row) if row else None
+
+    def condensation_totals(self) -> dict:
+        """Articles condensed and tokens before and after, across all of them"""
+        conn = self._get_conn()
+        row = conn.execute('''
+            SELECT COUNT(*) AS articles, SUM(original_tokens) AS original_tokens,
+                   SUM(condensed_tokens) AS condensed_tokens, SUM(tokens_saved) AS tokens_saved
+            FROM article_condensation
+        ''').fetchone()
+        return {key: row[key] or 0 for key in row.keys()}
+
+    def get_all_articles(self):
+        """Get all articles in the database; iter_articles streams them instead"""
+        return list(self.iter_articles())
+
+    def get_all_posts(self):
+        """Get all generated posts in the database; iter_posts streams them instead"""
+        return list(self.iter_posts())
+
+    def iter_articles(self, columns: tuple = None, extracted_from: str = None, extracted_before: str = None,
+                      page_size: int = 500):
+        """
+        Yield extracted articles as dicts, oldest first, one page of
+        page_size rows in memory at a time. columns picks which to load
+        (all by default; leave out 'text' to skip the article bodies).
+        extracted_from is inclusive and extracted_before exclusive.
+        """
+        conditions, params = [], []
+        if extracted_from:
+            conditions.append('extracted_at >= ?')
+            params.append(extracted_from)
+        if extracted_before:
+            conditions.append('extracted_at < ?')
+            params.append(extracted_before)
+        return self._iter_keyset('extracted_articles', ('extracted_at', 'url'), columns, conditions, params, page_size)
+
+    def iter_posts(self, columns: tuple = None, topic: str = None, created_from: str = None,
+                   created_before: str = None, page_size: int = 500):
+        """
+        Yield generated posts as dicts, oldest first, one page of page_size
+        rows in memory at a time. columns picks which to load (all by
+        default; leave out 'output', the stored JSON text, to skip it).
+        created_from is inclusive and created_before exclusive.
+        """
+        conditions, params = [], []
+        if topic:
+            conditions.append('topic = ?')
+            params.append(topic)
+        if created_from:
+            conditions.append('created_at >= ?')
+            params.append(created_from)
+        if created_before:
+            conditions.append('created_at < ?')
+            params.append(created_before)
+        return self._iter_keyset('generated_posts', ('created_at', 'url', 'topic'), columns, conditions, params, page_size)
+
+    def _iter_keyset(self, table, key, columns, conditions, params, page_size):
+        """
+        Page through table in key order, each page starting after the last
+        key of the previous one, so no page rescans the rows before it and
+        no read transaction stays open between pages.
+        """
+        conn = self._get_conn()
+        available = [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+        columns = list(columns or available)
+        unknown = set(columns) - set(available)
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {', '.join(sorted(unknown))}")
+        selected = columns + [column for column in key if column not in columns]
+        key_list = ', '.join(key)
+        sql = f'SELECT {", ".join(selected)} FROM {table} WHERE {" AND ".join(conditions + ["1"])}'
+
+        last = None
+        while True:
+            if last is None:
+                page = conn.execute(f'{sql} ORDER BY {key_list} LIMIT ?', params + [page_size]).fetchall()
+            else:
+                page = conn.execute(
+                    f'{sql} AND ({key_list}) > ({", ".join("?" * len(key))}) ORDER BY {key_list} LIMIT ?',
+                    params + list(last) + [page_size]
+                ).fetchall()
+            for row in page:
+                yield {column: row[column] for column in columns}
+            if len(page) < page_size:
+                return
+            last = tuple(page[-1][column] for column in key)
+
     def print_database_stats(self):
         """Print statistics about the database content"""
         conn = self._get_conn()
@@ -150,10 +1048,10 @@ class Database:
                 print(f"- Topic: {post['topic']}, URL: {post['url']}")
 
     def close(self):
-        """Close the connection for this thread if it exists"""
-        if hasattr(thread_local, "conn"):
-            thread_local.conn.close()
-            del thread_local.conn
+        """Close this instance's connection for the current thread if it exists"""
+        if hasattr(self._local, "conn"):
+            self._local.conn.close()
+            del self._local.conn
 
 # Create a singleton instance
 db = Database()
@@ -3,10 +3,28 @@ import requests
 import json
 from datetime import datetime
 from dotenv import load_dotenv
+from urllib3.exceptions import NewConnectionError
+from http_client import get_session
 
 # Make sure to load environment variables
 load_dotenv()
 
+# The bulk-upload endpoint takes at most 100 posts per request
+MAX_POSTS_PER_UPLOAD = 100
+UPLOAD_TIMEOUT = int(os.getenv("EXTERNAL_API_TIMEOUT", "30"))
+
+# Upload failures that mean the posts weren't created and can be sent again,
+# and ones where they may have been created despite the error
+TRANSIENT_STATUSES = (429, 502, 503)
+UNCERTAIN_STATUSES = (500, 504)
+
+def _never_connected(error):
+    """True when a request failed before a connection was made (refused, DNS, connect timeout)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
 class TickertalkAPI:
     def __init__(self):
         # Load environment variables
@@ -18,7 +36,7 @@ class TickertalkAPI:
         
         # Get API key
         self.api_key = os.getenv("EXTERNAL_API_KEY")
-        print(f"API key from environment: {self.api_key[:10]}...{self.api_key[-10:] if self.api_key else 'None'}")
+        print(f"API key from environment: {self.api_key[:10] + '...' + self.api_key[-10:] if self.api_key else 'None'}")
         print(f"API key length: {len(self.api_key) if self.api_key else 0}")
         
         # If not found, try to read directly from .env file
@@ -44,6 +62,9 @@ class TickertalkAPI:
             "Authorization": f"Bearer {self.api_key}" if self.api_key else "Bearer mock-key"
         }
         print(f"Authorization header: {self.headers['Authorization']}")
+        
+        # Shared keep-alive session; headers are passed per request
+        self.session = get_session('tickertalk')
         print(f"TickertalkAPI initialized with API key: {'*' * 8 + self.api_key[-4:] if self.api_key else 'None (Mock mode enabled)'}")
     
     def test_api_connection(self):
@@ -65,7 +86,7 @@ class TickertalkAPI:
         for i, headers in enumerate(test_headers):
             try:
                 print(f"Test {i+1}: Using headers: {headers}")
-                response = requests.post(
+                response = self.session.post(
                     f"{self.base_url}/api/external/bulk-upload-posts-comments",
                     headers=headers,
                     data=json.dumps(test_payload),
@@ -87,22 +108,8 @@ class TickertalkAPI:
         
         return results
     
-    def publish_post(self, post_data):
-        """Publish a post to the external API"""
-        print(f"TickertalkAPI.publish_post called with data: {post_data}")
-        
-        # Check if API key is available
-        if not self.api_key and not self.use_mock:
-            print("ERROR: API key not configured. Please set EXTERNAL_API_KEY in .env file or enable mock mode.")
-            return {
-                "success": False,
-                "error": "API key not configured. Set EXTERNAL_API_KEY in .env file or enable mock mode."
-            }
-        
-        print(f"Using API key: {self.api_key[:8]}...{self.api_key[-4:]}")
-        print(f"API URL: {self.base_url}/api/external/bulk-upload-posts-comments")
-        
-        # Format the post data
+    def format_post(self, post_data):
+        """Shape an output-file post into the upload schema"""
         formatted_post = {
             "temp_post_id": post_data.get("temp_post_id", post_data.get("id", "post_001")),
             "title": post_data.get("title", ""),
@@ -123,64 +130,42 @@ class TickertalkAPI:
                 "created_at": comment.get("created_at", datetime.now().isoformat())
             }
             formatted_post["comments"].append(formatted_comment)
-        
-        # Prepare the payload
-        payload = {
-            "posts": [formatted_post]
-        }
-        
-        print(f"Making API request to: {self.base_url}/api/external/bulk-upload-posts-comments")
-        print(f"Headers: {self.headers}")
-        print(f"Payload: {json.dumps(payload, indent=2)}")
-        
-        # Check if we should use mock mode
-        print(f"Mock API mode enabled: {self.use_mock}")
+        return formatted_post
+
+    def _upload(self, payload):
+        """Send one bulk-upload payload (or fake the response in mock mode)"""
         if self.use_mock:
-            print("Using mock API response for testing (API endpoint may not be available)")
-            mock_response = {
+            print(f"Using mock API response for {len(payload['posts'])} post(s)")
+            return {
                 "success": True,
-                "total": 1,
-                "successful": 1,
+                "total": len(payload["posts"]),
+                "successful": len(payload["posts"]),
                 "failed": 0,
                 "results": [
                     {
                         "status": "success",
-                        "post_id": f"mock-{formatted_post.get('temp_post_id', 'unknown')}",
-                        "comments_created": len(formatted_post.get("comments", []))
+                        "post_id": f"mock-{post.get('temp_post_id', 'unknown')}",
+                        "comments_created": len(post.get("comments", []))
                     }
+                    for post in payload["posts"]
                 ]
             }
-            print(f"Mock API response: {json.dumps(mock_response, indent=2)}")
-            return mock_response
         
-        # Make the real API request if not in mock mode
         try:
-            # Create a session
-            session = requests.Session()
-            
-            # Set headers
+            url = f"{self.base_url}/api/external/bulk-upload-posts-comments"
             headers = {
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {self.api_key}"
             }
-            session.headers.update(headers)
-            
-            # Make the request
-            url = f"{self.base_url}/api/external/bulk-upload-posts-comments"
-            print(f"URL: {url}")
-            print(f"Headers: {session.headers}")
-            
-            response = session.post(
+            response = self.session.post(
                 url,
+                headers=headers,
                 data=json.dumps(payload),
-                timeout=10
+                timeout=UPLOAD_TIMEOUT
             )
             
             print(f"Response status: {response.status_code}")
             print(f"Response body: {response.text}")
-            print(f"Response headers: {response.headers}")
-            print(f"Final request URL: {response.request.url}")
-            print(f"Request headers sent: {response.request.headers}")
             
             if response.status_code == 200:
                 return response.json()
@@ -188,13 +173,25 @@ class TickertalkAPI:
                 return {
                     "success": False,
                     "error": f"API Error: {response.status_code}",
-                    "message": response.text
+                    "message": response.text,
+                    "transient": response.status_code in TRANSIENT_STATUSES,
+                    "uncertain": response.status_code in UNCERTAIN_STATUSES
                 }
         except requests.RequestException as e:
+            if _never_connected(e):
+                # Nothing reached the server, so sending again can't duplicate posts
+                return {
+                    "success": False,
+                    "error": "Request failed",
+                    "message": str(e),
+                    "transient": True
+                }
+            # E.g. a read timeout: the upload may or may not have gone through
             return {
                 "success": False,
                 "error": "Request failed",
-                "message": str(e)
+                "message": str(e),
+                "uncertain": True
             }
         except Exception as e:
             return {
@@ -203,6 +200,97 @@ class TickertalkAPI:
                 "message": str(e)
             }
 
+    def publish_post(self, post_data):
+        """Publish a post to the external API"""
+        print(f"TickertalkAPI.publish_post called with data: {post_data}")
+        
+        # Check if API key is available
+        if not self.api_key and not self.use_mock:
+            print("ERROR: API key not configured. Please set EXTERNAL_API_KEY in .env file or enable mock mode.")
+            return {
+                "success": False,
+                "error": "API key not configured. Set EXTERNAL_API_KEY in .env file or enable mock mode."
+            }
+        
+        print(f"API URL: {self.base_url}/api/external/bulk-upload-posts-comments")
+        payload = {
+            "posts": [self.format_post(post_data)]
+        }
+        print(f"Payload: {json.dumps(payload, indent=2)}")
+        return self._upload(payload)
+
+    def publish_posts(self, posts):
+        """
+        Publish many posts, packed into bulk uploads of up to
+        MAX_POSTS_PER_UPLOAD posts each over the shared session.
+
+        Output files all number their posts post_001 and comments
+        comment_001..., so each upload gets its own batch-unique temporary
+        ids and the results are mapped back through them. Returns one
+        {"success", "post_id"} or {"success", "error"} per input post, in
+        input order; a failed upload fails only the posts it carried.
+        """
+        if not self.api_key and not self.use_mock:
+            error = "API key not configured. Set EXTERNAL_API_KEY in .env file or enable mock mode."
+            return [{"success": False, "error": error} for _ in posts]
+
+        results = []
+        for start in range(0, len(posts), MAX_POSTS_PER_UPLOAD):
+            batch = posts[start:start + MAX_POSTS_PER_UPLOAD]
+            payload = {"posts": [
+                self._with_batch_ids(self.format_post(post), start + offset)
+                for offset, post in enumerate(batch)
+            ]}
+            print(f"Uploading posts {start + 1}-{start + len(batch)} of {len(posts)}")
+            response = self._upload(payload)
+            results.extend(self._map_results(payload["posts"], response))
+        return results
+
+    @staticmethod
+    def _with_batch_ids(formatted_post, position):
+        """Give a post and its comments temporary ids unique within the upload"""
+        prefix = f"b{position + 1:03d}"
+        comment_ids = {}
+        for index, comment in enumerate(formatted_post["comments"], 1):
+            new_id = f"{prefix}_comment_{index:03d}"
+            comment_ids[comment["temp_comment_id"]] = new_id
+            comment["temp_comment_id"] = new_id
+        for comment in formatted_post["comments"]:
+            if comment.get("reply_to") in comment_ids:
+                comment["reply_to"] = comment_ids[comment["reply_to"]]
+        formatted_post["temp_post_id"] = f"{prefix}_post"
+        return formatted_post
+
+    @staticmethod
+    def _map_results(sent_posts, response):
+        """Per-post outcomes for one upload, in the order the posts were sent"""
+        if not response.get("results"):
+            error = response.get("error") or "Upload failed"
+            if response.get("message"):
+                error = f"{error}: {response['message']}"
+            failure = {"success": False, "error": error}
+            # Whole-upload failures say whether sending again is safe
+            for flag in ("transient", "uncertain"):
+                if response.get(flag):
+                    failure[flag] = True
+            return [dict(failure) for _ in sent_posts]
+
+        # Prefer the temp_post_id echoed back; otherwise results follow payload order
+        by_temp_id = {item["temp_post_id"]: item for item in response["results"]
+                      if isinstance(item, dict) and item.get("temp_post_id")}
+        mapped = []
+        for index, post in enumerate(sent_posts):
+            item = by_temp_id.get(post["temp_post_id"])
+            if item is None and not by_temp_id and index < len(response["results"]):
+                item = response["results"][index]
+            if item is None:
+                mapped.append({"success": False, "error": "No result returned for this post"})
+            elif item.get("status") == "success" and item.get("post_id"):
+                mapped.append({"success": True, "post_id": item["post_id"]})
+            else:
+                mapped.append({"success": False, "error": item.get("error") or item.get("message") or item.get("status") or "Upload failed"})
+        return mapped
+
 # Test the API if run directly
 if __name__ == "__main__":
     api = TickertalkAPI()
@@ -0,0 +1,178 @@
+import re
+from cssselect import parse as parse_css
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+# Checked in order; the first selector that matches wins, like soup.select_one
+CONTENT_SELECTORS = [
+    'article', '.article-content', '.story-content',
+    '[itemprop="articleBody"]', '.entry-content',
+    '#article-content', '.content-body'
+]
+TITLE_SELECTORS = ['h1', '[itemprop="headline"]', '.article-title', '.entry-title']
+
+class CompiledSelector:
+    """
+    A CSS selector compiled once to an XPath returning only the first match.
+
+    Evaluating an XPath walks the whole tree, so each selector also carries a
+    literal that must appear in the raw markup for it to match at all (its tag,
+    class, id or attribute value). Selectors whose literal is absent from a
+    page are skipped without touching the tree.
+    """
+
+    def __init__(self, selector):
+        self.selector = selector
+        self.xpath = etree.XPath(f"({CSSSelector(selector).path})[1]")
+        self.needle = self._needle(selector)
+
+    @staticmethod
+    def _needle(selector):
+        tree = parse_css(selector)[0].parsed_tree
+        if getattr(tree, 'class_name', None):
+            return re.compile(re.escape(tree.class_name))
+        if getattr(tree, 'id', None):
+            return re.compile(re.escape(tree.id))
+        value = getattr(tree, 'value', None)
+        if value is not None:
+            return re.compile(re.escape(getattr(value, 'value', value)))
+        if getattr(tree, 'element', None):
+            return re.compile(r'<' + re.escape(tree.element) + r'\b', re.IGNORECASE)
+        return None
+
+    def may_match(self, markup):
+        return self.needle is None or markup is None or self.needle.search(markup) is not None
+
+    def first(self, root, markup=None):
+        """Return the first matching element, or None"""
+        if not self.may_match(markup):
+            return None
+        match = self.xpath(root)
+        return match[0] if match else None
+
+_CONTENT = [CompiledSelector(selector) for selector in CONTENT_SELECTORS]
+_TITLE = [CompiledSelector(selector) for selector in TITLE_SELECTORS]
+
+# Text nodes under an element, skipping the same script/style/template strings
+# that BeautifulSoup's get_text() leaves out
+_TEXT_XPATH = etree.XPath(
+    ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False
+)
+
+# Comments and processing instructions are never needed, so don't build nodes for them
+_PARSER = etree.HTMLParser(remove_comments=True, remove_pis=True, no_network=True, collect_ids=False)
+
+_XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+def _to_markup(html):
+    """Decode bytes as UTF-8 where possible; otherwise leave them for lxml to sniff"""
+    if isinstance(html, bytes):
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            return html
+    # lxml rejects unicode input that carries an encoding declaration
+    return _XML_DECLARATION_RE.sub('', html, count=1)
+
+def parse_html(html):
+    """Parse a page (str, or bytes in an unknown charset) into an lxml tree"""
+    html = _to_markup(html)
+    if not html:
+        return None
+    try:
+        return etree.fromstring(html, _PARSER)
+    except etree.XMLSyntaxError:
+        # Raised for documents with no elements at all
+        return None
+
+def get_text(element, separator=''):
+    """Equivalent of BeautifulSoup's Tag.get_text(separator=...)"""
+    return separator.join(_TEXT_XPATH(element))
+
+# Elements that start a new line of text; everything else flows inline
+_BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure',
+    'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre',
+    'section', 'table', 'td', 'th', 'tr', 'ul'
+})
+_SKIP_TAGS = frozenset({'script', 'style', 'template'})
+
+def get_block_text(element):
+    """
+    Text under element with one line per block (paragraph, heading, list
+    item...) and whitespace within a block collapsed, as a browser renders
+    it. Links and other inline markup stay on their paragraph's line.
+    """
+    lines = []
+    current = []
+
+    def end_line():
+        line = ' '.join(''.join(current).split())
+        if line:
+            lines.append(line)
+        current.clear()
+
+    skip = 0
+    for event, node in etree.iterwalk(element, events=('start', 'end')):
+        tag = node.tag.lower() if isinstance(node.tag, str) else ''
+        if event == 'start':
+            if skip or tag in _SKIP_TAGS:
+                skip += 1
+                continue
+            if tag in _BLOCK_TAGS:
+                end_line()
+            if node.text:
+                current.append(node.text)
+            continue
+        if skip:
+            skip -= 1
+            if skip:
+                continue
+        elif tag in _BLOCK_TAGS:
+            end_line()
+        if node is not element and node.tail:
+            current.append(node.tail)
+    end_line()
+    return '\n'.join(lines)
+
+def extract_content(html):
+    """
+    Find the article body and title in a page.
+
+    Returns {"title", "text"} with the raw, uncleaned body text, one line
+    per paragraph, or None when none of the content selectors match.
+    """
+    markup = _to_markup(html)
+    if not isinstance(markup, str):
+        markup = None  # Undecoded bytes: no prefilter, evaluate every selector
+
+    # Nothing can match, so don't build a tree at all
+    if markup is not None and not any(selector.may_match(markup) for selector in _CONTENT):
+        return None
+
+    root = parse_html(html)
+    if root is None:
+        return None
+
+    article_text = ""
+    for selector in _CONTENT:
+        content = selector.first(root, markup)
+        if content is not None:
+            article_text = get_block_text(content)
+            break
+
+    if not article_text:
+        return None
+
+    title = ""
+    for selector in _TITLE:
+        title_elem = selector.first(root, markup)
+        if title_elem is not None:
+            title = get_text(title_elem).strip()
+            break
+
+    return {
+        "title": title,
+        "text": article_text
+    }
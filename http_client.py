@@ -0,0 +1,66 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of per-host pools kept alive and connections per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Retries for 429/5xx and connection errors, with exponential backoff
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def _build_retry(retry_methods):
+    return Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=retry_methods,
+        respect_retry_after_header=True,
+        raise_on_status=False  # Hand the last response back instead of raising
+    )
+
+def _build_session(retry_methods):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=_build_retry(retry_methods)
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session(name='default', retry_methods=('GET', 'HEAD', 'OPTIONS')):
+    """
+    Return a shared keep-alive session with per-host connection pools.
+
+    Sessions are created once per name and shared across threads, so callers
+    must pass headers per request instead of mutating session.headers. Only
+    retry_methods are retried; POSTs are not retried by default because
+    publishing isn't idempotent.
+    """
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _build_session(frozenset(retry_methods))
+                _sessions[name] = session
+    return session
+
+def close_sessions():
+    """Close every pooled connection, e.g. on shutdown"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from content_index import index_output_file
+from workers import canonical_url, get_domain, run_ordered
+
+# Row states reported to the client
+ROW_QUEUED = 'queued'
+ROW_FETCHING = 'fetching'
+ROW_GENERATING = 'generating'
+ROW_DONE = 'done'
+ROW_FAILED = 'failed'
+
+# Per-row error messages, matching what /process and /process_selected returned
+ERROR_FORMATS = {
+    'csv': ("{label}: Error - {error}", "{label}: Failed to process article from {url}"),
+    'selection': ("Error processing article from {url}: {error}", "Failed to process article from {url}"),
+}
+# Rows skipped as near-duplicates (see near_dup.py)
+SKIPPED_FORMATS = {
+    'csv': "{label}: Skipped {url}, a near-duplicate of {duplicate_of}",
+    'selection': "Skipped {url}, a near-duplicate of {duplicate_of}",
+}
+
+# How many finished jobs to keep around for polling
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "50"))
+
+def write_output(all_posts, output_dir='outputs'):
+    """Write a finished batch of posts under outputs/ and return the path"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(output_dir, exist_ok=True)
+    output_filename = f'{output_dir}/output_{timestamp}.json'
+    suffix = 1
+    while os.path.exists(output_filename):
+        suffix += 1
+        # Zero-padded so names sort in write order (_010 after _002), which
+        # sync_output_dir and content_dedup rely on
+        output_filename = f'{output_dir}/output_{timestamp}_{suffix:03d}.json'
+
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        json.dump(all_posts, f, indent=2, ensure_ascii=False)
+    index_output_file(output_filename, all_posts)
+    return output_filename
+
+class Job:
+    """A batch of article rows being processed in the background"""
+
+    def __init__(self, kind, rows, bypass_cache=False):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.bypass_cache = bypass_cache
+        self.status = 'queued'
+        self.created_at = datetime.now().isoformat()
+        self.started = None
+        self.finished = None
+        self.message = None
+        self.error = None
+        self.filename = None
+        # Each row: label, url, topic, status, error, posts
+        self.rows = rows
+        # Rows that failed validation never run, so they don't count towards the ETA
+        self.prefailed = sum(1 for row in rows if row['status'] == ROW_FAILED)
+
+    def to_dict(self, include_data=True):
+        """Snapshot of the job for the API. Caller must hold the manager lock."""
+        counts = {state: 0 for state in (ROW_QUEUED, ROW_FETCHING, ROW_GENERATING, ROW_DONE, ROW_FAILED)}
+        for row in self.rows:
+            counts[row['status']] += 1
+        completed = counts[ROW_DONE] + counts[ROW_FAILED]
+        remaining = len(self.rows) - completed
+
+        # Estimate from observed throughput, which already reflects concurrency
+        eta_seconds = None
+        processed = completed - self.prefailed
+        if self.started and not self.finished and processed:
+            elapsed = time.monotonic() - self.started
+            eta_seconds = round(elapsed / processed * remaining, 1)
+
+        job = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'bypass_cache': self.bypass_cache,
+            'status': self.status,
+            'created_at': self.created_at,
+            'total': len(self.rows),
+            'completed': completed,
+            'counts': counts,
+            'eta_seconds': eta_seconds,
+            'message': self.message,
+            'error': self.error,
+            'filename': self.filename,
+        }
+        if include_data:
+            job['rows'] = [
+                {'row': row['label'], 'url': row['url'], 'topic': row['topic'],
+                 'status': row['status'], 'error': row['error']}
+                for row in self.rows
+            ]
+            job['data'] = {"posts": [post for row in self.rows if row['posts'] for post in row['posts']]}
+            job['errors'] = [row['error'] for row in self.rows if row['error']] or None
+        return job
+
+class JobManager:
+    """
+    Runs article-processing jobs on background threads and tracks their
+    progress. Rows listing the same article (by canonical URL) are processed
+    together with one call to process_func(url, topics, on_progress=,
+    bypass_cache=), which returns an output per topic.
+    """
+
+    def __init__(self, process_func, output_dir='outputs'):
+        self.process_func = process_func
+        self.output_dir = output_dir
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, rows, bypass_cache=False):
+        """
+        Queue a job and return its id immediately.
+
+        kind is 'csv' or 'selection'. rows is a list of dicts with 'label',
+        'url', 'topic' and, for rows that already failed validation, 'error'.
+        bypass_cache regenerates every row instead of reusing cached output.
+        """
+        job_rows = []
+        for row in rows:
+            job_rows.append({
+                'label': row['label'],
+                'url': row.get('url'),
+                'topic': row.get('topic'),
+                'status': ROW_FAILED if row.get('error') else ROW_QUEUED,
+                'error': row.get('error'),
+                'posts': None,
+            })
+        job = Job(kind, job_rows, bypass_cache)
+
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+
+        thread = threading.Thread(target=self._run, args=(job,), name=f"job-{job.id[:8]}", daemon=True)
+        thread.start()
+        return job.id
+
+    def get(self, job_id, include_data=True):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict(include_data) if job else None
+
+    def list(self):
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+            return [job.to_dict(include_data=False) for job in jobs]
+
+    def _set_row(self, row, **fields):
+        with self._lock:
+            row.update(fields)
+
+    def _process_group(self, job, rows):
+        """Process rows that share an article: extracted and generated once, formatted per topic"""
+        error_format, _ = ERROR_FORMATS[job.kind]
+
+        def on_progress(stage):
+            for row in rows:
+                self._set_row(row, status=stage)
+
+        try:
+            posts = self.process_func(rows[0]['url'], [row['topic'] for row in rows],
+                                      on_progress=on_progress, bypass_cache=job.bypass_cache)
+        except Exception as e:
+            for row in rows:
+                self._set_row(row, status=ROW_FAILED, error=error_format.format(label=row['label'], url=row['url'], error=str(e)))
+            return
+
+        for row, post in zip(rows, posts):
+            self._finish_row(job, row, post)
+
+    def _finish_row(self, job, row, post):
+        _, failed_format = ERROR_FORMATS[job.kind]
+        if post and post.get("posts"):
+            self._set_row(row, status=ROW_DONE, posts=post["posts"])
+        elif post and post.get("duplicate_of"):
+            message = SKIPPED_FORMATS[job.kind].format(label=row['label'], url=row['url'], duplicate_of=post["duplicate_of"])
+            self._set_row(row, status=ROW_FAILED, error=message)
+        else:
+            self._set_row(row, status=ROW_FAILED, error=failed_format.format(label=row['label'], url=row['url']))
+
+    def _run(self, job):
+        with self._lock:
+            job.status = 'running'
+            job.started = time.monotonic()
+
+        groups = {}
+        for row in job.rows:
+            if row['status'] == ROW_QUEUED:
+                groups.setdefault(canonical_url(row['url']), []).append(row)
+        run_ordered(groups.values(), lambda rows: self._process_group(job, rows), key=lambda rows: get_domain(rows[0]['url']))
+
+        with self._lock:
+            success_count = sum(1 for row in job.rows if row['status'] == ROW_DONE)
+            all_posts = {"posts": [post for row in job.rows if row['posts'] for post in row['posts']]}
+
+        filename = None
+        error = None
+        if success_count:
+            try:
+                filename = write_output(all_posts, self.output_dir)
+            except Exception as e:
+                error = f"Failed to write output: {str(e)}"
+        else:
+            error = 'No articles were successfully processed'
+
+        with self._lock:
+            job.finished = time.monotonic()
+            job.filename = filename
+            if error:
+                job.status = 'failed'
+                job.error = error
+            else:
+                job.status = 'done'
+                job.message = f'Successfully processed {success_count} articles'
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS. Caller holds the lock."""
+        finished = [job for job in self._jobs.values() if job.finished]
+        finished.sort(key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
@@ -0,0 +1,399 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+
+# Which provider serves each kind of call: cohere, gemini or fake.
+# LLM_PROVIDER overrides both, e.g. LLM_PROVIDER=fake to run offline.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "").lower() or None
+LLM_POST_PROVIDER = os.getenv("LLM_POST_PROVIDER", "cohere").lower()
+LLM_REPLY_PROVIDER = os.getenv("LLM_REPLY_PROVIDER", "gemini").lower()
+
+# Calls in flight per provider, across every thread in the process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Default deadline for one call, retries and waiting for a slot included
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Attempts per call for transient errors (rate limits, 5xx, timeouts)
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+# Retries a provider may make, as a share of its calls; stops a struggling
+# provider being hit with several times the normal traffic
+LLM_RETRY_BUDGET = float(os.getenv("LLM_RETRY_BUDGET", "0.2"))
+# Consecutive failures that open the circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Fake provider behaviour
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.05"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+
+class LLMError(Exception):
+    """A generation call failed; transient is True when retrying might help"""
+
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
+class LLMTimeout(LLMError):
+    def __init__(self, message):
+        super().__init__(message, transient=True)
+
+class CircuitOpenError(LLMError):
+    pass
+
+# Vendor exceptions worth retrying, by class name so neither SDK has to be imported
+_TRANSIENT_ERRORS = {
+    'TooManyRequestsError', 'ServiceUnavailableError', 'InternalServerError', 'GatewayTimeoutError',
+    'ResourceExhausted', 'ServiceUnavailable', 'DeadlineExceeded',
+    'TimeoutException', 'ReadTimeout', 'ConnectTimeout', 'ConnectError', 'TimeoutError', 'Timeout',
+}
+
+def is_transient(error):
+    if isinstance(error, LLMError):
+        return error.transient
+    if type(error).__name__ in _TRANSIENT_ERRORS:
+        return True
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures and rejects calls for
+    `cooldown` seconds; then lets one trial call through (half-open) and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, failures, cooldown):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half_open' if time.monotonic() - self._opened_at >= self.cooldown else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def cancel(self):
+        """A call allow()ed through never reached the provider"""
+        with self._lock:
+            self._trial = False
+
+    def record(self, success):
+        with self._lock:
+            self._trial = False
+            if success:
+                self._consecutive = 0
+                self._opened_at = None
+                return
+            self._consecutive += 1
+            if self._opened_at is not None or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+
+class RetryBudget:
+    """Each call earns `ratio` of a retry, up to `cap`; each retry spends one"""
+
+    def __init__(self, ratio, cap=10.0):
+        self.ratio = ratio
+        self.cap = cap
+        self.tokens = cap
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class Provider:
+    """
+    One LLM vendor behind a concurrency cap, a deadline per call, retries
+    with backoff for transient errors (within a retry budget) and a circuit
+    breaker. Subclasses implement _call; clients are created on first use.
+    """
+
+    name = None
+
+    def __init__(self, max_concurrency=None, max_attempts=None):
+        self.max_concurrency = max_concurrency or LLM_MAX_CONCURRENCY
+        self.max_attempts = max_attempts or LLM_MAX_ATTEMPTS
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN)
+        self.retry_budget = RetryBudget(LLM_RETRY_BUDGET)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._stats = {'calls': 0, 'succeeded': 0, 'failed': 0, 'retries': 0, 'rejected': 0, 'in_flight': 0}
+        self._stats_lock = threading.Lock()
+
+    def model_label(self, model):
+        """How responses from this provider are labelled (and cached)"""
+        return model
+
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    def _make_client(self):
+        return None
+
+    def _call(self, prompt, model, preamble, schema, temperature, timeout):
+        raise NotImplementedError
+
+    def _count(self, field, delta=1):
+        with self._stats_lock:
+            self._stats[field] += delta
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['circuit'] = self.breaker.state
+        stats['max_concurrency'] = self.max_concurrency
+        return stats
+
+    def generate(self, prompt, model, preamble=None, schema=None, temperature=None, timeout=None):
+        """
+        Return the response text. Raises LLMTimeout once `timeout` seconds
+        (default LLM_TIMEOUT) have gone by, CircuitOpenError while the
+        provider is failing, and LLMError for anything else.
+        """
+        start = time.perf_counter()
+        outcome = 'success'
+        try:
+            return self._generate(prompt, model, preamble, schema, temperature, timeout)
+        except LLMTimeout:
+            outcome = 'timeout'
+            raise
+        except CircuitOpenError:
+            outcome = 'rejected'
+            raise
+        except Exception:
+            outcome = 'failure'
+            raise
+        finally:
+            metrics.llm_seconds.observe(time.perf_counter() - start, provider=self.name)
+            metrics.llm_requests.inc(provider=self.name, outcome=outcome)
+
+    def _generate(self, prompt, model, preamble, schema, temperature, timeout):
+        deadline = time.monotonic() + (timeout or LLM_TIMEOUT)
+        self._count('calls')
+        self.retry_budget.earn()
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self.breaker.allow():
+                self._count('rejected')
+                raise CircuitOpenError(f"{self.name}: circuit open after repeated failures")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+                self.breaker.cancel()  # Our own queueing says nothing about the provider
+                self._count('failed')
+                raise LLMTimeout(f"{self.name}: no capacity before the deadline")
+            self._count('in_flight')
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeout(f"{self.name}: deadline passed")
+                text = self._call(prompt, model, preamble, schema, temperature, remaining)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                self._count('in_flight', -1)
+                self._slots.release()
+
+            if error is None:
+                self.breaker.record(True)
+                self._count('succeeded')
+                return text
+
+            self.breaker.record(False)
+            transient = is_transient(error)
+            delay = min(8.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+            if (transient and attempt < self.max_attempts and time.monotonic() + delay < deadline
+                    and self.retry_budget.spend()):
+                print(f"{self.name} call failed ({error}); retrying in {delay:.1f}s")
+                self._count('retries')
+                time.sleep(delay)
+                continue
+            self._count('failed')
+            if isinstance(error, LLMError):
+                raise error
+            raise LLMError(f"{self.name}: {error}", transient=transient) from error
+
+    async def agenerate(self, prompt, model, preamble=None, schema=None, temperature=None, timeout=None):
+        """generate() for asyncio code; runs on a worker thread under the same limits"""
+        return await asyncio.to_thread(self.generate, prompt, model, preamble, schema, temperature, timeout)
+
+class CohereProvider(Provider):
+    name = 'cohere'
+
+    def _make_client(self):
+        import cohere
+        api_key = os.getenv("COHERE_API_KEY")
+        if not api_key:
+            raise LLMError("COHERE_API_KEY not found in environment variables")
+        return cohere.Client(api_key)
+
+    def _call(self, prompt, model, preamble, schema, temperature, timeout):
+        kwargs = {'message': prompt, 'model': model}
+        if preamble:
+            kwargs['preamble'] = preamble
+        if temperature is not None:
+            kwargs['temperature'] = temperature
+        if schema:
+            kwargs['response_format'] = {'type': 'json_schema', 'schema': schema}
+        response = self.client().chat(**kwargs, request_options={'timeout_in_seconds': max(1, int(timeout))})
+        return response.text
+
+class GeminiProvider(Provider):
+    name = 'gemini'
+
+    def _make_client(self):
+        import google.generativeai as genai
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise LLMError("GOOGLE_API_KEY not found in environment variables")
+        genai.configure(api_key=api_key)
+        return genai
+
+    def _call(self, prompt, model, preamble, schema, temperature, timeout):
+        genai = self.client()
+        generation_config = {}
+        if temperature is not None:
+            generation_config['temperature'] = temperature
+        if schema:
+            generation_config['response_mime_type'] = 'application/json'
+            generation_config['response_schema'] = schema
+        response = genai.GenerativeModel(model, system_instruction=preamble).generate_content(
+            prompt, generation_config=generation_config or None, request_options={'timeout': timeout}
+        )
+        return response.text.strip()
+
+_WORDS = ("market", "stock", "breakout", "support", "volume", "earnings", "margin", "guidance",
+          "rally", "valuation", "momentum", "quarter", "target", "risk", "upside", "trend")
+_NAME_LINE = re.compile(r'^Name: (.+)$', re.MULTILINE)
+
+class FakeProvider(Provider):
+    """
+    In-process stand-in that needs no network or keys. Responses are derived
+    from a hash of the prompt, so the same prompt always gets the same text
+    and the same latency and failures. With a schema it returns matching
+    JSON; arrays of objects with a "name" get one entry per "Name:" line in
+    the prompt, the way the reply prompts list personas.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency=None, failure_rate=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = FAKE_LLM_LATENCY if latency is None else latency
+        self.failure_rate = FAKE_LLM_FAILURE_RATE if failure_rate is None else failure_rate
+        self._attempts = {}
+        self._attempts_lock = threading.Lock()
+
+    def model_label(self, model):
+        return f"fake:{model}"
+
+    def _call(self, prompt, model, preamble, schema, temperature, timeout):
+        seed = hashlib.sha256(f"{model}\0{preamble or ''}\0{prompt}".encode('utf-8')).digest()
+        # Latency and failures also depend on how often this prompt was sent,
+        # so a retry can succeed; the response text only on the prompt
+        with self._attempts_lock:
+            attempt = self._attempts.get(seed, 0)
+            self._attempts[seed] = attempt + 1
+        roll = random.Random(seed + attempt.to_bytes(4, 'big'))
+        delay = self.latency * roll.uniform(0.5, 1.5)
+        if delay > timeout:
+            time.sleep(timeout)
+            raise LLMTimeout(f"fake: response took longer than {timeout:.1f}s")
+        time.sleep(delay)
+        if roll.random() < self.failure_rate:
+            raise LLMError("fake: simulated failure", transient=True)
+        rng = random.Random(seed)
+        if schema:
+            return json.dumps(self._fill(schema, rng, prompt))
+        return self._text(rng)
+
+    def _text(self, rng, sentences=3):
+        return ' '.join(
+            ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(6, 12))).capitalize() + '.'
+            for _ in range(sentences)
+        )
+
+    def _fill(self, schema, rng, prompt, key=None):
+        kind = schema.get('type')
+        if kind == 'object':
+            return {name: self._fill(sub, rng, prompt, name) for name, sub in schema.get('properties', {}).items()}
+        if kind == 'array':
+            items = schema.get('items', {})
+            if 'name' in items.get('properties', {}):
+                return [dict(self._fill(items, rng, prompt), name=name.strip()) for name in _NAME_LINE.findall(prompt)]
+            return [self._fill(items, rng, prompt) for _ in range(3)]
+        if kind in ('integer', 'number'):
+            return rng.randint(1, 100)
+        if kind == 'boolean':
+            return rng.random() < 0.5
+        if key == 'title':
+            return ' '.join(rng.choice(_WORDS) for _ in range(5)).title()
+        return self._text(rng)
+
+PROVIDERS = {'cohere': CohereProvider, 'gemini': GeminiProvider, 'fake': FakeProvider}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_provider(name):
+    """The shared instance of a provider, so its limits apply process-wide"""
+    with _providers_lock:
+        if name not in _providers:
+            if name not in PROVIDERS:
+                raise LLMError(f"Unknown LLM provider {name!r}")
+            _providers[name] = PROVIDERS[name]()
+        return _providers[name]
+
+def provider_for(kind):
+    """Provider for 'post' or 'reply' calls"""
+    return get_provider(LLM_PROVIDER or (LLM_POST_PROVIDER if kind == 'post' else LLM_REPLY_PROVIDER))
+
+def get_stats():
+    with _providers_lock:
+        providers = dict(_providers)
+    return {name: provider.stats() for name, provider in providers.items()}
+
+metrics.Gauge(
+    'llm_in_flight', 'LLM calls currently running per provider', ('provider',),
+    func=lambda: {(name,): stats['in_flight'] for name, stats in get_stats().items()}
+)
+metrics.Gauge(
+    'llm_circuit_open', '1 while the provider\'s circuit breaker is open or half-open', ('provider',),
+    func=lambda: {(name,): int(stats['circuit'] != 'closed') for name, stats in get_stats().items()}
+)
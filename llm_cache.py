@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from database import db
+
+load_dotenv()
+
+# Responses older than this are regenerated, and at most this many are kept
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+# Set to false to turn the cache off entirely
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+
+# Evict after this many writes rather than on every one
+EVICT_EVERY = 50
+
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'bypassed': 0,
+    'errors': 0,
+    'saved_seconds': 0.0,   # LLM time the hits would have cost
+    'llm_seconds': 0.0      # LLM time actually spent (misses and bypasses)
+}
+_stats_lock = threading.Lock()
+_writes = 0
+
+def _record(field, saved_seconds=0.0):
+    with _stats_lock:
+        _stats[field] += 1
+        _stats['saved_seconds'] += saved_seconds
+
+def get_stats():
+    """Hit rate and LLM latency saved since start-up, plus what's stored"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    stats['saved_seconds'] = round(stats['saved_seconds'], 3)
+    stats['llm_seconds'] = round(stats['llm_seconds'], 3)
+    try:
+        stats['stored'] = db.llm_cache_counts()
+    except Exception as e:
+        stats['stored'] = {'error': str(e)}
+    return stats
+
+def _jsonable(value):
+    # Personas come from reference_data as read-only mappings
+    if hasattr(value, 'items'):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    return value
+
+def cache_key(kind, model, temperature, template_version, **inputs):
+    """sha256 over everything that determines the response"""
+    material = {
+        'kind': kind,
+        'model': model,
+        'temperature': temperature,
+        'template_version': template_version,
+        'inputs': _jsonable(inputs)
+    }
+    raw = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _maybe_evict(now):
+    global _writes
+    with _stats_lock:
+        _writes += 1
+        due = _writes % EVICT_EVERY == 1
+    if due:
+        removed = db.evict_llm_cache(now - LLM_CACHE_MAX_AGE_DAYS * 86400, LLM_CACHE_MAX_ENTRIES)
+        if removed:
+            print(f"LLM cache: evicted {removed} entries")
+
+def cached_call(kind, model, key, call, bypass=False):
+    """
+    Return call()'s result through the cache under key.
+
+    Empty results (None, "") are failures and never cached. With bypass the
+    call always runs and its result replaces whatever was cached, which is
+    how a deliberate re-roll is done. Cache errors never fail the call.
+    """
+    if not LLM_CACHE_ENABLED:
+        return call()
+
+    now = time.time()
+    if bypass:
+        _record('bypassed')
+    else:
+        try:
+            cached = db.get_llm_response(key, now - LLM_CACHE_MAX_AGE_DAYS * 86400, now)
+        except Exception as e:
+            print(f"LLM cache read failed: {e}")
+            _record('errors')
+            cached = None
+        if cached is not None:
+            _record('hits', cached['latency'] or 0.0)
+            return cached['response']
+
+    started = time.monotonic()
+    result = call()
+    latency = time.monotonic() - started
+    with _stats_lock:
+        _stats['llm_seconds'] += latency
+        if not bypass:
+            _stats['misses'] += 1
+
+    if result:
+        try:
+            db.save_llm_response(key, kind, model, result, latency, time.time())
+            _maybe_evict(now)
+        except Exception as e:
+            print(f"LLM cache write failed: {e}")
+            _record('errors')
+    return result
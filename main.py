@@ -1,17 +1,33 @@
 import json
 import os
 import random
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 from database import db  # Import database module
 
 from news_scraper import extract_article
+from condense import condense
 from postgen import generate_post
-from replies import generate_reply
+from replies import generate_reply, generate_replies
+from topic_index import get_topic_index
+from reference_data import load_topics, load_personas
+from workers import canonical_url, get_domain
+from metrics import articles_processed, timed
+from llm_cache import LLM_CACHE_MAX_AGE_DAYS
+import near_dup
 
 load_dotenv()
 
+# Reply generation is fanned out on one pool shared by every article being
+# processed, so the pool size caps concurrent Gemini calls process-wide
+REPLY_MAX_CONCURRENCY = int(os.getenv("REPLY_MAX_CONCURRENCY", "10"))
+REPLY_TIMEOUT = float(os.getenv("REPLY_TIMEOUT", "30"))
+# Ask for every commenter's reply in one call instead of one call per commenter
+REPLY_BATCHED = os.getenv("REPLY_BATCHED", "true").lower() == "true"
+reply_executor = ThreadPoolExecutor(max_workers=REPLY_MAX_CONCURRENCY, thread_name_prefix="reply")
+
 def generate_temp_id(prefix, index):
     return f"{prefix}_{str(index).zfill(3)}"
 
@@ -31,30 +47,18 @@ def generate_random_future_timestamp(reference_time):
     future_time = reference_time + timedelta(minutes=minutes_ahead)
     return future_time.isoformat()
 
-def load_topics():
-    with open('topics.json', 'r', encoding='utf-8') as f:
-        return set(json.load(f))
-
+@timed('topic')
 def extract_topic_from_content(content, available_topics):
-    # Convert content to uppercase since topics are in uppercase
-    content_upper = content.upper()
-    
-    # Try to find any topic mention in the content
-    for topic in available_topics:
-        if topic in content_upper:
-            return topic
-            
-    # If no direct match found, look for common stock variations
-    # Remove common prefixes/suffixes that might appear in content
-    content_words = set(re.findall(r'\b[A-Z0-9]+\b', content_upper))
-    for topic in available_topics:
-        base_topic = re.sub(r'(LTD|LIMITED|INDIA|&CO)$', '', topic)
-        if base_topic.strip() in content_words:
-            return topic
-            
-    # Default to NIFTY if no match found
-    return "NIFTY"
+    """
+    Pick the topic the content is about, or NIFTY when none is mentioned.
 
+    Mentions are found in one pass by the topic index; whole-word mentions
+    beat base forms (BOSCH for BOSCHLTD), which beat matches inside longer
+    words, and ties go to the most frequent, then earliest mention.
+    """
+    return get_topic_index(available_topics).best(content)
+
+@timed('format')
 def create_formatted_output(post_content, post_author, comments, forced_topic=None):
     try:
         now = datetime.now(timezone.utc)
@@ -103,33 +107,255 @@ def create_formatted_output(post_content, post_author, comments, forced_topic=No
     except Exception as e:
         raise Exception(f"Error formatting output: {str(e)}")
 
-def process_article(url, forced_topic=None):
-    """Process a single article URL and return the generated post data"""
-    
+def generate_comments(post_text, replying_bots, timeout=None, bypass_cache=False):
+    """
+    Generate one reply per bot and return the comments in the same order as
+    replying_bots. With REPLY_BATCHED all replies come from one Gemini call;
+    bots it didn't cover (a malformed response, missing or empty entries)
+    fall back to one call each.
+    """
+    timeout = timeout or REPLY_TIMEOUT
+    replies = {}
+    if REPLY_BATCHED and replying_bots:
+        replies = generate_replies(post_text, replying_bots, timeout, bypass_cache=bypass_cache)
+    missing = [bot for bot in replying_bots if bot['name'] not in replies]
+    if missing:
+        if REPLY_BATCHED:
+            print(f"Batched replies missing for {len(missing)} of {len(replying_bots)} personas; generating individually")
+        for comment in generate_comments_individually(post_text, missing, timeout, bypass_cache):
+            replies[comment['author']] = comment['reply']
+    return [{"author": bot['name'], "reply": replies[bot['name']]} for bot in replying_bots]
+
+def generate_comments_individually(post_text, replying_bots, timeout=None, bypass_cache=False):
+    """
+    Generate one reply per bot concurrently, one call each, in the same
+    order as replying_bots. Each call gets `timeout` seconds from the
+    moment it starts (time queued behind the shared cap doesn't count); a
+    reply that fails or times out becomes an empty reply without holding up
+    the others.
+    """
+    timeout = timeout or REPLY_TIMEOUT
+    started_at = {}
+
+    def run_reply(index, bot):
+        started_at[index] = time.monotonic()
+        return generate_reply(post_text, bot, timeout, bypass_cache=bypass_cache)
+
+    futures = [reply_executor.submit(run_reply, index, bot) for index, bot in enumerate(replying_bots)]
+
+    comments = []
+    for index, (bot, future) in enumerate(zip(replying_bots, futures)):
+        try:
+            while True:
+                started = started_at.get(index)
+                remaining = timeout if started is None else started + timeout - time.monotonic()
+                try:
+                    reply = future.result(timeout=max(remaining, 0))
+                    break
+                except FutureTimeoutError:
+                    # Only give up once the call itself has used its budget
+                    if index in started_at and time.monotonic() >= started_at[index] + timeout:
+                        raise
+        except FutureTimeoutError:
+            print(f"Reply from {bot['name']} timed out after {timeout}s")
+            reply = ""
+        except Exception as e:
+            print(f"Error generating reply from {bot['name']}: {e}")
+            reply = ""
+        comments.append({
+            "author": bot['name'],
+            "reply": reply
+        })
+    return comments
+
+def condense_article(url, text):
+    """Trim the article to the prompt's token budget and record what was saved"""
+    condensed, stats = condense(text)
+    if stats['tokens_saved']:
+        print(f"Condensed {url}: {stats['original_tokens']} -> {stats['condensed_tokens']} tokens")
+    try:
+        db.save_condensation(url, stats)
+    except Exception as e:
+        print(f"Error saving condensation stats for {url}: {e}")
+    return condensed
+
+def mark_duplicate(output, duplicate):
+    post = output["posts"][0]
+    post["duplicate_of"] = duplicate['url']
+    post["duplicate_similarity"] = round(duplicate['similarity'], 2)
+
+def save_output(url, forced_topic, output):
+    """
+    Cache the output under its topic. Unforced runs are saved too so a later
+    near-duplicate can reuse them; only forced-topic runs read them back.
+    """
+    db.save_generated_post(url, forced_topic or output["posts"][0]["topic"], output)
+
+def _generation_cutoff():
+    """Saved generations older than this (epoch seconds) are made again, like LLM responses"""
+    return time.time() - LLM_CACHE_MAX_AGE_DAYS * 86400
+
+def reuse_generation(duplicate_url):
+    """
+    The post and replies generated for duplicate_url, to be reformatted with
+    fresh ids and timestamps, or None if nothing was saved for it.
+    """
+    generation = db.get_article_generation(canonical_url(duplicate_url), _generation_cutoff())
+    if generation:
+        return generation
+    # Generated before article_generations existed: take its latest output
+    cached = db.get_latest_generated_post(duplicate_url)
+    if not cached or not cached['output'].get("posts"):
+        return None
+    # created_at is SQLite's CURRENT_TIMESTAMP, UTC
+    created = datetime.strptime(cached['created_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    if created.timestamp() < _generation_cutoff():
+        return None
+    post = cached['output']["posts"][0]
+    return {
+        "content": post["content"],
+        "author": post["username"],
+        "comments": [{"author": comment["username"], "reply": comment["body"]} for comment in post.get("comments", [])]
+    }
+
+def process_article(url, forced_topic=None, on_progress=None, bypass_cache=False):
+    """
+    Process a single article URL and return the generated post data.
+
+    on_progress, if given, is called with the stage name ('fetching',
+    'generating') as the article moves through the pipeline. bypass_cache
+    re-rolls the post and replies instead of reusing cached LLM output.
+
+    A near-duplicate of an article processed recently (the same wire story
+    on another site) is handled per near_dup.NEAR_DUP_ACTION: skipped, returned as
+    {"posts": [], "duplicate_of": url}; reused; or flagged with
+    duplicate_of on the post. bypass_cache always generates, flagging.
+    """
+    return process_article_topics(url, [forced_topic], on_progress, bypass_cache)[0]
+
+def process_article_topics(url, topics, on_progress=None, bypass_cache=False):
+    """
+    Process one article for several topics and return one output per topic,
+    in order, as process_article would for each (a None topic is picked
+    from the post).
+
+    The article is extracted and its post and replies generated once; the
+    generation is cached by canonical URL in article_generations for
+    LLM_CACHE_MAX_AGE_DAYS, and every topic's output is formatted from it.
+    Outputs already cached for a topic are returned as they are unless
+    bypass_cache, which re-rolls the shared generation once for all topics.
+
+    Each output is counted under articles_processed_total by source domain:
+    generated, cached, duplicate (skipped or reused) or failed.
+    """
+    domain = get_domain(url)
+    try:
+        with timed('total'):
+            results = _process_article_topics(url, topics, on_progress, bypass_cache)
+    except Exception:
+        articles_processed.inc(len(topics), domain=domain, outcome='failed')
+        raise
+    for _, outcome in results:
+        articles_processed.inc(domain=domain, outcome=outcome)
+    return [output for output, _ in results]
+
+def _process_article_topics(url, topics, on_progress, bypass_cache):
+    """process_article_topics' pipeline; returns [(output, outcome)] per topic"""
+    results = [None] * len(topics)
     # Check cache first
-    if forced_topic:
-        cached_post = db.get_generated_post(url, forced_topic)
-        if cached_post:
-            return cached_post['output']
-    
+    if not bypass_cache:
+        for index, topic in enumerate(topics):
+            cached_post = db.get_generated_post(url, topic) if topic else None
+            if cached_post:
+                results[index] = (cached_post['output'], 'cached')
+        if all(results):
+            return results
+
+    generation, outcome = generate_article(url, on_progress, bypass_cache)
+    for index, topic in enumerate(topics):
+        if results[index]:
+            continue
+        if generation is None:
+            results[index] = (None, outcome)
+            continue
+        duplicate = generation.get("duplicate")
+        if generation.get("skipped"):
+            results[index] = ({"posts": [], "duplicate_of": duplicate['url']}, outcome)
+            continue
+
+        # Format according to schema, using the topic if provided
+        output = create_formatted_output(
+            post_content=generation["content"],
+            post_author=generation["author"],
+            comments=generation["comments"],
+            forced_topic=topic
+        )
+        if duplicate:
+            mark_duplicate(output, duplicate)
+        save_output(url, topic, output)
+        results[index] = (output, outcome)
+    return results
+
+def generate_article(url, on_progress=None, bypass_cache=False):
+    """
+    Extract the article and generate its post and replies, independent of
+    topic. Returns (generation, outcome): generation has content, author,
+    comments and, for a near-duplicate, duplicate; it is
+    {"skipped": True, "duplicate": ...} when NEAR_DUP_ACTION skips it, and
+    None when extraction or generation failed.
+
+    Served from article_generations unless bypass_cache, so an unforced run
+    never re-prompts for an article it has already generated, even when
+    later runs list it under new topics. Generations older than
+    LLM_CACHE_MAX_AGE_DAYS are made again, as LLM responses are.
+    """
+    key = canonical_url(url)
+    if not bypass_cache:
+        generation = db.get_article_generation(key, _generation_cutoff())
+        if generation:
+            return generation, 'cached'
+
     # Load personas
-    with open('personas.json', 'r', encoding='utf-8') as f:
-        personas = json.load(f)
+    personas = load_personas()
 
+    if on_progress:
+        on_progress('fetching')
     article = extract_article(url)
     
     if not article:
-        return None
+        return None, 'failed'
+
+    signature = None
+    duplicate = None
+    action = near_dup.NEAR_DUP_ACTION
+    if action != 'off':
+        signature = near_dup.signature(article['text'])
+        duplicate = near_dup.find_duplicate(url, signature)
+    if duplicate:
+        print(f"{url} is a near-duplicate of {duplicate['url']} ({duplicate['similarity']:.0%} similar)")
+        if bypass_cache:
+            action = 'flag'
+        if action == 'skip':
+            return {"skipped": True, "duplicate": duplicate}, 'duplicate'
+        if action == 'reuse':
+            generation = reuse_generation(duplicate['url'])
+            if generation:
+                generation = dict(generation, duplicate=duplicate)
+                db.save_article_generation(key, generation)
+                near_dup.remember(url, signature)
+                return generation, 'duplicate'
 
+    if on_progress:
+        on_progress('generating')
     persona = random.choice(personas)  # Pick a random persona
-    generated_post = generate_post(article['title'], article['text'], persona)
+    article_text = condense_article(url, article['text'])
+    generated_post = generate_post(article['title'], article_text, persona, bypass_cache=bypass_cache)
     
     if not generated_post:
         print(f"Post generation failed for {url}. Skipping.")
-        return None
+        return None, 'failed'
 
-    # Extract title and content from the generated post
-    title = generated_post['title']
+    # Extract the content from the generated post
     content = generated_post['content']
     
     # Collect replies
@@ -137,28 +363,17 @@ def process_article(url, forced_topic=None):
     num_comments_to_generate = 5
     available_commenters = [p for p in personas if p['name'] != persona['name']]
     replying_bots = random.sample(available_commenters, min(len(available_commenters), num_comments_to_generate))
-    comments = []
-    
-    for bot in replying_bots:
-        reply = generate_reply(content, bot)
-        comments.append({
-            "author": bot['name'],
-            "reply": reply
-        })
+    comments = generate_comments(content, replying_bots, bypass_cache=bypass_cache)
 
-    # Format according to schema, using forced_topic if provided
-    output = create_formatted_output(
-        post_content=content,
-        post_author=persona['name'],
-        comments=comments,
-        forced_topic=forced_topic
-    )
-    
-    # Save to cache
-    if forced_topic:
-        db.save_generated_post(url, forced_topic, output)
-    
-    return output
+    generation = {
+        "content": content,
+        "author": persona['name'],
+        "comments": comments,
+        "duplicate": duplicate
+    }
+    db.save_article_generation(key, generation)
+    near_dup.remember(url, signature)
+    return generation, 'generated'
 
 if __name__ == '__main__':
     # Test URL
@@ -166,7 +381,7 @@ if __name__ == '__main__':
     
     output = process_article(url)
     
-    if output:
+    if output and output.get("posts"):
         # Write to output file
         with open('output.json', 'w', encoding='utf-8') as f:
             json.dump(output, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import random
+import re
+import time
+from array import array
+from dotenv import load_dotenv
+
+from database import db
+
+load_dotenv()
+
+# What process_article does with a near-duplicate of a recently processed article:
+#   skip  - don't generate anything for it
+#   reuse - reformat the earlier article's post and replies instead of calling the LLMs
+#   flag  - generate as usual, but mark the post with duplicate_of
+#   off   - don't check
+NEAR_DUP_ACTION = os.getenv("NEAR_DUP_ACTION", "flag").lower()
+# Only articles processed within this many hours count
+NEAR_DUP_WINDOW_HOURS = float(os.getenv("NEAR_DUP_WINDOW_HOURS", "72"))
+# Estimated share of 3-word shingles two articles must have in common.
+# Syndicated copies with a new byline or disclaimer score 0.85-0.95;
+# different stories built from the same market phrases stay under 0.4.
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))
+
+ACTIONS = ('skip', 'reuse', 'flag', 'off')
+if NEAR_DUP_ACTION not in ACTIONS:
+    print(f"Unknown NEAR_DUP_ACTION {NEAR_DUP_ACTION!r}, using 'flag'")
+    NEAR_DUP_ACTION = 'flag'
+
+SHINGLE_WORDS = 3
+# Below this many words a signature says more about boilerplate than the story
+MIN_WORDS = 50
+# 64 MinHash values in 16 bands of 4. Articles sharing any band are
+# compared; pairs above ~0.6 similarity almost always share one, so
+# thresholds below that start to miss matches.
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+_MASK64 = (1 << 64) - 1
+# Fixed seed: signatures stored in the database must stay comparable
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(NUM_HASHES)]
+
+_WORD = re.compile(r'\w+')
+
+def _shingle_hashes(text, min_words):
+    words = _WORD.findall((text or '').lower())
+    if len(words) < max(min_words, SHINGLE_WORDS):
+        return None
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+            for shingle in shingles]
+
+def signature(text, min_words=MIN_WORDS):
+    """
+    MinHash signature of the text's 3-word shingles as an array of
+    NUM_HASHES 32-bit values, or None for texts under min_words words.
+    """
+    hashes = _shingle_hashes(text, min_words)
+    if hashes is None:
+        return None
+    return array('I', (
+        min((a * h + b) & _MASK64 for h in hashes) >> 32
+        for a, b in _PERMUTATIONS
+    ))
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_HASHES
+
+def band_keys(sig):
+    """One signed 64-bit key per band; equal keys mean an identical band"""
+    keys = []
+    for band in range(BANDS):
+        raw = array('I', sig[band * ROWS:(band + 1) * ROWS]).tobytes() + bytes([band])
+        keys.append(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big', signed=True))
+    return keys
+
+def find_duplicate(url, sig, now=None):
+    """
+    The most similar article other than url processed within the window
+    and at or above NEAR_DUP_THRESHOLD: {"url", "similarity",
+    "processed_at"}, or None.
+    """
+    if sig is None:
+        return None
+    now = now or time.time()
+    candidates = db.find_fingerprints(band_keys(sig), now - NEAR_DUP_WINDOW_HOURS * 3600, exclude_url=url)
+    best = None
+    for candidate in candidates:
+        score = similarity(sig, array('I', candidate['signature']))
+        if score >= NEAR_DUP_THRESHOLD and (best is None or score > best['similarity']):
+            best = {'url': candidate['url'], 'similarity': score, 'processed_at': candidate['processed_at']}
+    return best
+
+def remember(url, sig, now=None):
+    """Record that url was processed, so later copies of it are caught"""
+    if sig is None:
+        return
+    try:
+        db.save_fingerprint(url, sig.tobytes(), band_keys(sig), now or time.time())
+    except Exception as e:
+        print(f"Error saving fingerprint for {url}: {e}")
@@ -1,163 +1,103 @@
-from newspaper import Article, Config
+import os
 import re
-from urllib.parse import urlparse
+import threading
+import time
+from datetime import datetime, timezone
 import random
-import requests
-from bs4 import BeautifulSoup
+from dotenv import load_dotenv
 from database import db  # Import our database module
+from http_client import get_session
+from html_extract import extract_content
+from source_rules import SourceRules, get_rules, compile_patterns
+from metrics import timed
+
+load_dotenv()
+
+# How long an extracted article is served from the cache before revalidating
+ARTICLE_CACHE_TTL = int(os.getenv("ARTICLE_CACHE_TTL", str(6 * 60 * 60)))
+
+# Extraction cache counters, see get_cache_stats()
+_cache_stats_lock = threading.Lock()
+_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'revalidated': 0,
+    'bytes_saved': 0,
+    'hits_seconds': 0.0,
+    'misses_seconds': 0.0,
+    'revalidated_seconds': 0.0
+}
+
+def _record_cache(outcome, started, bytes_saved=0):
+    with _cache_stats_lock:
+        _cache_stats[outcome] += 1
+        _cache_stats[f'{outcome}_seconds'] += time.monotonic() - started
+        _cache_stats['bytes_saved'] += bytes_saved or 0
+
+def get_cache_stats():
+    """Return hit/miss/revalidate counts with average latency and bytes saved"""
+    with _cache_stats_lock:
+        stats = dict(_cache_stats)
+    for outcome in ('hits', 'misses', 'revalidated'):
+        seconds = stats.pop(f'{outcome}_seconds')
+        stats[f'{outcome}_avg_ms'] = round(seconds / stats[outcome] * 1000, 1) if stats[outcome] else None
+    lookups = stats['hits'] + stats['misses'] + stats['revalidated']
+    stats['hit_rate'] = round((stats['hits'] + stats['revalidated']) / lookups, 3) if lookups else None
+    stats['ttl_seconds'] = ARTICLE_CACHE_TTL
+    return stats
+
+def _cache_article(url, title, text, etag=None, last_modified=None, page_bytes=None):
+    """Store an extraction in extracted_articles; failures only cost the cache"""
+    if not text:
+        return
+    try:
+        db.save_article(url, title, text, etag, last_modified, page_bytes)
+    except Exception as e:
+        print(f"Error caching article {url}: {e}")
+
+def is_fresh(cached, ttl=None):
+    """Check whether a cached extracted_articles row is younger than the TTL"""
+    ttl = ARTICLE_CACHE_TTL if ttl is None else ttl
+    try:
+        extracted_at = datetime.strptime(cached['extracted_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return False
+    return (datetime.now(timezone.utc) - extracted_at).total_seconds() < ttl
 
 def get_source_config(url):
     """Get source-specific configuration"""
-    domain = urlparse(url).netloc.lower()
-    
-    configs = {
-        'moneycontrol.com': {
-            'remove_patterns': [
-                r'Follow us on.*$',
-                r'Download The Economic Times News App.*$',
-                r'Click here to download.*$',
-                r'Disclaimer:.*$',
-                r'Catch all the Business News.*$',
-                r'Also Read:.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        },
-        'economictimes.indiatimes.com': {
-            'remove_patterns': [
-                r'Download The Economic Times News App.*$',
-                r'\(This story originally appeared.*\)',
-                r'Never miss a great news story!.*$',
-                r'Click here to download.*$',
-                r'Also Read:.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
-        },
-        'livemint.com': {
-            'remove_patterns': [
-                r'Download the Mint app.*$',
-                r'Click here to read.*$',
-                r'Also read:.*$',
-                r'Catch all the Business News.*$',
-                r'Subscribe to Mint Newsletters.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
-        },
-        'business-standard.com': {
-            'remove_patterns': [
-                r'Dear Reader,.*$',
-                r'Business Standard has always.*$',
-                r'Key stories on business-standard.*$',
-                r'Subscribe to Business Standard Premium.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/91.0'
-        },
-        'financialexpress.com': {
-            'remove_patterns': [
-                r'Get live Share Market updates.*$',
-                r'Also read:.*$',
-                r'For all the latest.*$',
-                r'Subscribe to FE Daily Newsletter.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Safari/537.36'
-        },
-        'nseindia.com': {
-            'remove_patterns': [
-                r'Copyright © National Stock Exchange.*$',
-                r'Disclaimer:.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
-        },
-        'bseindia.com': {
-            'remove_patterns': [
-                r'Copyright © BSE.*$',
-                r'Disclaimer:.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
-        },
-        'zeebiz.com': {
-            'remove_patterns': [
-                r'Click here to read.*$',
-                r'WATCH ZEE BUSINESS LIVE TV.*$',
-                r'Download the Zee Business App.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/91.0'
-        },
-        'reuters.com': {
-            'remove_patterns': [
-                r'Reporting by.*$',
-                r'Our Standards:.*$',
-                r'Register now for.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
-        },
-        'bloombergquint.com': {
-            'remove_patterns': [
-                r'BQ Prime is now available.*$',
-                r'Subscribe to BQ Prime.*$',
-                r'Also Read:.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
-        },
-        'thehindubusinessline.com': {
-            'remove_patterns': [
-                r'Published on.*$',
-                r'Subscribe to The Hindu BusinessLine.*$',
-                r'Follow us on .*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/91.0'
-        },
-        'equitymaster.com': {
-            'remove_patterns': [
-                r'This article is from.*$',
-                r'Subscribe to Equitymaster.*$',
-                r'Equitymaster Agora Research.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Safari/537.36'
-        },
-        'tickertape.in': {
-            'remove_patterns': [
-                r'Download the Tickertape App.*$',
-                r'Subscribe to our newsletter.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
-        },
-        'cnbctv18.com': {
-            'remove_patterns': [
-                r'ALSO READ:.*$',
-                r'Follow our live blog.*$',
-                r'Disclaimer:.*$',
-                r'First Published:.*$'
-            ],
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
-        }
-    }
-    
-    # Default config for unknown sources
-    default_config = {
-        'remove_patterns': [],
-        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-    
-    # Find matching domain (handle www. and subdomains)
-    for known_domain, config in configs.items():
-        if known_domain in domain:
-            return config
-    
-    return default_config
+    return get_rules(url).config
 
 def clean_article_text(text, remove_patterns):
-    """Clean article text by removing unwanted patterns"""
-    cleaned_text = text
-    
-    # Remove unwanted patterns
-    for pattern in remove_patterns:
-        cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.IGNORECASE | re.MULTILINE)
-    
-    # General cleanup
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)  # Replace multiple spaces with single space
-    cleaned_text = re.sub(r'\n\s*\n', '\n', cleaned_text)  # Remove multiple newlines
-    
-    return cleaned_text.strip()
+    """
+    Clean article text by removing unwanted patterns.
+
+    remove_patterns may be a SourceRules from get_rules() or a list of
+    pattern strings, which are compiled once and reused.
+    """
+    rules = remove_patterns if isinstance(remove_patterns, SourceRules) else compile_patterns(tuple(remove_patterns))
+    return rules.clean(text)
+
+def clean_article_texts(texts, remove_patterns):
+    """Clean a batch of article texts from the same source in one call"""
+    rules = remove_patterns if isinstance(remove_patterns, SourceRules) else compile_patterns(tuple(remove_patterns))
+    return rules.clean_batch(texts)
+
+CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+def get_declared_encoding(response):
+    """Return the charset declared in the Content-Type header, if any"""
+    match = CHARSET_RE.search(response.headers.get('Content-Type', ''))
+    return match.group(1) if match else None
+
+def decode_html(body, encoding):
+    """Decode with the declared charset; without one, hand bytes to the parser to sniff"""
+    if encoding:
+        try:
+            return body.decode(encoding, errors='replace')
+        except LookupError:
+            pass
+    return body
 
 def get_random_user_agent():
     user_agents = [
@@ -169,71 +109,104 @@ def get_random_user_agent():
     ]
     return random.choice(user_agents)
 
-def extract_article(url):
+def extract_article(url, use_cache=True):
+    started = time.monotonic()
+    cached = None
     try:
+        # Serve from the extraction cache while fresh
+        if use_cache:
+            cached = db.get_article(url)
+            if cached and is_fresh(cached):
+                _record_cache('hits', started, cached.get('page_bytes'))
+                return {
+                    "title": cached['title'],
+                    "text": cached['text']
+                }
+
         # Get source-specific configuration
-        source_config = get_source_config(url)
+        source_rules = get_rules(url)
         
-        # First try with requests and BeautifulSoup
+        # First try with requests and our own HTML extraction
         headers = {
-            'User-Agent': get_random_user_agent(),
+            'User-Agent': source_rules.user_agent,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
             'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1'
         }
+
+        # Revalidate a stale cached copy instead of refetching it outright
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
         
-        response = requests.get(url, headers=headers, timeout=15, verify=True)
+        # Pooled keep-alive session, retries 429/5xx with backoff
+        with timed('fetch'):
+            response = get_session().get(url, headers=headers, timeout=15, verify=True)
+        if response.status_code == 304 and cached:
+            db.touch_article(url)
+            _record_cache('revalidated', started, cached.get('page_bytes'))
+            return {
+                "title": cached['title'],
+                "text": cached['text']
+            }
+
+        etag = None
+        last_modified = None
+        page_bytes = None
+        html = None
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Try to find the main article content based on common patterns
-            article_text = ""
-            
-            # Look for article content in common containers
-            content_selectors = [
-                'article', '.article-content', '.story-content',
-                '[itemprop="articleBody"]', '.entry-content',
-                '#article-content', '.content-body'
-            ]
-            
-            for selector in content_selectors:
-                content = soup.select_one(selector)
-                if content:
-                    article_text = content.get_text(separator='\n').strip()
-                    break
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            body = response.content
+            page_bytes = len(body)
+            # Decode the raw bytes once with the declared charset rather than
+            # paying for response.text's charset detection
+            html = decode_html(body, get_declared_encoding(response))
+
+            # Find the main article content and title with the lxml engine
+            with timed('parse'):
+                extracted = extract_content(html)
             
             # If we found content, clean and return it
-            if article_text:
-                cleaned_text = clean_article_text(article_text, source_config['remove_patterns'])
-                
-                # Try to find title
-                title = ""
-                title_selectors = ['h1', '[itemprop="headline"]', '.article-title', '.entry-title']
-                for selector in title_selectors:
-                    title_elem = soup.select_one(selector)
-                    if title_elem:
-                        title = title_elem.get_text().strip()
-                        break
+            if extracted:
+                title = extracted['title']
+                with timed('clean'):
+                    cleaned_text = source_rules.clean(extracted['text'])
                 
+                _cache_article(url, title, cleaned_text, etag, last_modified, page_bytes)
+                _record_cache('misses', started)
                 return {
                     "title": title,
                     "text": cleaned_text
                 }
         
-        # If requests method failed or didn't find content, try newspaper3k as fallback
+        # If requests method failed or didn't find content, try newspaper3k as fallback.
+        # Imported here: newspaper3k and nltk are a quarter-second import that
+        # most extractions never need.
+        from newspaper import Article, Config
         config = Config()
         config.browser_user_agent = get_random_user_agent()
         config.request_timeout = 15
         config.fetch_images = False
         
         article = Article(url, config=config)
-        article.download()
-        article.parse()
+        if html:
+            # Parse the page we already have instead of downloading it again
+            article.download(input_html=html)
+        else:
+            with timed('fetch'):
+                article.download()
+        with timed('parse'):
+            article.parse()
         
-        cleaned_text = clean_article_text(article.text, source_config['remove_patterns'])
+        with timed('clean'):
+            cleaned_text = source_rules.clean(article.text)
         
+        _cache_article(url, article.title.strip(), cleaned_text, etag, last_modified, page_bytes)
+        _record_cache('misses', started)
         return {
             "title": article.title.strip(),
             "text": cleaned_text
@@ -1,22 +1,44 @@
 import os
-import cohere
 import json
 from dotenv import load_dotenv
 from pathlib import Path
+from llm import LLMError, provider_for
+from metrics import timed
+from llm_cache import cache_key, cached_call
 
 # Load environment variables from .env file
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-api_key = os.getenv("COHERE_API_KEY")
-if not api_key:
-    raise ValueError("COHERE_API_KEY not found in environment variables")
-
-co = cohere.Client(api_key)  # Initialize Cohere client
-
-def generate_post(article_title, article_text, persona):
+# command-r is well-suited for this kind of structured output task; set
+# POST_MODEL too when pointing LLM_POST_PROVIDER at another vendor
+POST_MODEL = os.getenv("POST_MODEL", 'command-r')
+POST_TEMPERATURE = 0.8
+# Bump when the preamble, prompt or schema changes so cached posts aren't reused
+POST_PROMPT_VERSION = 1
+
+POST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {
+            "type": "string",
+            "description": "A compelling, hook-style title that creates curiosity and urgency. Must be unique from the content's first line and act as a preview/teaser."
+        },
+        "content": {
+            "type": "string",
+            "description": "The full content of the forum post, including analysis, persona, and hashtags."
+        }
+    },
+    "required": ["title", "content"]
+}
+
+@timed('post')
+def generate_post(article_title, article_text, persona, bypass_cache=False):
     """
     Generates a forum post using Cohere's chat endpoint with JSON mode for reliable output.
+
+    Responses are cached by article, persona, prompt version, model and
+    temperature; bypass_cache regenerates and replaces the cached post.
     """
     
     preamble = f"""You are a professional trader and forum contributor named {persona['name']}, known for your {persona['style']} style and {persona['postTone']} tone. You're an expert on market analysis, especially {', '.join(persona['focusStocks'])}.
@@ -67,51 +89,35 @@ You MUST return the output in a valid JSON format with two keys: "title" and "co
 
     prompt = f"Here is the news article:\nTITLE: {article_title}\nARTICLE: {article_text}\n\nNow, generate the forum post based on this article."
 
+    provider = provider_for('post')
+    model = provider.model_label(POST_MODEL)
+    key = cache_key('post', model, POST_TEMPERATURE, POST_PROMPT_VERSION, preamble=preamble, prompt=prompt)
+    return cached_call('post', model, key, lambda: _chat(provider, preamble, prompt), bypass=bypass_cache)
+
+def _chat(provider, preamble, prompt):
     try:
-        # Using the Chat endpoint with a defined response format for reliable JSON output
-        response = co.chat(
-            message=prompt,
-            preamble=preamble,
-            model='command-r',  # command-r is well-suited for this kind of structured output task
-            temperature=0.8,
-            response_format={
-                "type": "json_schema",
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "title": {
-                            "type": "string",
-                            "description": "A compelling, hook-style title that creates curiosity and urgency. Must be unique from the content's first line and act as a preview/teaser."
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The full content of the forum post, including analysis, persona, and hashtags."
-                        }
-                    },
-                    "required": ["title", "content"]
-                }
-            }
+        # Structured output against POST_SCHEMA for reliable JSON
+        json_response_text = provider.generate(
+            prompt, POST_MODEL, preamble=preamble, schema=POST_SCHEMA, temperature=POST_TEMPERATURE
         )
-        
-        json_response_text = response.text
-        
+    except LLMError as e:
+        print(f"Post generation error ({provider.name}): {e}")
+        return None
+
+    try:
         # Parse the JSON string into a Python dictionary
         formatted_output = json.loads(json_response_text)
-        
-        # Basic validation
-        if not isinstance(formatted_output, dict) or "title" not in formatted_output or "content" not in formatted_output:
-            print(f"Cohere Error: JSON output is not in the expected format. Raw output: {json_response_text}")
-            return None
-
-        if not formatted_output.get("title") or not formatted_output.get("content"):
-             print(f"Cohere Warning: Generated empty title or content. Raw output: {json_response_text}")
-             return None
-
-        return formatted_output
-
     except json.JSONDecodeError as e:
-        print(f"JSON Decode Error: Failed to parse response from Cohere. Raw text: '{response.text}'. Error: {e}")
+        print(f"JSON Decode Error: Failed to parse response from {provider.name}. Raw text: '{json_response_text}'. Error: {e}")
         return None
-    except Exception as e:
-        print(f"Cohere API Error: An unexpected error occurred: {e}")
+
+    # Basic validation
+    if not isinstance(formatted_output, dict) or "title" not in formatted_output or "content" not in formatted_output:
+        print(f"{provider.name} Error: JSON output is not in the expected format. Raw output: {json_response_text}")
         return None
+
+    if not formatted_output.get("title") or not formatted_output.get("content"):
+        print(f"{provider.name} Warning: Generated empty title or content. Raw output: {json_response_text}")
+        return None
+
+    return formatted_output
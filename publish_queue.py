@@ -0,0 +1,207 @@
+import json
+import os
+import random
+import threading
+import time
+
+from content_index import OUTPUT_DIR
+from database import db
+from external_api import MAX_POSTS_PER_UPLOAD
+from publishing import dedupe_key, post_identity, publish_output_posts
+
+# Queue row states
+QUEUED = 'queued'
+SENDING = 'sending'
+PUBLISHED = 'published'
+FAILED = 'failed'
+NEEDS_REVIEW = 'needs_review'  # May or may not have reached the forum; a person has to check
+
+# Posts sent to the forum per minute, across all uploads
+PUBLISH_POSTS_PER_MINUTE = int(os.getenv("PUBLISH_POSTS_PER_MINUTE", "30"))
+# Attempts for transient failures (connection refused, 429, 502, 503) before giving up
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", "5"))
+# Exponential backoff between attempts, in seconds
+PUBLISH_BACKOFF_BASE = float(os.getenv("PUBLISH_BACKOFF_BASE", "30"))
+PUBLISH_BACKOFF_MAX = float(os.getenv("PUBLISH_BACKOFF_MAX", "1800"))
+
+class RateLimiter:
+    """Token bucket refilled at `per_minute` tokens a minute, holding at most a minute's worth"""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        self._refill()
+        return int(self.tokens)
+
+    def consume(self, count):
+        self._refill()
+        self.tokens -= count
+
+    def wait_time(self, count=1):
+        """Seconds until `count` tokens are available"""
+        self._refill()
+        return max(0.0, (count - self.tokens) / self.rate) if self.rate else float('inf')
+
+def backoff_delay(attempts):
+    """Delay before attempt attempts + 1, with jitter so retries don't line up"""
+    delay = min(PUBLISH_BACKOFF_MAX, PUBLISH_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+class PublishQueue:
+    """
+    Publishes queued posts from a background thread.
+
+    Rows live in the publish_queue table, so queued posts survive restarts.
+    Each post has a dedupe key (file plus temp_post_id, created_at and
+    username), so enqueueing it again - a retry or a double click - returns
+    the existing row instead of publishing twice. Only one dispatcher
+    should run against a database.
+    """
+
+    def __init__(self, api_factory, output_dir=OUTPUT_DIR, posts_per_minute=None):
+        self.api_factory = api_factory
+        self.output_dir = output_dir
+        self.limiter = RateLimiter(posts_per_minute or PUBLISH_POSTS_PER_MINUTE)
+        self._api = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the dispatcher once; rows interrupted mid-send go to needs_review"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            recovered = db.recover_publish_queue()
+            if recovered:
+                print(f"Publish queue: {recovered} interrupted upload(s) need review")
+            self._thread = threading.Thread(target=self._run, name='publish-queue', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def enqueue(self, refs):
+        """
+        Queue (filename, post_index) pairs and return one entry per ref: the
+        queue row, or {"filename", "post_index", "error"} if the post can't
+        be found. Returns without waiting for anything to be sent.
+        """
+        entries = []
+        items = []
+        files = {}
+        for filename, post_index in refs:
+            if filename not in files:
+                filepath = os.path.join(self.output_dir, filename)
+                try:
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        files[filename] = json.load(f).get('posts', [])
+                except (OSError, ValueError):
+                    files[filename] = None
+            posts = files[filename]
+            if posts is None:
+                entries.append({'filename': filename, 'post_index': post_index, 'error': 'File not found'})
+            elif not isinstance(post_index, int) or not 0 <= post_index < len(posts):
+                entries.append({'filename': filename, 'post_index': post_index, 'error': 'Post not found'})
+            else:
+                post = posts[post_index]
+                temp_post_id, created_at, username = post_identity(post)
+                item = {
+                    'dedupe_key': dedupe_key(filename, post),
+                    'filename': filename,
+                    'post_index': post_index,
+                    'temp_post_id': temp_post_id,
+                    'post_created_at': created_at,
+                    'username': username
+                }
+                items.append(item)
+                entries.append(item)
+
+        rows = iter(db.enqueue_publish(items)) if items else iter(())
+        entries = [next(rows) if 'dedupe_key' in entry else entry for entry in entries]
+        self.start()
+        self._wake.set()
+        return entries
+
+    def retry(self, item_id):
+        """Queue a failed or needs_review row again"""
+        if not db.requeue_publish(item_id):
+            return False
+        self.start()
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                delay = self._dispatch()
+            except Exception as e:
+                print(f"Publish queue error: {e}")
+                delay = PUBLISH_BACKOFF_BASE
+            if delay:
+                self._wake.wait(delay)
+                self._wake.clear()
+
+    def _dispatch(self):
+        """Send one upload's worth of due posts; return how long to sleep (0 to go again)"""
+        now = time.time()
+        due = db.count_publish_due(now)
+        if not due:
+            next_due = db.next_publish_due()
+            # Nothing due: sleep until the next retry, or until something is enqueued
+            return max(0.1, next_due - now) if next_due is not None else 3600
+
+        # Under the rate limit, wait until a whole upload's worth can go at once
+        # rather than trickling out one-post uploads as tokens come back
+        wanted = min(due, MAX_POSTS_PER_UPLOAD, self.limiter.capacity)
+        if self.limiter.available() < wanted:
+            return max(0.1, self.limiter.wait_time(wanted))
+
+        rows = db.claim_publish_batch(wanted, now)
+        if not rows:
+            return 0
+
+        self.limiter.consume(len(rows))
+        refs = [
+            (row['filename'], row['post_index'], (row['temp_post_id'], row['post_created_at'], row['username']))
+            for row in rows
+        ]
+        try:
+            if self._api is None:
+                self._api = self.api_factory()
+            results = publish_output_posts(refs, self._api, self.output_dir)['results']
+        except Exception as e:
+            # We can't tell whether the upload went out
+            for row in rows:
+                db.finish_publish(row['id'], NEEDS_REVIEW, error=f"Publish error: {e}")
+            return 0
+
+        for row, result in zip(rows, results):
+            self._record(row, result)
+        print(f"Publish queue: sent {len(rows)} post(s)")
+        return 0
+
+    def _record(self, row, result):
+        status = result['status']
+        if status == 'published' or result.get('error') == 'Already published':
+            db.finish_publish(row['id'], PUBLISHED, external_id=result.get('external_id'))
+        elif status == 'skipped':
+            db.finish_publish(row['id'], FAILED, error=result.get('error'))
+        elif result.get('transient') and row['attempts'] < PUBLISH_MAX_ATTEMPTS:
+            db.finish_publish(row['id'], QUEUED, error=result.get('error'),
+                              next_attempt_at=time.time() + backoff_delay(row['attempts']))
+        elif result.get('uncertain'):
+            db.finish_publish(row['id'], NEEDS_REVIEW, error=result.get('error'))
+        else:
+            db.finish_publish(row['id'], FAILED, error=result.get('error'))
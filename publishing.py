@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from content_dedup import OUTPUT_DUP_ACTION, check_publish, describe
+from content_index import OUTPUT_DIR, index_output_file
+
+# Serialises read-modify-write of output files by publishers in this process
+_files_lock = threading.Lock()
+
+def post_identity(post):
+    """What identifies a post across edits and index shifts within its file"""
+    return (post.get('temp_post_id'), post.get('created_at'), post.get('username'))
+
+def dedupe_key(filename, post):
+    """Stable key for publishing one post exactly once"""
+    raw = json.dumps([filename, *post_identity(post)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _find_post(posts, post_index, identity):
+    """Index of the post, following it if deletes moved it; None if it's gone"""
+    if identity is None:
+        return post_index if isinstance(post_index, int) and 0 <= post_index < len(posts) else None
+    if isinstance(post_index, int) and 0 <= post_index < len(posts) and post_identity(posts[post_index]) == identity:
+        return post_index
+    for index, post in enumerate(posts):
+        if post_identity(post) == identity:
+            return index
+    return None
+
+def _load_files(refs, output_dir):
+    """Read each output file named in refs once: {filename: data}"""
+    files = {}
+    for filename in dict.fromkeys(ref[0] for ref in refs):
+        filepath = os.path.join(output_dir, filename)
+        if os.path.exists(filepath):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                files[filename] = json.load(f)
+    return files
+
+def publish_output_posts(refs, api, output_dir=OUTPUT_DIR):
+    """
+    Publish posts from output files in bulk and record the outcome.
+
+    refs is a list of (filename, post_index) or (filename, post_index,
+    identity); with an identity the post is found even if deletes moved it.
+    Posts that are missing, already published or already named by an
+    earlier ref are skipped, as are near-duplicates when OUTPUT_DUP_ACTION
+    is block. Each touched file is rewritten once with
+    published/published_at/external_id for the posts that went through.
+    Returns {"success", "total", "successful", "failed", "skipped", "results"}
+    with one result per ref.
+    """
+    with _files_lock:
+        files = _load_files(refs, output_dir)
+
+        results = []
+        to_publish = []
+        queued = set()  # (filename, post_index) already in to_publish
+        for ref in refs:
+            filename, post_index = ref[0], ref[1]
+            result = {'filename': filename, 'post_index': post_index}
+            posts = files.get(filename, {}).get('posts', [])
+            if filename not in files:
+                result.update(status='skipped', error='File not found')
+                results.append(result)
+                continue
+            post_index = _find_post(posts, post_index, ref[2] if len(ref) > 2 else None)
+            if post_index is None:
+                result.update(status='skipped', error='Post not found')
+            elif posts[post_index].get('published'):
+                result.update(status='skipped', post_index=post_index, temp_post_id=posts[post_index].get('temp_post_id'),
+                              external_id=posts[post_index].get('external_id'), error='Already published')
+            elif (filename, post_index) in queued:
+                result.update(status='skipped', post_index=post_index, temp_post_id=posts[post_index].get('temp_post_id'),
+                              error='Duplicate ref')
+            else:
+                queued.add((filename, post_index))
+                result['post_index'] = post_index
+                result['temp_post_id'] = posts[post_index].get('temp_post_id')
+                to_publish.append((result, posts[post_index]))
+            results.append(result)
+
+        # Near-duplicates of published posts, or of each other, look like spam in bulk
+        matches = check_publish([(result['filename'], result['post_index'], post) for result, post in to_publish])
+        clear = []
+        for (result, post), match in zip(to_publish, matches):
+            if match:
+                result['duplicate_of'] = match
+                if OUTPUT_DUP_ACTION == 'block':
+                    result.update(status='skipped', error=f"Near-duplicate of {describe(match)}")
+                    continue
+                print(f"Publishing {result['filename']} post {result['post_index']}, a near-duplicate of {describe(match)}")
+            clear.append((result, post))
+        to_publish = clear
+
+        outcomes = api.publish_posts([post for _, post in to_publish]) if to_publish else []
+
+        published_at = datetime.now().isoformat()
+        published = {}
+        for (result, post), outcome in zip(to_publish, outcomes):
+            if outcome.get('success'):
+                result.update(status='published', external_id=outcome.get('post_id'))
+                published.setdefault(result['filename'], []).append((result, post))
+            else:
+                result.update(status='failed', error=outcome.get('error'))
+                for flag in ('transient', 'uncertain'):
+                    if outcome.get(flag):
+                        result[flag] = True
+
+        # One write per file, however many of its posts were published. The
+        # file is read again first so edits made during the upload survive.
+        for filename, file_data in _load_files([(name,) for name in published], output_dir).items():
+            posts = file_data.get('posts', [])
+            for result, post in published[filename]:
+                index = _find_post(posts, result['post_index'], post_identity(post))
+                if index is None:
+                    continue  # Deleted while uploading; nothing left to mark
+                posts[index]['published'] = True
+                posts[index]['published_at'] = published_at
+                posts[index]['external_id'] = result['external_id']
+            filepath = os.path.join(output_dir, filename)
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(file_data, f, indent=2, ensure_ascii=False)
+            index_output_file(filepath, file_data)
+
+    successful = sum(1 for result in results if result['status'] == 'published')
+    failed = sum(1 for result in results if result['status'] == 'failed')
+    return {
+        'success': failed == 0,
+        'total': len(results),
+        'successful': successful,
+        'failed': failed,
+        'skipped': len(results) - successful - failed,
+        'results': results
+    }
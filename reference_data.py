@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _freeze(value):
+    """Make parsed JSON read-only so one copy can be shared by every thread"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+class ReferenceFile:
+    """
+    A JSON file loaded once and reloaded when its mtime or size changes.
+
+    build turns the parsed JSON into the immutable value get() returns; the
+    same object is returned until the file changes, so it can be used as a
+    cache key (the topic index relies on this).
+    """
+
+    def __init__(self, filename, build):
+        self.path = os.path.join(BASE_DIR, filename)
+        self.build = build
+        self._version = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self):
+        version = self._current_version()
+        if version != self._version:
+            with self._lock:
+                # Another thread may have reloaded it while we waited
+                version = self._current_version()
+                if version != self._version:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._value = self.build(json.load(f))
+                    self._version = version
+        return self._value
+
+def _build_personas(data):
+    personas = _freeze(data)
+    return {
+        'personas': personas,
+        'by_name': MappingProxyType({persona['name']: persona for persona in personas}),
+        'by_id': MappingProxyType({persona['id']: persona for persona in personas if 'id' in persona}),
+    }
+
+_topics = ReferenceFile('topics.json', frozenset)
+_personas = ReferenceFile('personas.json', _build_personas)
+_usernames = ReferenceFile('usernames.json', tuple)
+
+def load_topics():
+    """All topic symbols as a frozenset"""
+    return _topics.get()
+
+def load_personas():
+    """Personas as a tuple of read-only mappings, in file order"""
+    return _personas.get()['personas']
+
+def personas_by_name():
+    """Read-only {name: persona} map"""
+    return _personas.get()['by_name']
+
+def personas_by_id():
+    """Read-only {id: persona} map"""
+    return _personas.get()['by_id']
+
+def load_usernames():
+    """Usernames as a tuple, in file order"""
+    return _usernames.get()
@@ -1,14 +1,20 @@
+import json
 import os
-import random
-import google.generativeai as genai
 from dotenv import load_dotenv
+from llm import LLMError, provider_for
+from metrics import timed
+from llm_cache import cache_key, cached_call
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("models/gemini-1.5-flash-latest")  # fast and cheap
+# Fast and cheap; set REPLY_MODEL too when pointing LLM_REPLY_PROVIDER at another vendor
+REPLY_MODEL = os.getenv("REPLY_MODEL", "models/gemini-1.5-flash-latest")
+# Bump when the prompt changes so cached replies aren't reused
+REPLY_PROMPT_VERSION = 1
+REPLIES_PROMPT_VERSION = 1
 
-
-def generate_reply(post_text, persona):
+@timed('reply')
+def generate_reply(post_text, persona, timeout=None, bypass_cache=False):
+    """Reply to a post in the persona's voice; cached like generate_post"""
     prompt = f"""
 Act as a forum member with this persona:
 Name: {persona['name']}
@@ -33,9 +39,122 @@ Write a reply that:
 
 Remember: You are {persona['name']}, known for {persona['style']} style and {persona['replyTone']} tone.
 """
+    # Replies run at the provider's default temperature
+    provider = provider_for('reply')
+    model = provider.model_label(REPLY_MODEL)
+    key = cache_key('reply', model, None, REPLY_PROMPT_VERSION, prompt=prompt)
+    return cached_call('reply', model, key, lambda: _generate(provider, prompt, timeout), bypass=bypass_cache)
+
+def _generate(provider, prompt, timeout):
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
+        return provider.generate(prompt, REPLY_MODEL, timeout=timeout).strip()
+    except LLMError as e:
         print(f"Error generating reply: {e}")
         return ""
+
+# Structured output for generate_replies: one entry per persona, by name
+REPLIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "replies": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "reply": {"type": "string"}
+                },
+                "required": ["name", "reply"]
+            }
+        }
+    },
+    "required": ["replies"]
+}
+
+@timed('replies_batch')
+def generate_replies(post_text, personas, timeout=None, bypass_cache=False):
+    """
+    Replies from several personas in one structured-JSON call, so the post
+    is sent once rather than once per persona.
+
+    Returns {persona name: reply} for the personas the response covered;
+    a malformed response or a missing/empty entry just leaves those names
+    out, for the caller to fall back to generate_reply. Only a response
+    covering every persona is cached; a partial one is used for this call
+    and asked for again next time.
+    """
+    if not personas:
+        return {}
+    members = "\n\n".join(
+        f"""Name: {persona['name']}
+Style: {persona['style']}
+Bio: {persona['bio']}
+Reply tone: {persona['replyTone']}
+Signature moves: {', '.join(persona['signatureMoves'])}"""
+        for persona in personas
+    )
+    prompt = f"""
+Act as each of these forum members in turn:
+
+{members}
+
+Another user has posted this:
+\"\"\"
+{post_text}
+\"\"\"
+
+Write one reply from each member above. Each reply:
+1. Maintains that member's unique persona and style
+2. Uses their signature moves
+3. Keeps their typical reply tone
+4. Is brief (2-3 sentences)
+5. Adds value through insight or a different perspective
+6. Stays authentic to their character
+7. Avoids simply agreeing with the post or repeating the other replies
+
+Return JSON with a "replies" list holding one {{"name", "reply"}} object per member, using the names exactly as given.
+"""
+    provider = provider_for('reply')
+    model = provider.model_label(REPLY_MODEL)
+    key = cache_key('replies', model, None, REPLIES_PROMPT_VERSION, prompt=prompt)
+    partial = {}
+
+    def generate():
+        replies = _generate_batch(provider, prompt, personas, timeout)
+        if len(replies) < len(personas):
+            # Empty results aren't cached, so a partial batch isn't served again
+            partial.update(replies)
+            return {}
+        return replies
+
+    replies = cached_call('replies', model, key, generate, bypass=bypass_cache)
+    return replies or partial
+
+def _generate_batch(provider, prompt, personas, timeout):
+    try:
+        text = provider.generate(prompt, REPLY_MODEL, schema=REPLIES_SCHEMA, timeout=timeout)
+    except LLMError as e:
+        print(f"Error generating replies: {e}")
+        return {}
+    return parse_replies(text, personas)
+
+def parse_replies(text, personas):
+    """{name: reply} for the expected personas found in a generate_replies response"""
+    try:
+        entries = json.loads(text).get("replies")
+    except (ValueError, AttributeError) as e:
+        print(f"Malformed replies response: {e}")
+        return {}
+    if not isinstance(entries, list):
+        print("Malformed replies response: no replies list")
+        return {}
+    expected = {persona['name'] for persona in personas}
+    replies = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        name = entry.get("name")
+        reply = entry.get("reply")
+        if name in expected and name not in replies and isinstance(reply, str) and reply.strip():
+            replies[name] = reply.strip()
+    return replies
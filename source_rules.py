@@ -0,0 +1,244 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# Boilerplate to strip and the user agent to send, per source domain
+SOURCE_CONFIGS = {
+    'moneycontrol.com': {
+        'remove_patterns': [
+            r'Follow us on.*$',
+            r'Download The Economic Times News App.*$',
+            r'Click here to download.*$',
+            r'Disclaimer:.*$',
+            r'Catch all the Business News.*$',
+            r'Also Read:.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    },
+    'economictimes.indiatimes.com': {
+        'remove_patterns': [
+            r'Download The Economic Times News App.*$',
+            r'\(This story originally appeared.*\)',
+            r'Never miss a great news story!.*$',
+            r'Click here to download.*$',
+            r'Also Read:.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
+    },
+    'livemint.com': {
+        'remove_patterns': [
+            r'Download the Mint app.*$',
+            r'Click here to read.*$',
+            r'Also read:.*$',
+            r'Catch all the Business News.*$',
+            r'Subscribe to Mint Newsletters.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
+    },
+    'business-standard.com': {
+        'remove_patterns': [
+            r'Dear Reader,.*$',
+            r'Business Standard has always.*$',
+            r'Key stories on business-standard.*$',
+            r'Subscribe to Business Standard Premium.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/91.0'
+    },
+    'financialexpress.com': {
+        'remove_patterns': [
+            r'Get live Share Market updates.*$',
+            r'Also read:.*$',
+            r'For all the latest.*$',
+            r'Subscribe to FE Daily Newsletter.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Safari/537.36'
+    },
+    'nseindia.com': {
+        'remove_patterns': [
+            r'Copyright © National Stock Exchange.*$',
+            r'Disclaimer:.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
+    },
+    'bseindia.com': {
+        'remove_patterns': [
+            r'Copyright © BSE.*$',
+            r'Disclaimer:.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
+    },
+    'zeebiz.com': {
+        'remove_patterns': [
+            r'Click here to read.*$',
+            r'WATCH ZEE BUSINESS LIVE TV.*$',
+            r'Download the Zee Business App.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/91.0'
+    },
+    'reuters.com': {
+        'remove_patterns': [
+            r'Reporting by.*$',
+            r'Our Standards:.*$',
+            r'Register now for.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
+    },
+    'bloombergquint.com': {
+        'remove_patterns': [
+            r'BQ Prime is now available.*$',
+            r'Subscribe to BQ Prime.*$',
+            r'Also Read:.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
+    },
+    'thehindubusinessline.com': {
+        'remove_patterns': [
+            r'Published on.*$',
+            r'Subscribe to The Hindu BusinessLine.*$',
+            r'Follow us on .*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/91.0'
+    },
+    'equitymaster.com': {
+        'remove_patterns': [
+            r'This article is from.*$',
+            r'Subscribe to Equitymaster.*$',
+            r'Equitymaster Agora Research.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Safari/537.36'
+    },
+    'tickertape.in': {
+        'remove_patterns': [
+            r'Download the Tickertape App.*$',
+            r'Subscribe to our newsletter.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0'
+    },
+    'cnbctv18.com': {
+        'remove_patterns': [
+            r'ALSO READ:.*$',
+            r'Follow our live blog.*$',
+            r'Disclaimer:.*$',
+            r'First Published:.*$'
+        ],
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0'
+    }
+}
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Joins texts for batch cleaning. The newlines stop the `.*$` patterns from
+# running from one text into the next.
+_BATCH_SEPARATOR = '\n\x00\n'
+
+# "<literal text>.*$": removes from the literal to the end of its line
+_TO_EOL_RE = re.compile(r'^((?:[^\\.^$*+?{}\[\]|()]|\\[^A-Za-z0-9])+)\.\*\$$')
+# Leading literal of any other pattern, used to skip it when absent
+_LITERAL_PREFIX_RE = re.compile(r'^(?:[^\\.^$*+?{}\[\]|()]|\\[^A-Za-z0-9])+')
+_UNESCAPE_RE = re.compile(r'\\(.)')
+
+class _RemovePattern:
+    """
+    One compiled remove_pattern.
+
+    Nearly every pattern is a literal phrase followed by `.*$`. Those are
+    applied with str.find on a lowercased copy of the text, which is much
+    faster than a case-insensitive regex scan. Anything else uses the
+    compiled regex, skipped when its leading literal isn't in the text.
+    """
+
+    def __init__(self, pattern):
+        self.regex = re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+        to_eol = _TO_EOL_RE.match(pattern)
+        prefix = to_eol.group(1) if to_eol else (_LITERAL_PREFIX_RE.match(pattern) or [''])[0]
+        # A trailing quantifier would make the last literal character optional
+        if not to_eol and prefix and pattern[len(prefix):len(prefix) + 1] in ('*', '?', '{'):
+            prefix = prefix[:-1]
+        self.literal = _UNESCAPE_RE.sub(r'\1', prefix).lower()
+        self.to_eol = bool(to_eol)
+
+    def apply(self, text, lower):
+        """Return (text, lower) with the pattern removed"""
+        if self.literal and self.literal not in lower:
+            return text, lower
+        if not self.to_eol or len(lower) != len(text):
+            # lower() changed the length, so offsets wouldn't line up; use the regex
+            text = self.regex.sub('', text)
+            return text, text.lower()
+
+        parts = []
+        position = 0
+        while True:
+            start = lower.find(self.literal, position)
+            if start < 0:
+                break
+            end = text.find('\n', start)  # `$` matches just before a newline
+            if end < 0:
+                end = len(text)
+            parts.append(text[position:start])
+            position = end
+        parts.append(text[position:])
+        text = ''.join(parts)
+        return text, text.lower()
+
+def _collapse_whitespace(text):
+    """Single spaces within each line, no blank lines, no surrounding whitespace"""
+    return '\n'.join(line for line in (' '.join(line.split()) for line in text.splitlines()) if line)
+
+class SourceRules:
+    """Cleaning rules for one source, with its remove_patterns compiled once"""
+
+    def __init__(self, domain, remove_patterns, user_agent):
+        self.domain = domain
+        self.remove_patterns = list(remove_patterns)
+        self.user_agent = user_agent
+        self.config = {
+            'remove_patterns': self.remove_patterns,
+            'user_agent': user_agent
+        }
+        self._patterns = [_RemovePattern(pattern) for pattern in self.remove_patterns]
+
+    def _remove(self, text):
+        if self._patterns:
+            lower = text.lower()
+            for pattern in self._patterns:
+                text, lower = pattern.apply(text, lower)
+        return text
+
+    def clean(self, text):
+        """
+        Remove the source's boilerplate and collapse whitespace, keeping one
+        line break between paragraphs for condense() to work with
+        """
+        return _collapse_whitespace(self._remove(text))
+
+    def clean_batch(self, texts):
+        """Clean many texts with one pass of each pattern over their concatenation"""
+        if not texts:
+            return []
+        joined = _BATCH_SEPARATOR.join(text.replace('\x00', '') for text in texts)
+        return [_collapse_whitespace(text) for text in self._remove(joined).split('\x00')]
+
+_registry = {domain: SourceRules(domain, config['remove_patterns'], config['user_agent'])
+             for domain, config in SOURCE_CONFIGS.items()}
+_default_rules = SourceRules(None, [], DEFAULT_USER_AGENT)
+
+@lru_cache(maxsize=1024)
+def _rules_for_host(host):
+    # Try the host and then each parent domain: www.livemint.com, livemint.com, com
+    labels = host.split('.')
+    for index in range(len(labels)):
+        rules = _registry.get('.'.join(labels[index:]))
+        if rules is not None:
+            return rules
+    return _default_rules
+
+def get_rules(url):
+    """Resolve a URL to its SourceRules by domain suffix"""
+    host = (urlparse(url).hostname or '').rstrip('.')
+    return _rules_for_host(host)
+
+@lru_cache(maxsize=256)
+def compile_patterns(remove_patterns):
+    """SourceRules for an ad-hoc tuple of patterns, compiled once per tuple"""
+    return SourceRules(None, remove_patterns, DEFAULT_USER_AGENT)
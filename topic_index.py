@@ -0,0 +1,137 @@
+import re
+from functools import lru_cache
+
+DEFAULT_TOPIC = "NIFTY"
+
+# Suffixes dropped to get a topic's base form, e.g. BOSCHLTD -> BOSCH
+BASE_SUFFIX_RE = re.compile(r'(LTD|LIMITED|INDIA|&CO)$')
+
+# Match tiers, best first. Embedded hits (ACE inside PLACE) are what the old
+# substring check mostly found, so they only win when nothing else matched.
+WHOLE_WORD, BASE_FORM, EMBEDDED = 0, 1, 2
+
+def base_form(topic):
+    return BASE_SUFFIX_RE.sub('', topic).strip()
+
+def _is_word_char(char):
+    # Same characters as \w, which the old \b-based word split used
+    return char.isalnum() or char == '_'
+
+class TopicIndex:
+    """
+    Aho-Corasick automaton over every topic and its base form.
+
+    find() reports every topic mention in one pass over the content, however
+    many topics there are, instead of one substring scan and one regex per
+    topic.
+    """
+
+    def __init__(self, topics):
+        self.topics = frozenset(topics)
+        self._goto = [{}]
+        self._fail = [0]
+        # Per state: (pattern length, topic, is_base_form) for each pattern ending there
+        self._out = [[]]
+
+        for topic in sorted(self.topics):
+            self._add(topic, topic, False)
+            base = base_form(topic)
+            if base and base != topic:
+                self._add(base, topic, True)
+        self._build_links()
+        # Full transitions, filled in lazily so the scan never walks failure links
+        self._delta = [dict(goto) for goto in self._goto]
+
+    def _add(self, pattern, topic, is_base):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._out[state].append((len(pattern), topic, is_base))
+
+    def _build_links(self):
+        # Breadth-first, so a state's failure target is always finished first
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def _transition(self, state, char):
+        target = state
+        while target and char not in self._goto[target]:
+            target = self._fail[target]
+        next_state = self._goto[target].get(char, 0)
+        self._delta[state][char] = next_state
+        return next_state
+
+    def find(self, content):
+        """
+        Return {topic: (tier, count, first_position)} for every topic
+        mentioned in content, keeping the best tier seen per topic.
+        """
+        text = content.upper()
+        delta, out = self._delta, self._out
+        length = len(text)
+        found = {}
+        state = 0
+        for index, char in enumerate(text):
+            next_state = delta[state].get(char)
+            if next_state is None:
+                next_state = self._transition(state, char)
+            state = next_state
+            if not out[state]:
+                continue
+            for pattern_length, topic, is_base in out[state]:
+                start = index - pattern_length + 1
+                whole_word = (
+                    (start == 0 or not _is_word_char(text[start - 1]) or not _is_word_char(text[start]))
+                    and (index + 1 == length or not _is_word_char(text[index + 1]) or not _is_word_char(char))
+                )
+                if is_base:
+                    if not whole_word:
+                        continue  # Base forms only ever counted as whole words
+                    tier = BASE_FORM
+                else:
+                    tier = WHOLE_WORD if whole_word else EMBEDDED
+                previous = found.get(topic)
+                if previous is None or tier < previous[0]:
+                    found[topic] = (tier, 1, start)
+                elif tier == previous[0]:
+                    found[topic] = (tier, previous[1] + 1, previous[2])
+        return found
+
+    def rank(self, content):
+        """
+        Topics mentioned in content, best first: by match tier, then how
+        often, then how early they appear, then the longer (more specific)
+        topic, then name so the order is deterministic.
+        """
+        found = self.find(content)
+        return sorted(
+            found,
+            key=lambda topic: (found[topic][0], -found[topic][1], found[topic][2], -len(topic), topic)
+        )
+
+    def best(self, content, default=DEFAULT_TOPIC):
+        ranked = self.rank(content)
+        return ranked[0] if ranked else default
+
+@lru_cache(maxsize=4)
+def _build_index(topics):
+    return TopicIndex(topics)
+
+def get_topic_index(topics):
+    """Return the TopicIndex for a set of topics, built once per distinct set"""
+    return _build_index(frozenset(topics))
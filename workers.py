@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Global and per-domain concurrency for article processing
+DEFAULT_MAX_WORKERS = int(os.getenv("PROCESS_MAX_WORKERS", "8"))
+DEFAULT_MAX_PER_DOMAIN = int(os.getenv("PROCESS_MAX_PER_DOMAIN", "2"))
+
+def get_domain(url):
+    """Return the host of a URL without the www. prefix"""
+    domain = urlparse(url).netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'ref', 'ref_src', 'cmp', 'mc_cid', 'mc_eid', 'amp'}
+
+def canonical_url(url):
+    """
+    The URL with the parts that don't change the article removed: scheme and
+    host case, www., the fragment, tracking parameters, the order of the
+    remaining parameters and a trailing slash.
+    """
+    parts = urlparse(url.strip())
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith('utm_')
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunparse((parts.scheme.lower(), get_domain(url), path, parts.params, urlencode(query), ''))
+
+def run_ordered(items, func, key=None, max_workers=None, max_per_key=None):
+    """
+    Run func(item) for every item on a bounded thread pool.
+
+    At most max_workers calls run at once, and at most max_per_key calls share
+    the same key(item) (e.g. the source domain). Returns a list of
+    (result, error) tuples in the same order as items; error is the exception
+    raised by func, or None.
+    """
+    items = list(items)
+    max_workers = max(1, max_workers or DEFAULT_MAX_WORKERS)
+    max_per_key = max(1, max_per_key or DEFAULT_MAX_PER_DOMAIN)
+    keys = [key(item) if key else None for item in items]
+    if key is None:
+        max_per_key = max_workers
+
+    outcomes = [None] * len(items)
+    pending = list(range(len(items)))
+    in_flight = Counter()
+    cond = threading.Condition()
+    active = 0
+
+    def run(index):
+        nonlocal active
+        try:
+            outcome = (func(items[index]), None)
+        except Exception as e:
+            outcome = (None, e)
+        with cond:
+            outcomes[index] = outcome
+            in_flight[keys[index]] -= 1
+            active -= 1
+            cond.notify()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)) or 1) as pool:
+        with cond:
+            while pending or active:
+                # Pick the first queued item whose key still has capacity
+                next_pos = None
+                if active < max_workers:
+                    for pos, index in enumerate(pending):
+                        if in_flight[keys[index]] < max_per_key:
+                            next_pos = pos
+                            break
+
+                if next_pos is None:
+                    cond.wait()
+                    continue
+
+                index = pending.pop(next_pos)
+                in_flight[keys[index]] += 1
+                active += 1
+                pool.submit(run, index)
+
+    return outcomes